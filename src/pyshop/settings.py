@@ -10,7 +10,9 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/2.1/ref/settings/
 """
 
+import importlib.util
 import os
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -67,6 +69,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'django.template.context_processors.i18n',
+                'website.context_processors.categories',
             ],
         },
     },
@@ -74,6 +77,40 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'pyshop.wsgi.application'
 
+# tests don't share the throttle cache of the site (see pyshop.test_runner)
+TEST_RUNNER = 'pyshop.test_runner.TestRunner'
+
+
+# website.cache keeps its version tokens here; point it to a cache shared by
+# all the workers (memcached, redis, file based) when running more than one
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # token buckets of website.throttling, shared by the worker processes
+    'throttle': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(tempfile.gettempdir(), 'pyshop-throttle'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
+# requests per client allowed by the throttled views, by scope ("N/period"
+# buckets refilled continuously, see website.throttling). The API scopes
+# are counted per endpoint.
+THROTTLE_RATES = {
+    'restapi': '300/min',
+    'restapi-import': '60/min',
+    'restapi-checkout': '60/min',
+    'add-to-cart': '60/min',
+}
+
+# seconds an anonymous storefront page stays in the cache at most; changes
+# on products and categories purge the pages depending on them before that
+PAGE_CACHE_TIMEOUT = 60 * 15
+
 
 
 
@@ -128,6 +165,72 @@ LOCALE_PATHS = (
 
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 STATIC_URL = '/static/'
+# outside DEBUG, collectstatic (the build step of the static files) writes
+# them under content-hashed names, cached forever, plus .gz/.br copies sent
+# to the browsers accepting them (brotli is optional)
+if not DEBUG:
+    STATICFILES_STORAGE = \
+        'website.storage.CompressedManifestStaticFilesStorage'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
+# uploads are named by their content hash (see website.storage)
+DEFAULT_FILE_STORAGE = 'website.storage.ContentAddressedStorage'
+
+# media and static files are served by website.serving. Behind a proxy,
+# set SENDFILE_BACKEND to 'x-sendfile' (Apache mod_xsendfile, lighttpd) or
+# to 'x-accel-redirect' (nginx: an internal location mapping
+# SENDFILE_ACCEL_PREFIX + MEDIA_URL/STATIC_URL to MEDIA_ROOT/STATIC_ROOT) so
+# that the proxy sends the files instead of a Python worker
+SENDFILE_BACKEND = None
+SENDFILE_ACCEL_PREFIX = '/internal'
+# seconds browsers cache the files whose names aren't content hashes
+MEDIA_CACHE_MAX_AGE = 24 * 60 * 60
+STATIC_CACHE_MAX_AGE = 60 * 60
+
+# scaled down copies of the product images (see website.images), generated
+# by IMAGE_RENDITION_WORKERS threads (0: during the request) in each format
+IMAGE_RENDITION_WIDTHS = (160, 320, 640)
+IMAGE_RENDITION_FORMATS = ('webp', 'jpeg')
+IMAGE_RENDITION_QUALITY = 80
+IMAGE_RENDITION_WORKERS = 4
+
+# JSON is encoded and decoded with orjson when it is installed, MessagePack
+# (Accept/Content-Type: application/msgpack) is offered when msgpack is
+# installed
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'restapi.pagination.CursorPagination',
+    'DEFAULT_THROTTLE_CLASSES': [
+        'restapi.throttling.TokenBucketThrottle',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'restapi.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'restapi.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+if importlib.util.find_spec('msgpack') is not None:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].insert(
+        1, 'restapi.renderers.MessagePackRenderer'
+    )
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'].insert(
+        1, 'restapi.parsers.MessagePackParser'
+    )
+
+# seconds a response is replayed to the retries with its Idempotency-Key,
+# and seconds a key stays locked by a request that is still running
+RESTAPI_IDEMPOTENCY_TTL = 24 * 60 * 60
+RESTAPI_IDEMPOTENCY_LOCK_TIMEOUT = 60
+
+# largest JSON array accepted by the bulk create endpoints of restapi
+RESTAPI_MAX_BULK_SIZE = 10000
+
+# lines validated and inserted together by the NDJSON product import
+RESTAPI_IMPORT_CHUNK_SIZE = 1000
+
+# website.search backend used by the storefront product search
+PRODUCT_SEARCH_BACKEND = 'website.search.SQLiteFTSSearchBackend'
@@ -0,0 +1,27 @@
+""" pyshop test runner module """
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """ DiscoverRunner keeping the tests away from the token buckets of the
+    running site: the throttle cache lives in memory for the run, and no
+    scope is throttled unless a test sets THROTTLE_RATES itself
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super(TestRunner, self).setup_test_environment(**kwargs)
+        self.throttle_override = override_settings(
+            CACHES=dict(settings.CACHES, throttle={
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'throttle',
+            }),
+            THROTTLE_RATES={}
+        )
+        self.throttle_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.throttle_override.disable()
+        super(TestRunner, self).teardown_test_environment(**kwargs)
@@ -13,10 +13,12 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import re
+
 from django.contrib import admin
-from django.urls import path, include
-from django.conf.urls.static import static
+from django.urls import path, include, re_path
 from pyshop import settings
+from website.serving import serve_media, serve_static
 
 
 urlpatterns = [
@@ -28,6 +30,14 @@ urlpatterns = [
     path('api/', include('restapi.urls')),
 ]
 
-# включить разрешения на чтение папки мультимедиа
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
-urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
+# файлы мультимедиа и статические файлы (см. SENDFILE_BACKEND)
+urlpatterns += [
+    re_path(
+        r'^{}(?P<path>.+)$'.format(re.escape(settings.MEDIA_URL.lstrip('/'))),
+        serve_media
+    ),
+    re_path(
+        r'^{}(?P<path>.+)$'.format(re.escape(settings.STATIC_URL.lstrip('/'))),
+        serve_static
+    ),
+]
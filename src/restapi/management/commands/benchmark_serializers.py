@@ -0,0 +1,96 @@
+""" Compares ProductSerializer with the ValuesSerializer fast path """
+
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+
+from restapi.serializers import ProductSerializer, ValuesSerializer
+from website.models import Category, Product, catalog_changes_muted
+
+
+class Command(BaseCommand):
+    """ Serializes and renders the same products with both paths, checks
+    that the JSON is byte-identical and prints the timings. The products are
+    created in a transaction that is rolled back, without the side effects
+    of a catalog change (search index, cache versions, change log,
+    renditions), which would outlive it.
+    """
+
+    help = 'Benchmark ProductSerializer against the values() fast path'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument(
+            '--host', default='localhost',
+            help='host of the request used to build the image urls'
+        )
+
+    def handle(self, *args, **options):
+        with catalog_changes_muted(), transaction.atomic():
+            self.create_products(options['count'])
+            regular, fast = self.run(options['repeat'], options['host'])
+            transaction.set_rollback(True)
+
+        self.stdout.write('products:   {}'.format(options['count']))
+        self.stdout.write('serializer: {:.1f} ms'.format(regular * 1000))
+        self.stdout.write('values():   {:.1f} ms'.format(fast * 1000))
+        self.stdout.write('speedup:    {:.1f}x'.format(regular / fast))
+
+    @staticmethod
+    def create_products(count):
+        category = Category.objects.create(description='Benchmark')
+        Product.objects.bulk_create([
+            Product(
+                barcode='bench-{}'.format(number),
+                title='Benchmark product {}'.format(number),
+                description='Product created by benchmark_serializers',
+                image='benchmark/{}.jpg'.format(number),
+                # known size: the missing images aren't looked for
+                image_width=640, image_height=480,
+                price=Decimal(number) / 7, category=category
+            )
+            for number in range(count)
+        ])
+
+    def run(self, repeat, host):
+        """ Returns the best time of each path over repeat runs """
+
+        context = {
+            'request': RequestFactory().get(
+                '/api/v1/products/', HTTP_HOST=host
+            )
+        }
+        queryset = Product.objects.filter(barcode__startswith='bench-') \
+            .order_by('barcode')
+        renderer = JSONRenderer()
+
+        def regular():
+            serializer = ProductSerializer(
+                list(queryset), many=True, context=context
+            )
+            return renderer.render(serializer.data)
+
+        def fast():
+            fast_serializer = ValuesSerializer.build(
+                ProductSerializer(context=context), queryset
+            )
+            rows = queryset.values(*fast_serializer.sources)
+            return renderer.render(fast_serializer.to_representation(rows))
+
+        if regular() != fast():
+            raise CommandError('The fast path renders a different JSON')
+        return self.best_time(regular, repeat), self.best_time(fast, repeat)
+
+    @staticmethod
+    def best_time(function, repeat):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - start)
+        return min(times)
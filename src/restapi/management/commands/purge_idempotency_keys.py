@@ -0,0 +1,21 @@
+""" Deletes the expired Idempotency-Key responses """
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from restapi.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    """ Evicts the IdempotencyKey rows past their expires_at. Expired rows
+    are already ignored (and reused) by the create views, so this only
+    keeps the table small; run it periodically, e.g. from cron.
+    """
+
+    help = 'Delete the expired Idempotency-Key responses'
+
+    def handle(self, *args, **options):
+        deleted, _ = IdempotencyKey.objects.filter(
+            expires_at__lte=timezone.now()
+        ).delete()
+        self.stdout.write('Deleted {} expired keys'.format(deleted))
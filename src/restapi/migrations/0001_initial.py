@@ -0,0 +1,30 @@
+# Generated by Django 2.2.28 on 2026-10-18 15:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True, verbose_name='Key')),
+                ('request_hash', models.CharField(max_length=64, verbose_name='RequestHash')),
+                ('status_code', models.PositiveSmallIntegerField(null=True, verbose_name='StatusCode')),
+                ('content_type', models.CharField(blank=True, max_length=100, verbose_name='ContentType')),
+                ('body', models.BinaryField(blank=True, verbose_name='Body')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='ExpiresAt')),
+            ],
+            options={
+                'verbose_name': 'IdempotencyKey',
+                'verbose_name_plural': 'IdempotencyKeys',
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+import hashlib
+
+from django.db import models
+from django.utils.translation import gettext_lazy
+
+
+class IdempotencyKey(models.Model):
+    """ Ответ, сохраненный для заголовка Idempotency-Key запроса на создание
+
+    A retried request with the same key gets the stored response back
+    instead of being executed again. While the first request runs the row
+    has no status_code and expires quickly, so a crashed request doesn't
+    block its retries for long.
+    """
+
+    # sha256 of the user, the path and the header value
+    key = models.CharField(
+        unique=True, max_length=64, verbose_name=gettext_lazy('Key')
+    )
+    # sha256 of the parsed payload, to detect a key reused for another one
+    request_hash = models.CharField(
+        max_length=64, verbose_name=gettext_lazy('RequestHash')
+    )
+    status_code = models.PositiveSmallIntegerField(
+        null=True, verbose_name=gettext_lazy('StatusCode')
+    )
+    content_type = models.CharField(
+        max_length=100, blank=True, verbose_name=gettext_lazy('ContentType')
+    )
+    body = models.BinaryField(blank=True, verbose_name=gettext_lazy('Body'))
+    expires_at = models.DateTimeField(
+        db_index=True, verbose_name=gettext_lazy('ExpiresAt')
+    )
+
+    class Meta:
+        """ Мета-класс IdempotencyKey """
+
+        verbose_name = gettext_lazy('IdempotencyKey')
+        verbose_name_plural = gettext_lazy('IdempotencyKeys')
+
+    def __str__(self):
+        return 'IdempotencyKey - {}'.format(self.key)
+
+    def __repr__(self):
+        return 'IdempotencyKey(key={},status_code={},expires_at={})'.format(
+            self.key, self.status_code, self.expires_at
+        )
+
+    @staticmethod
+    def digest(*parts):
+        """ Returns the sha256 hex digest of the str of parts """
+
+        return hashlib.sha256(
+            '\n'.join(str(part) for part in parts).encode('utf-8')
+        ).hexdigest()
@@ -0,0 +1,22 @@
+""" restapi pagination module """
+
+from rest_framework import pagination
+
+
+class CursorPagination(pagination.CursorPagination):
+    """ Cursor pagination of the list endpoints. Pages are fetched with a
+    ``WHERE`` on the sort column instead of an OFFSET, so deep pages cost the
+    same as the first one. The sort column is the ``ordering`` of the view
+    (the primary key by default) and should be unique.
+    """
+
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    ordering = 'pk'
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, 'ordering', None) or self.ordering
+        if isinstance(ordering, str):
+            return (ordering, )
+        return tuple(ordering)
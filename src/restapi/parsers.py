@@ -0,0 +1,86 @@
+""" restapi parsers module """
+
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+
+from .renderers import MessagePackRenderer, msgpack, orjson
+
+
+class FastJSONParser(JSONParser):
+    """ JSONParser decoding with orjson when it is installed. Bodies that
+    aren't UTF-8 and non-strict parsing are left to JSONParser.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or not self.strict or \
+                encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+            return super(FastJSONParser, self).parse(
+                stream, media_type, parser_context
+            )
+
+        try:
+            return orjson.loads(stream.read())
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % exc)
+
+
+class MessagePackParser(BaseParser):
+    """ Parser for MessagePack bodies. Map keys must be strings """
+
+    media_type = MessagePackRenderer.media_type
+    renderer_class = MessagePackRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, TypeError, msgpack.ExtraData,
+                msgpack.FormatError, msgpack.StackError) as exc:
+            raise ParseError('MessagePack parse error - %s' % exc)
+
+
+class NDJSONLine:
+    """ A line of a NDJSON payload: its number (from 1) and the decoded
+    object, or the decoding error
+    """
+
+    def __init__(self, number, data=None, error=None):
+        self.number = number
+        self.data = data
+        self.error = error
+
+
+class NDJSONParser(BaseParser):
+    """ Parser for newline delimited JSON. Returns a lazy iterator of
+    NDJSONLine: the body is read one line at a time while the view consumes
+    it, so memory doesn't depend on the size of the payload. Blank lines are
+    skipped.
+    """
+
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if stream is None:
+            return iter(())
+        return self.iter_lines(stream, encoding)
+
+    @staticmethod
+    def iter_lines(stream, encoding):
+        for number, raw_line in enumerate(stream, start=1):
+            try:
+                line = raw_line.decode(encoding).strip()
+            except UnicodeDecodeError as exc:
+                yield NDJSONLine(number, error=str(exc))
+                continue
+            if not line:
+                continue
+            try:
+                yield NDJSONLine(number, data=json.loads(line))
+            except ValueError as exc:
+                yield NDJSONLine(number, error=str(exc))
@@ -1,12 +1,236 @@
-from rest_framework import serializers
+import decimal
 
+from django.core.exceptions import FieldDoesNotExist, \
+    SuspiciousFileOperation, ValidationError as DjangoValidationError
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import connection, models
+from django.utils import timezone
+from django.utils.encoding import filepath_to_uri
+from django.utils.translation import gettext
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+from website.cache import get_categories, get_payment_methods
 from website.models import (
+    CatalogChange,
     Category,
     Product,
     PaymentMethod,
     PurchaseOrder,
-    PurchaseItem
+    PurchaseItem,
+    PurchasePaymentMethod
 )
+from website.utils import decimal_field_max
+
+
+class CachedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """ PrimaryKeyRelatedField resolving primary keys from the objects
+    already loaded for the request (kept in the serializer context) instead
+    of one SELECT per value. BulkListSerializer loads the values of a whole
+    payload with one in_bulk query per field; categories and payment
+    methods come from the process-local caches of website.cache.
+    """
+
+    local_caches = {
+        Category: get_categories,
+        PaymentMethod: get_payment_methods,
+    }
+
+    def to_internal_value(self, data):
+        if self.pk_field is not None:
+            return super(CachedPrimaryKeyRelatedField, self) \
+                .to_internal_value(data)
+
+        queryset = self.get_queryset()
+        if queryset.query.where:
+            # filtered choices (e.g. limit_choices_to) aren't shared
+            return super(CachedPrimaryKeyRelatedField, self) \
+                .to_internal_value(data)
+        pk = self.to_pk(queryset.model, data)
+        objs = self.get_objects(queryset.model)
+        if pk not in objs:
+            objs.update(self.load(queryset, [pk]))
+        obj = objs[pk]
+        if obj is None:
+            self.fail('does_not_exist', pk_value=data)
+        return obj
+
+    def prefetch(self, values):
+        """ Loads the objects of values, a list of raw payload values, with
+        a single query. Invalid values are left to to_internal_value
+        """
+
+        queryset = self.get_queryset()
+        if queryset.query.where:
+            return
+        objs = self.get_objects(queryset.model)
+        pks = set()
+        for value in values:
+            try:
+                pks.add(self.to_pk(queryset.model, value))
+            except serializers.ValidationError:
+                continue
+        pks.difference_update(objs)
+        if pks:
+            objs.update(self.load(queryset, pks))
+
+    def to_pk(self, model, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return model._meta.pk.to_python(data)
+        except (DjangoValidationError, TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+    def get_objects(self, model):
+        """ Returns the pk -> object (None when missing) dict of model
+        shared by the serializers of the request
+        """
+
+        related_objects = self.context.setdefault('related_objects', {})
+        if model not in related_objects:
+            related_objects[model] = {}
+            load_all = self.local_caches.get(model)
+            if load_all is not None:
+                related_objects[model].update(
+                    (obj.pk, obj) for obj in load_all()
+                )
+        return related_objects[model]
+
+    @staticmethod
+    def load(queryset, pks):
+        objs = dict.fromkeys(pks)
+        objs.update(queryset.in_bulk(list(pks)))
+        return objs
+
+
+class BulkListSerializer(serializers.ListSerializer):
+    """ ListSerializer that creates all its objects with a single
+    bulk_create. Besides the validation of every item, values that must be
+    unique are checked against the other items of the payload. Errors are
+    reported in a list aligned with the payload.
+    """
+
+    # objects per INSERT statement
+    batch_size = 500
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list) or not data:
+            return super(BulkListSerializer, self).to_internal_value(data)
+
+        validated_data, errors = self.validate_items(data)
+        if not any(errors):
+            self.check_unique(validated_data, errors)
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return validated_data
+
+    def validate_items(self, data):
+        """ Validates every item of data without stopping at the first
+        invalid one. Returns the validated attrs (None for invalid items) and
+        the errors, both aligned with data
+        """
+
+        self.prefetch_related(data)
+        validated_data = []
+        errors = []
+        for item in data:
+            try:
+                validated_data.append(self.child.run_validation(item))
+                errors.append({})
+            except serializers.ValidationError as exc:
+                validated_data.append(None)
+                errors.append(exc.detail)
+        return validated_data, errors
+
+    def prefetch_related(self, data):
+        """ Loads the related objects referenced by data with one query per
+        CachedPrimaryKeyRelatedField of the child
+        """
+
+        for field in self.child.fields.values():
+            if isinstance(field, CachedPrimaryKeyRelatedField) and \
+                    not field.read_only:
+                field.prefetch([
+                    item[field.field_name] for item in data
+                    if isinstance(item, dict) and
+                    item.get(field.field_name) is not None
+                ])
+
+    def check_unique(self, validated_data, errors):
+        """ Flags, in place, the valid items repeating a unique value of an
+        earlier item: their error is set and their attrs replaced by None
+        """
+
+        for fields in self.unique_field_sets():
+            seen = set()
+            for index, attrs in enumerate(validated_data):
+                if attrs is None or \
+                        not all(field in attrs for field in fields):
+                    continue
+                value = tuple(attrs[field] for field in fields)
+                if value in seen:
+                    errors[index][fields[0]] = [
+                        gettext('DuplicatedInPayload')
+                    ]
+                    validated_data[index] = None
+                seen.add(value)
+
+    def unique_field_sets(self):
+        """ Returns the field name tuples of the child's model that must be
+        unique
+        """
+
+        opts = self.child.Meta.model._meta
+        field_sets = [
+            (field.name, ) for field in opts.concrete_fields
+            if field.unique and not isinstance(field, models.AutoField)
+        ]
+        field_sets.extend(tuple(fields) for fields in opts.unique_together)
+        return field_sets
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        objs = [model(**attrs) for attrs in validated_data]
+        model.objects.bulk_create(objs, batch_size=self.batch_size)
+        self.set_auto_pks(model, objs)
+        return objs
+
+    @staticmethod
+    def set_auto_pks(model, objs):
+        """ Fills the AutoField primary keys that bulk_create can't return
+        on SQLite. The caller holds the write lock of the transaction, so the
+        rows just inserted got the highest consecutive ids.
+        """
+
+        pk = model._meta.pk
+        if not objs or objs[-1].pk is not None or \
+                not isinstance(pk, models.AutoField) or \
+                connection.vendor != 'sqlite':
+            return
+        last_id = model.objects.aggregate(last_id=models.Max(pk.name))[
+            'last_id'
+        ]
+        for offset, obj in enumerate(reversed(objs)):
+            setattr(obj, pk.attname, last_id - offset)
+
+
+class StoredImageField(serializers.ImageField):
+    """ ImageField that also accepts the name of an image that is already in
+    the media storage, which is how JSON payloads (e.g. bulk ones) refer to
+    images
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) and data:
+            try:
+                exists = default_storage.exists(data)
+            except SuspiciousFileOperation:
+                exists = False
+            if not exists:
+                self.fail('invalid')
+            return data
+        return super(StoredImageField, self).to_internal_value(data)
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -17,16 +241,25 @@ class CategorySerializer(serializers.ModelSerializer):
 
         model = Category
         fields = '__all__'
+        list_serializer_class = BulkListSerializer
 
 
 class ProductSerializer(serializers.ModelSerializer):
     """ Сериализатор для модели продукта """
 
+    serializer_related_field = CachedPrimaryKeyRelatedField
+
+    image = StoredImageField()
+
     class Meta:
         """ Мета-класс ProductSerializer """
 
         model = Product
-        exclude = ('slug', )
+        # the image size and placeholder are rendering details of the site
+        exclude = (
+            'slug', 'image_width', 'image_height', 'image_placeholder',
+        )
+        list_serializer_class = BulkListSerializer
 
 
 class PaymentMethodSerializer(serializers.ModelSerializer):
@@ -37,23 +270,383 @@ class PaymentMethodSerializer(serializers.ModelSerializer):
 
         model = PaymentMethod
         fields = '__all__'
+        list_serializer_class = BulkListSerializer
 
 
 class PurchaseOrderSerializer(serializers.ModelSerializer):
     """ Сериализатор для модели заказа на покупку """
 
+    serializer_related_field = CachedPrimaryKeyRelatedField
+
     class Meta:
         """ Мета-класс PurchaseOrderSerializer """
 
         model = PurchaseOrder
         fields = '__all__'
+        list_serializer_class = BulkListSerializer
+
+    def validate(self, attrs):
+        """ Rejects a second open cart (cart=True) for the same user """
+
+        user = attrs.get('user', getattr(self.instance, 'user', None))
+        cart = attrs.get('cart', getattr(self.instance, 'cart', False))
+        if cart and user is not None:
+            open_carts = PurchaseOrder.objects.filter(user=user, cart=True)
+            if self.instance is not None:
+                open_carts = open_carts.exclude(pk=self.instance.pk)
+            if open_carts.exists():
+                raise serializers.ValidationError(
+                    {'cart': gettext('UserAlreadyHasOpenCart')}
+                )
+        return attrs
+
+
+class PurchaseOrderTotalsSerializer(PurchaseOrderSerializer):
+    """ Сериализатор заказа на покупку с итогами, вычисленными в БД
+    (PurchaseOrder.objects.with_totals())
+    """
+
+    item_count = serializers.IntegerField(read_only=True)
+    items_total = serializers.DecimalField(
+        max_digits=14, decimal_places=3, read_only=True
+    )
+    payments_total = serializers.DecimalField(
+        max_digits=14, decimal_places=3, read_only=True
+    )
 
 
 class PurchaseItemSerializer(serializers.ModelSerializer):
     """ Сериализатор для модели PurchaseItem """
 
+    serializer_related_field = CachedPrimaryKeyRelatedField
+
+    image = StoredImageField()
+
     class Meta:
         """ Мета-класс PurchaseItemSerializer """
 
         model = PurchaseItem
         fields = '__all__'
+        list_serializer_class = BulkListSerializer
+
+
+class CheckoutItemSerializer(serializers.Serializer):
+    """ Позиция заказа в запросе оформления: продукт и количество """
+
+    barcode = serializers.CharField(max_length=20)
+    quantity = serializers.DecimalField(
+        max_digits=8, decimal_places=3, min_value=decimal.Decimal('0.001')
+    )
+    price = serializers.DecimalField(
+        max_digits=8, decimal_places=3, read_only=True
+    )
+    total_price = serializers.DecimalField(
+        max_digits=8, decimal_places=3, read_only=True
+    )
+
+
+class CheckoutPaymentSerializer(serializers.Serializer):
+    """ Оплата в запросе оформления: способ оплаты и сумма """
+
+    payment_method = serializers.IntegerField(source='payment_method_id')
+    value = serializers.DecimalField(
+        max_digits=8, decimal_places=3, min_value=decimal.Decimal('0')
+    )
+
+
+class CheckoutSerializer(PurchaseOrderSerializer):
+    """ Сериализатор оформления заказа вместе с позициями и оплатами
+
+    Products and payment methods are looked up with one query per model
+    for the whole payload, and create writes the order, its items and its
+    payments with one INSERT each (the view runs it in a transaction).
+    """
+
+    items = CheckoutItemSerializer(many=True, allow_empty=False)
+    payments = CheckoutPaymentSerializer(many=True, required=False)
+
+    class Meta(PurchaseOrderSerializer.Meta):
+        """ Мета-класс CheckoutSerializer """
+
+        fields = ('id', 'timestamp', 'user', 'cart', 'items', 'payments')
+        list_serializer_class = serializers.ListSerializer
+
+    def validate(self, attrs):
+        attrs = super(CheckoutSerializer, self).validate(attrs)
+        attrs.setdefault('payments', [])
+
+        errors = {}
+        item_errors = self.resolve(
+            attrs['items'], 'barcode', Product, 'product'
+        )
+        # the total price is computed here, so it isn't validated by a field
+        max_total = decimal_field_max(
+            PurchaseItem._meta.get_field('total_price')
+        )
+        for item, item_error in zip(attrs['items'], item_errors):
+            if 'product' in item and \
+                    item['product'].price * item['quantity'] > max_total:
+                item_error['quantity'] = [gettext('TotalPriceTooLarge')]
+        if any(item_errors):
+            errors['items'] = item_errors
+        payment_errors = self.resolve(
+            attrs['payments'], 'payment_method_id', PaymentMethod,
+            'payment_method', field_name='payment_method'
+        )
+        if any(payment_errors):
+            errors['payments'] = payment_errors
+        if errors:
+            raise serializers.ValidationError(errors)
+        return attrs
+
+    @staticmethod
+    def resolve(entries, key, model, attr, field_name=None):
+        """ Sets entry[attr] to the model instance of entry[key] for every
+        entry, with at most one query (none for the models with a
+        process-local cache). Returns the errors aligned with entries
+        """
+
+        load_all = CachedPrimaryKeyRelatedField.local_caches.get(model)
+        objs = {obj.pk: obj for obj in load_all()} if load_all else {}
+        missing = {entry[key] for entry in entries}.difference(objs)
+        if missing:
+            objs.update(model.objects.in_bulk(missing))
+        errors = []
+        seen = set()
+        for entry in entries:
+            obj = objs.get(entry[key])
+            if obj is None:
+                errors.append({field_name or key: [gettext('DoesNotExist')]})
+            elif entry[key] in seen:
+                errors.append(
+                    {field_name or key: [gettext('DuplicatedInPayload')]}
+                )
+            else:
+                errors.append({})
+                entry[attr] = obj
+            seen.add(entry[key])
+        return errors
+
+    def create(self, validated_data):
+        items = validated_data.pop('items')
+        payments = validated_data.pop('payments')
+        purchase_order = PurchaseOrder.objects.create(**validated_data)
+
+        purchase_items = []
+        for item in items:
+            product = item['product']
+            purchase_items.append(PurchaseItem(
+                barcode=product.barcode, title=product.title,
+                description=product.description, image=product.image,
+                price=product.price, category_id=product.category_id,
+                purchase_order=purchase_order, quantity=item['quantity'],
+                total_price=product.price * item['quantity']
+            ))
+        purchase_order.items = PurchaseItem.objects.bulk_create(
+            purchase_items
+        )
+        purchase_order.payments = PurchasePaymentMethod.objects.bulk_create([
+            PurchasePaymentMethod(
+                purchase_order=purchase_order,
+                payment_method=payment['payment_method'],
+                value=payment['value']
+            )
+            for payment in payments
+        ])
+        return purchase_order
+
+
+class CatalogChangeSerializer(serializers.ModelSerializer):
+    """ Сериализатор журнала изменений каталога. Для сохранений data
+    содержит текущее состояние объекта (из context['objects'], заполненного
+    представлением), для удалений (надгробий) - null
+    """
+
+    serializer_classes = {
+        'category': CategorySerializer,
+        'product': ProductSerializer,
+    }
+
+    data = serializers.SerializerMethodField()
+
+    class Meta:
+        """ Мета-класс CatalogChangeSerializer """
+
+        model = CatalogChange
+        fields = ('seq', 'model', 'object_pk', 'action', 'timestamp', 'data')
+
+    def get_data(self, change):
+        if change.action == CatalogChange.DELETE:
+            return None
+        obj = self.context.get('objects', {}).get(
+            (change.model, change.object_pk)
+        )
+        if obj is None:
+            # deleted since: a tombstone follows later in the log
+            return None
+        return self.serializer_classes[change.model](
+            obj, context=self.context
+        ).data
+
+
+class ValuesSerializer:
+    """ Fast read-only path for long lists: rows fetched with values() are
+    mapped straight to dicts by per-field converters precomputed from a
+    bound ModelSerializer, instead of running its to_representation for
+    every object. The output is identical to serializer.data.
+
+    Only plain model columns are supported; build returns None for
+    serializers with other kinds of fields, which keep the regular path.
+    """
+
+    simple_fields = (
+        serializers.BooleanField,
+        serializers.CharField,
+        serializers.FloatField,
+        serializers.IntegerField,
+        serializers.ReadOnlyField,
+    )
+
+    def __init__(self, columns):
+        # (output name, values() key, converter)
+        self.columns = columns
+
+    @classmethod
+    def build(cls, serializer, queryset):
+        """ Returns a ValuesSerializer equivalent to serializer (a child
+        ModelSerializer) for the rows of queryset, or None
+        """
+
+        opts = queryset.model._meta
+        annotations = queryset.query.annotations
+        columns = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            source = field.source
+            model_field = None
+            if source not in annotations:
+                try:
+                    model_field = opts.get_field(source)
+                except FieldDoesNotExist:
+                    return None
+                if not model_field.concrete or model_field.many_to_many:
+                    return None
+            converter = cls.get_converter(
+                field, model_field, serializer.context
+            )
+            if converter is None:
+                return None
+            columns.append((name, source, converter))
+        return cls(columns)
+
+    @classmethod
+    def get_converter(cls, field, model_field, context):
+        """ Returns the function converting a non-null value of field """
+
+        if isinstance(field, serializers.DecimalField):
+            return cls.decimal_converter(field)
+        if isinstance(field, serializers.FileField):
+            if model_field is None:
+                return None
+            return cls.file_converter(field, model_field.storage, context)
+        if isinstance(field, serializers.DateTimeField):
+            return cls.datetime_converter(field)
+        if isinstance(field, serializers.PrimaryKeyRelatedField):
+            return None if field.pk_field is not None else _identity
+        if isinstance(field, cls.simple_fields):
+            return field.to_representation
+        return None
+
+    @staticmethod
+    def decimal_converter(field):
+        if not getattr(field, 'coerce_to_string',
+                       api_settings.COERCE_DECIMAL_TO_STRING) or \
+                field.localize:
+            return None
+        if field.decimal_places is None:
+            return '{0:f}'.format
+        exponent = decimal.Decimal('.1') ** field.decimal_places
+        context = decimal.getcontext().copy()
+        if field.max_digits is not None:
+            context.prec = field.max_digits
+        rounding = field.rounding
+
+        def convert(value):
+            if not isinstance(value, decimal.Decimal):
+                value = decimal.Decimal(str(value).strip())
+            return '{0:f}'.format(
+                value.quantize(exponent, rounding=rounding, context=context)
+            )
+        return convert
+
+    @staticmethod
+    def file_converter(field, storage, context):
+        if not getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL):
+            return lambda name: name or None
+        request = context.get('request')
+
+        def url(name):
+            if request is None:
+                return storage.url(name)
+            return request.build_absolute_uri(storage.url(name))
+
+        url_method = getattr(storage.url, '__func__', None)
+        if url_method is not FileSystemStorage.url or \
+                '/.' in storage.base_url:
+            return lambda name: url(name) if name else None
+
+        # FileSystemStorage.url joins the quoted name to base_url: without
+        # "." segments or empty ones, that join (and making it absolute) is
+        # a plain concatenation to a prefix computed once
+        prefix = storage.base_url if request is None \
+            else request.build_absolute_uri(storage.base_url)
+
+        def convert(name):
+            if not name:
+                return None
+            path = filepath_to_uri(name).lstrip('/')
+            if '/.' in '/' + path or '//' in path:
+                return url(name)
+            return prefix + path
+        return convert
+
+    @staticmethod
+    def datetime_converter(field):
+        output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+        if output_format is None or \
+                output_format.lower() != ISO_8601:
+            return None
+        field_timezone = getattr(field, 'timezone', field.default_timezone())
+
+        def convert(value):
+            if field_timezone is not None:
+                if timezone.is_aware(value):
+                    value = value.astimezone(field_timezone)
+                else:
+                    value = timezone.make_aware(value, field_timezone)
+            elif timezone.is_aware(value):
+                value = timezone.make_naive(value, timezone.utc)
+            value = value.isoformat()
+            if value.endswith('+00:00'):
+                value = value[:-6] + 'Z'
+            return value
+        return convert
+
+    @property
+    def sources(self):
+        return [source for _, source, _ in self.columns]
+
+    def to_representation(self, rows):
+        columns = self.columns
+        return [
+            {
+                name: None if row[source] is None else convert(row[source])
+                for name, source, convert in columns
+            }
+            for row in rows
+        ]
+
+
+def _identity(value):
+    return value
@@ -0,0 +1,115 @@
+""" This module tests restapi app renderers and parsers """
+
+import datetime
+import io
+import unittest
+import uuid
+from decimal import Decimal
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework import status
+from rest_framework.exceptions import ErrorDetail, ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from website.models import Category
+from ..parsers import FastJSONParser, MessagePackParser
+from ..renderers import FastJSONRenderer, MessagePackRenderer, msgpack
+
+
+DATA = {
+    'price': Decimal('10.500'),
+    'title': gettext_lazy('Title'),
+    'error': ErrorDetail('Invalid', code='invalid'),
+    'timestamp': datetime.datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+    'date': datetime.date(2026, 1, 2),
+    'uuid': uuid.UUID('12345678123456781234567812345678'),
+    'text': 'Çà va   ok',
+    'nested': [{1: 'index keys'}, None, True, 1.5],
+}
+
+
+class FastJSONRendererTest(TestCase):
+    """ Test case for FastJSONRenderer """
+
+    def test_same_output(self):
+        """ Test that the output is the one of JSONRenderer """
+
+        self.assertEqual(
+            FastJSONRenderer().render(DATA), JSONRenderer().render(DATA)
+        )
+
+    def test_indent(self):
+        """ Test that indented output is still supported """
+
+        self.assertEqual(
+            FastJSONRenderer().render(DATA, 'application/json; indent=4'),
+            JSONRenderer().render(DATA, 'application/json; indent=4')
+        )
+
+
+class FastJSONParserTest(TestCase):
+    """ Test case for FastJSONParser """
+
+    def test_same_result(self):
+        """ Test that bodies are parsed like JSONParser does """
+
+        body = '{"title": "Ç", "price": 10.5, "items": [1, null]}'.encode()
+
+        self.assertEqual(
+            FastJSONParser().parse(io.BytesIO(body)),
+            JSONParser().parse(io.BytesIO(body))
+        )
+
+    def test_invalid(self):
+        """ Test that invalid and non-strict bodies are rejected """
+
+        for body in (b'{"a": ', b'{"a": NaN}'):
+            with self.assertRaises(ParseError):
+                FastJSONParser().parse(io.BytesIO(body))
+
+
+@unittest.skipIf(msgpack is None, 'msgpack is not installed')
+class MessagePackTest(TestCase):
+    """ Test case for the MessagePack renderer and parser """
+
+    def test_round_trip(self):
+        """ Test that values are converted like in JSON """
+
+        data = dict(DATA, nested=[{'1': 'index keys'}, None, True, 1.5])
+        rendered = MessagePackRenderer().render(data)
+
+        self.assertEqual(
+            MessagePackParser().parse(io.BytesIO(rendered)),
+            FastJSONParser().parse(io.BytesIO(JSONRenderer().render(data)))
+        )
+
+    def test_invalid(self):
+        """ Test that invalid bodies are rejected """
+
+        with self.assertRaises(ParseError):
+            MessagePackParser().parse(io.BytesIO(b'\xc1'))
+
+    def test_negotiation(self):
+        """ Test that the format is chosen by Accept and Content-Type """
+
+        client = APIClient()
+        response = client.post(
+            reverse('restapi:categories'),
+            msgpack.packb({'description': 'Kitchen'}),
+            content_type='application/msgpack',
+            HTTP_ACCEPT='application/msgpack'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(
+            msgpack.unpackb(response.content, raw=False)['description'],
+            'Kitchen'
+        )
+        self.assertTrue(Category.objects.filter(description='Kitchen')
+                        .exists())
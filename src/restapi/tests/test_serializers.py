@@ -2,10 +2,16 @@
 
 import os
 from shutil import copyfile
+from unittest import mock
+
+from io import StringIO
 
 from django.contrib.auth.models import User
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
 from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
 
 from pyshop.settings import BASE_DIR
 from website.models import (
@@ -15,12 +21,17 @@ from website.models import (
     PurchaseOrder,
     PurchaseItem
 )
+from website.cache import CATALOG_VERSION_KEY, get_categories, \
+    get_version
 from ..serializers import (
+    CachedPrimaryKeyRelatedField,
     CategorySerializer,
     ProductSerializer,
     PaymentMethodSerializer,
     PurchaseOrderSerializer,
     PurchaseItemSerializer,
+    PurchaseOrderTotalsSerializer,
+    ValuesSerializer
 )
 
 
@@ -125,6 +136,16 @@ class ProductSerializerTest(TestCase):
             self.serializer.data['category']
         )
 
+    def test_image_info_excluded(self):
+        """ Test that the image size and placeholder aren't exposed """
+
+        fast_serializer = ValuesSerializer.build(
+            ProductSerializer(), Product.objects.all()
+        )
+        for field in ('image_width', 'image_height', 'image_placeholder'):
+            self.assertNotIn(field, self.serializer.data)
+            self.assertNotIn(field, fast_serializer.sources)
+
     def test_blank_barcode(self):
         """ Test using blank barcode value """
 
@@ -294,6 +315,17 @@ class PurchaseOrderSerializerTest(TestCase):
             str(serializer.errors.values())
         )
 
+    def test_second_open_cart(self):
+        """ Test that a user can't get two open carts """
+
+        PurchaseOrder.objects.create(
+            timestamp='2018-10-09T01:15:00Z', user=self.user, cart=True
+        )
+        serializer = PurchaseOrderSerializer(data=self.json)
+
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('cart', serializer.errors.keys())
+
     def test_cart_content(self):
         """ Test cart field value """
 
@@ -553,3 +585,135 @@ class PurchaseItemSerializerTest(TestCase):  # pylint: disable=R0902
         """ Remove the image uploaded after tests """
 
         os.remove(self.destination_path)
+
+
+class ValuesSerializerTest(TestCase):
+    """ Test case for the values() fast serialization path """
+
+    def setUp(self):
+        category = Category.objects.create(description='Kitchen')
+        Product.objects.bulk_create([
+            Product(barcode='1', title='Kettle', description='Kettle',
+                    image='kettle.jpg', price='10.5', category=category),
+            Product(barcode='2', title='Pan', description='Frying pan',
+                    image='pans/é pan 2.jpg', price='0.125',
+                    category=category),
+            Product(barcode='3', title='Pot', description='Pot',
+                    image='pots/../pot.jpg', price='3', category=category),
+            Product(barcode='4', title='Cup', description='Cup', image='',
+                    price='1', category=category),
+        ])
+        PaymentMethod.objects.create(description='Cash')
+        self.request = RequestFactory().get('/api/v1/products/')
+
+    def assertSameJSON(self, serializer_class, queryset, context):
+        renderer = JSONRenderer()
+        fast_serializer = ValuesSerializer.build(
+            serializer_class(context=context), queryset
+        )
+        self.assertIsNotNone(fast_serializer)
+        self.assertEqual(
+            renderer.render(fast_serializer.to_representation(
+                queryset.values(*fast_serializer.sources)
+            )),
+            renderer.render(
+                serializer_class(queryset, many=True, context=context).data
+            )
+        )
+
+    def test_byte_identical(self):
+        """ Test that the fast path renders the same JSON """
+
+        for context in ({}, {'request': self.request}):
+            self.assertSameJSON(
+                ProductSerializer, Product.objects.order_by('barcode'),
+                context
+            )
+            self.assertSameJSON(
+                CategorySerializer, Category.objects.all(), context
+            )
+            self.assertSameJSON(
+                PaymentMethodSerializer, PaymentMethod.objects.all(), context
+            )
+
+    @override_settings(TIME_ZONE='America/Sao_Paulo')
+    def test_byte_identical_timezone(self):
+        """ Test that datetimes are converted like the serializer does """
+
+        self.assertSameJSON(
+            ProductSerializer, Product.objects.order_by('barcode'), {}
+        )
+
+    def test_unsupported_fields(self):
+        """ Test that serializers with computed fields aren't mapped """
+
+        self.assertIsNone(ValuesSerializer.build(
+            PurchaseOrderTotalsSerializer(), PurchaseOrder.objects.all()
+        ))
+
+    def test_benchmark_command(self):
+        """ Test that the benchmark checks both paths and reports them """
+
+        stdout = StringIO()
+        version = get_version(CATALOG_VERSION_KEY)
+        with mock.patch('website.models.schedule_renditions') as schedule:
+            call_command(
+                'benchmark_serializers', count=20, repeat=1,
+                host='testserver', stdout=stdout
+            )
+
+        self.assertIn('speedup', stdout.getvalue())
+        self.assertFalse(
+            Product.objects.filter(barcode__startswith='bench-').exists()
+        )
+        # the rolled back products left no trace outside the database
+        self.assertEqual(get_version(CATALOG_VERSION_KEY), version)
+        schedule.assert_not_called()
+
+
+class CachedPrimaryKeyRelatedFieldTest(TestCase):
+    """ Test case for the related field resolving pks without N+1 queries """
+
+    def setUp(self):
+        cache.clear()
+        self.users = [
+            User.objects.create_user(username='user{}'.format(number))
+            for number in range(10)
+        ]
+        self.category = Category.objects.create(description='Kitchen')
+
+    def validate_orders(self, users):
+        serializer = PurchaseOrderSerializer(data=[
+            {'user': user.id, 'timestamp': '2026-10-18T10:00:00Z',
+             'cart': False}
+            for user in users
+        ], many=True)
+        return serializer.is_valid()
+
+    def test_bulk_prefetch(self):
+        """ Test that the users of a payload are loaded in one query """
+
+        self.assertIsInstance(
+            PurchaseOrderSerializer().fields['user'],
+            CachedPrimaryKeyRelatedField
+        )
+        with self.assertNumQueries(1):
+            self.assertTrue(self.validate_orders(self.users[:2]))
+        with self.assertNumQueries(1):
+            self.assertTrue(self.validate_orders(self.users))
+
+    def test_process_local_cache(self):
+        """ Test that categories come from the process-local cache """
+
+        get_categories()
+        field = ProductSerializer(context={}).fields['category']
+
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                field.to_internal_value(str(self.category.id)), self.category
+            )
+        with self.assertNumQueries(1):
+            with self.assertRaises(serializers.ValidationError):
+                field.to_internal_value(self.category.id + 1)
+        with self.assertRaises(serializers.ValidationError):
+            field.to_internal_value('abc')
@@ -7,14 +7,44 @@ from django.test import TestCase
 class RESTAPIURLsTest(TestCase):
     """ Test case for the restapi app urls """
 
+    def test_catalog_changes_url(self):
+        """ Test catalog changes url """
+        self.assertEqual(
+            reverse('restapi:catalog-changes'), '/api/v1/catalog/changes/'
+        )
+
     def test_categories_url(self):
         """ Test categories url """
         self.assertEqual(reverse('restapi:categories'), '/api/v1/categories/')
 
+    def test_category_url(self):
+        """ Test category detail url """
+        self.assertEqual(
+            reverse('restapi:category', args=(1,)), '/api/v1/categories/1/'
+        )
+
+    def test_checkout_url(self):
+        """ Test checkout url """
+        self.assertEqual(reverse('restapi:checkout'), '/api/v1/checkout/')
+
     def test_products_url(self):
         """ Test products url """
         self.assertEqual(reverse('restapi:products'), '/api/v1/products/')
 
+    def test_product_url(self):
+        """ Test product detail url """
+        self.assertEqual(
+            reverse('restapi:product', args=('123',)),
+            '/api/v1/products/123/'
+        )
+
+    def test_products_import_url(self):
+        """ Test products import url """
+        self.assertEqual(
+            reverse('restapi:products-import'),
+            '/api/v1/products/import/'
+        )
+
     def test_payment_methods_url(self):
         """ Test payment-methods url """
         self.assertEqual(
@@ -22,6 +52,13 @@ class RESTAPIURLsTest(TestCase):
             '/api/v1/payment-methods/'
         )
 
+    def test_payment_method_url(self):
+        """ Test payment method detail url """
+        self.assertEqual(
+            reverse('restapi:payment-method', args=(1,)),
+            '/api/v1/payment-methods/1/'
+        )
+
     def test_purchase_orders_url(self):
         """ Test purchase orders url """
         self.assertEqual(
@@ -29,6 +66,13 @@ class RESTAPIURLsTest(TestCase):
             '/api/v1/purchase-orders/'
         )
 
+    def test_purchase_order_url(self):
+        """ Test purchase order detail url """
+        self.assertEqual(
+            reverse('restapi:purchase-order', args=(1,)),
+            '/api/v1/purchase-orders/1/'
+        )
+
     def test_purchase_items_url(self):
         """ Test purchase items url """
         self.assertEqual(
@@ -1,22 +1,41 @@
 """ This module tests restapi app views """
 
+import json
 import os
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
 from django.contrib.auth.models import User
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import test, status
+from rest_framework.renderers import JSONRenderer
 
 from pyshop.settings import BASE_DIR
-from website.models import Category, Product, PaymentMethod, PurchaseOrder
+from website.models import Category, Product, PaymentMethod, \
+    PurchaseOrder, PurchaseItem, PurchasePaymentMethod
+from website.cache import get_payment_methods
+from website.images import delete_renditions
+from website.search import get_search_backend
+from website.tests.mixins import ThrottleTestMixin
+from ..models import IdempotencyKey
+from ..serializers import ProductSerializer
 
 
 def remove_uploaded_image(barcode):
     ''' Remove the image uploaded after tests '''
 
-    uploaded_image_path = Product.objects.get(
-        barcode=barcode
-    ).image.path
-    os.remove(uploaded_image_path)
+    uploaded_image = Product.objects.get(barcode=barcode).image
+    delete_renditions(uploaded_image.name)
+    os.remove(uploaded_image.path)
 
 
 class CategoryViewTest(test.APITransactionTestCase):
@@ -68,6 +87,7 @@ class CategoryViewTest(test.APITransactionTestCase):
         self.assertEqual(PaymentMethod.objects.count(), 0)
 
 
+@override_settings(IMAGE_RENDITION_WORKERS=0)
 class ProductViewTest(test.APITransactionTestCase):
     """ Test case for the Product Create view """
 
@@ -515,3 +535,715 @@ class PurchaseOrderViewTest(test.APITransactionTestCase):
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(PurchaseOrder.objects.count(), 0)
+
+
+class PurchaseOrderDetailViewTest(test.APITransactionTestCase):
+    """ Test case for the PurchaseOrder detail view """
+
+    def setUp(self):
+        self.user = User.objects.create(username='testuser')
+        self.category = Category.objects.create(description='Furniture')
+        self.purchase_order = PurchaseOrder.objects.create(
+            timestamp='2018-10-09T01:15:00Z', user=self.user, cart=False
+        )
+        for barcode, total_price in (('1', '10.500'), ('2', '4.250')):
+            PurchaseItem.objects.create(
+                barcode=barcode, title='Item', description='Item',
+                image='item.jpg', price=total_price, category=self.category,
+                purchase_order=self.purchase_order, quantity=1,
+                total_price=total_price
+            )
+        PurchasePaymentMethod.objects.create(
+            purchase_order=self.purchase_order,
+            payment_method=PaymentMethod.objects.create(description='Cash'),
+            value='14.750'
+        )
+        self.url = reverse(
+            'restapi:purchase-order', args=(self.purchase_order.id,)
+        )
+
+    def test_totals(self):
+        """ Test that the order comes with its totals """
+
+        self.client.force_authenticate(self.user)
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['item_count'], 2)
+        self.assertEqual(response.data['items_total'], '14.750')
+        self.assertEqual(response.data['payments_total'], '14.750')
+
+    def test_other_user(self):
+        """ Test that users only see their own orders """
+
+        self.client.force_authenticate(
+            User.objects.create(username='otheruser')
+        )
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_anonymous(self):
+        """ Test that anonymous requests are rejected """
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+@override_settings(IMAGE_RENDITION_WORKERS=0)
+class BulkCreateViewTest(test.APITransactionTestCase):
+    """ Test case for the JSON array payloads of the create views """
+
+    def setUp(self):
+        self.category = Category.objects.create(description='Furniture')
+        with open(os.path.join(
+                BASE_DIR, 'website/fixtures/', 'sample_image.jpg'), 'rb') \
+                as image:
+            self.image = default_storage.save(
+                'bulk_sample_image.jpg', File(image)
+            )
+
+    def tearDown(self):
+        delete_renditions(self.image)
+        default_storage.delete(self.image)
+
+    def get_product(self, barcode, title='Kettle'):
+        return {
+            'barcode': barcode,
+            'title': title,
+            'description': 'Electric kettle',
+            'image': self.image,
+            'price': '10.000',
+            'category': self.category.id
+        }
+
+    def test_bulk_categories(self):
+        """ Test creating categories from an array """
+
+        response = self.client.post(
+            reverse('restapi:categories'),
+            [{'description': 'Kitchen'}, {'description': 'Garden'}],
+            format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [category['id'] for category in response.data],
+            list(
+                Category.objects.filter(description__in=['Kitchen', 'Garden'])
+                .order_by('id').values_list('id', flat=True)
+            )
+        )
+
+    def test_bulk_products(self):
+        """ Test creating products from an array: slugs are generated and
+        the products can be searched
+        """
+
+        response = self.client.post(
+            reverse('restapi:products'),
+            [self.get_product(str(barcode)) for barcode in range(3)],
+            format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            sorted(Product.objects.values_list('slug', flat=True)),
+            ['kettle', 'kettle-2', 'kettle-3']
+        )
+        self.assertEqual(
+            get_search_backend().search(Product.objects.all(), 'kettle')
+            .count(),
+            3
+        )
+
+    def test_errors_by_index(self):
+        """ Test that errors are reported by item and nothing is inserted """
+
+        products = [self.get_product(str(barcode)) for barcode in range(4)]
+        products[1]['price'] = 'AAA'
+        products[3]['barcode'] = '0'
+
+        response = self.client.post(
+            reverse('restapi:products'), products, format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(list(response.data), [1])
+        self.assertIn('price', response.data[1])
+        self.assertEqual(Product.objects.count(), 0)
+
+        products[1]['price'] = '1.000'
+        response = self.client.post(
+            reverse('restapi:products'), products, format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(list(response.data), [3])
+        self.assertIn('barcode', response.data[3])
+
+    def test_unknown_image(self):
+        """ Test that images must already be in the storage """
+
+        product = self.get_product('1')
+        product['image'] = '../settings.py'
+
+        response = self.client.post(
+            reverse('restapi:products'), [product], format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('image', response.data[0])
+
+
+@override_settings(RESTAPI_IMPORT_CHUNK_SIZE=2, IMAGE_RENDITION_WORKERS=0)
+class ProductImportViewTest(test.APITransactionTestCase):
+    """ Test case for the NDJSON product import view """
+
+    def setUp(self):
+        self.category = Category.objects.create(description='Furniture')
+        with open(os.path.join(
+                BASE_DIR, 'website/fixtures/', 'sample_image.jpg'), 'rb') \
+                as image:
+            self.image = default_storage.save(
+                'import_sample_image.jpg', File(image)
+            )
+
+    def tearDown(self):
+        delete_renditions(self.image)
+        default_storage.delete(self.image)
+
+    def get_line(self, barcode, price='10.000'):
+        return json.dumps({
+            'barcode': barcode,
+            'title': 'Kettle',
+            'description': 'Electric kettle',
+            'image': self.image,
+            'price': price,
+            'category': self.category.id
+        })
+
+    def post_lines(self, lines):
+        response = self.client.post(
+            reverse('restapi:products-import'),
+            '\n'.join(lines) + '\n',
+            content_type='application/x-ndjson'
+        )
+        progress = [
+            json.loads(line)
+            for line in b''.join(response.streaming_content).splitlines()
+        ]
+        return response, progress
+
+    def test_import(self):
+        """ Test that the lines are imported by chunk and the progress is
+        streamed
+        """
+
+        response, progress = self.post_lines(
+            [self.get_line(str(barcode)) for barcode in range(5)]
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(
+            [(chunk['first_line'], chunk['last_line'], chunk['created'])
+             for chunk in progress[:-1]],
+            [(1, 2, 2), (3, 4, 2), (5, 5, 1)]
+        )
+        self.assertEqual(
+            progress[-1], {'created': 5, 'failed': 0, 'done': True}
+        )
+        self.assertEqual(
+            sorted(Product.objects.values_list('slug', flat=True)),
+            ['kettle', 'kettle-2', 'kettle-3', 'kettle-4', 'kettle-5']
+        )
+
+    def test_invalid_lines(self):
+        """ Test that invalid lines are reported by number and the valid
+        lines of their chunk are still imported
+        """
+
+        response, progress = self.post_lines([
+            self.get_line('1'),
+            '{"barcode": ',
+            self.get_line('2', price='AAA'),
+            self.get_line('3'),
+            '',
+            self.get_line('3'),
+            self.get_line('1'),
+        ])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(progress[0]['errors']), ['2'])
+        self.assertIn('price', progress[1]['errors']['3'])
+        # blank lines are skipped: lines 6 and 7 make up the third chunk
+        self.assertEqual(
+            (progress[2]['first_line'], progress[2]['last_line']), (6, 7)
+        )
+        self.assertIn('barcode', progress[2]['errors']['6'])
+        self.assertIn('barcode', progress[2]['errors']['7'])
+        self.assertEqual(
+            progress[-1], {'created': 2, 'failed': 4, 'done': True}
+        )
+        self.assertEqual(
+            sorted(Product.objects.values_list('barcode', flat=True)),
+            ['1', '3']
+        )
+
+    def test_unsupported_media_type(self):
+        """ Test that only NDJSON bodies are accepted """
+
+        response = self.client.post(
+            reverse('restapi:products-import'),
+            [json.loads(self.get_line('1'))],
+            format='json'
+        )
+
+        self.assertEqual(
+            response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+        )
+
+
+class ReadViewsTest(test.APITestCase):
+    """ Test case for the list and detail endpoints """
+
+    def setUp(self):
+        self.category = Category.objects.create(description='Furniture')
+        Product.objects.bulk_create([
+            Product(
+                barcode='{:03}'.format(number), title='Chair',
+                description='Wooden chair', image='chair.jpg',
+                price=number, category=self.category
+            )
+            for number in range(5)
+        ])
+        self.user = User.objects.create_user(username='buyer', password='1')
+        other = User.objects.create_user(username='other', password='1')
+        self.orders = [
+            PurchaseOrder.objects.create(
+                user=self.user, timestamp=timezone.now(), cart=False
+            )
+            for _ in range(3)
+        ]
+        PurchaseOrder.objects.create(
+            user=other, timestamp=timezone.now(), cart=False
+        )
+
+    def test_products_cursor_pagination(self):
+        """ Test that the products are paginated by cursor """
+
+        response = self.client.get(
+            reverse('restapi:products'), {'page_size': 2}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [product['barcode'] for product in response.data['results']],
+            ['000', '001']
+        )
+        barcodes = []
+        next_url = response.data['next']
+        while next_url:
+            response = self.client.get(next_url)
+            barcodes.extend(
+                product['barcode'] for product in response.data['results']
+            )
+            next_url = response.data['next']
+        self.assertEqual(barcodes, ['002', '003', '004'])
+
+    def test_sparse_fields(self):
+        """ Test that fields narrows the output and the loaded columns """
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('restapi:products'), {'fields': 'barcode,price'}
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data['results'][0], {'barcode': '000', 'price': '0.000'}
+        )
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"description"', queries[0]['sql'])
+        self.assertNotIn('"title"', queries[0]['sql'])
+
+    def test_values_list(self):
+        """ Test that the values() list renders what the serializer would """
+
+        response = self.client.get(reverse('restapi:products'))
+
+        self.assertEqual(
+            JSONRenderer().render(response.data['results']),
+            JSONRenderer().render(ProductSerializer(
+                Product.objects.order_by('barcode'), many=True,
+                context={'request': response.wsgi_request}
+            ).data)
+        )
+
+    def test_unknown_fields(self):
+        """ Test that unknown field names are rejected """
+
+        response = self.client.get(
+            reverse('restapi:products'), {'fields': 'barcode,weight'}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('fields', response.data)
+
+    def test_details(self):
+        """ Test the detail endpoints """
+
+        response = self.client.get(
+            reverse('restapi:product', args=('003',)), {'fields': 'title'}
+        )
+        self.assertEqual(response.data, {'title': 'Chair'})
+
+        response = self.client.get(
+            reverse('restapi:category', args=(self.category.id,))
+        )
+        self.assertEqual(response.data['description'], 'Furniture')
+
+        payment_method = PaymentMethod.objects.create(description='Cash')
+        response = self.client.get(
+            reverse('restapi:payment-method', args=(payment_method.id,))
+        )
+        self.assertEqual(response.data['description'], 'Cash')
+
+    def test_own_purchase_orders(self):
+        """ Test that users only list their own orders, newest first """
+
+        response = self.client.get(reverse('restapi:purchase-orders'))
+        self.assertIn(
+            response.status_code,
+            (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN)
+        )
+
+        self.client.force_authenticate(self.user)
+        response = self.client.get(
+            reverse('restapi:purchase-orders'), {'fields': 'id,item_count'}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data['results'],
+            [
+                {'id': order.id, 'item_count': 0}
+                for order in reversed(self.orders)
+            ]
+        )
+
+
+class CatalogChangesViewTest(test.APITestCase):
+    """ Test case for the catalog change log endpoint """
+
+    def setUp(self):
+        self.category = Category.objects.create(description='Kitchen')
+        for barcode in ('1111', '2222'):
+            Product.objects.create(
+                barcode=barcode, title='Kettle', description='Kettle',
+                image='kettle.jpg', price=10, category=self.category
+            )
+        Product.objects.filter(barcode='1111').delete()
+
+    def test_changes(self):
+        """ Test that saves carry the current object and deletes are
+        tombstones
+        """
+
+        response = self.client.get(reverse('restapi:catalog-changes'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        changes = response.data['results']
+        self.assertEqual(
+            [(change['model'], change['object_pk'], change['action'])
+             for change in changes],
+            [
+                ('category', str(self.category.id), 'save'),
+                ('product', '1111', 'save'),
+                ('product', '2222', 'save'),
+                ('product', '1111', 'delete'),
+            ]
+        )
+        self.assertEqual(changes[0]['data']['description'], 'Kitchen')
+        self.assertIsNone(changes[1]['data'])
+        self.assertEqual(changes[2]['data']['barcode'], '2222')
+        self.assertIsNone(changes[3]['data'])
+
+        response = self.client.get(
+            reverse('restapi:catalog-changes'),
+            {'since': changes[2]['seq']}
+        )
+        self.assertEqual(
+            [change['seq'] for change in response.data['results']],
+            [changes[3]['seq']]
+        )
+
+    def test_pages(self):
+        """ Test that the log is paginated with a constant number of queries
+        """
+
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                reverse('restapi:catalog-changes'), {'page_size': 3}
+            )
+
+        self.assertEqual(len(response.data['results']), 3)
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNone(response.data['next'])
+
+    def test_invalid_since(self):
+        """ Test that since must be a number """
+
+        response = self.client.get(
+            reverse('restapi:catalog-changes'), {'since': 'abc'}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class IdempotencyKeyTest(test.APITestCase):
+    """ Test case for the Idempotency-Key header of the create views """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', password='1')
+        self.client.force_authenticate(self.user)
+
+    def post_order(self, key, cart=False):
+        return self.client.post(
+            reverse('restapi:purchase-orders'),
+            {'user': self.user.id, 'timestamp': '2026-10-18T10:00:00Z',
+             'cart': cart},
+            format='json', HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def test_replay(self):
+        """ Test that a retry gets the stored response without creating
+        another object
+        """
+
+        response = self.post_order('order-1')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        with self.assertNumQueries(1):
+            replayed = self.post_order('order-1')
+
+        self.assertEqual(replayed.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(replayed.content, response.content)
+        self.assertEqual(replayed['Idempotent-Replayed'], 'true')
+        self.assertEqual(PurchaseOrder.objects.count(), 1)
+
+        self.assertEqual(
+            self.post_order('order-2').status_code, status.HTTP_201_CREATED
+        )
+        self.assertEqual(PurchaseOrder.objects.count(), 2)
+
+    def test_reused_key(self):
+        """ Test that a key can't be reused for another payload """
+
+        self.post_order('order-1')
+
+        response = self.post_order('order-1', cart=True)
+
+        self.assertEqual(
+            response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+
+    def test_in_progress(self):
+        """ Test that a retry of a running request is rejected """
+
+        IdempotencyKey.objects.create(
+            key=IdempotencyKey.digest(
+                self.user.pk, reverse('restapi:purchase-orders'), 'order-1'
+            ),
+            request_hash='', expires_at=timezone.now() + timedelta(minutes=1)
+        )
+
+        response = self.post_order('order-1')
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(PurchaseOrder.objects.count(), 0)
+
+    def test_expired(self):
+        """ Test that expired keys are executed again and purged """
+
+        self.post_order('order-1')
+        IdempotencyKey.objects.update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+
+        response = self.post_order('order-1', cart=True)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(PurchaseOrder.objects.count(), 2)
+
+        IdempotencyKey.objects.update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        call_command('purge_idempotency_keys', stdout=StringIO())
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+class CheckoutViewTest(test.APITestCase):
+    """ Test case for the checkout view """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', password='1')
+        category = Category.objects.create(description='Kitchen')
+        Product.objects.bulk_create([
+            Product(barcode=str(number), title='Cup', description='Cup',
+                    image='cup.jpg', price='2.500', category=category)
+            for number in range(10)
+        ])
+        self.cash = PaymentMethod.objects.create(description='Cash')
+        self.card = PaymentMethod.objects.create(description='Card')
+
+    def checkout(self, items, payments=(), cart=False):
+        return self.client.post(
+            reverse('restapi:checkout'),
+            {
+                'user': self.user.id, 'timestamp': '2026-10-18T10:00:00Z',
+                'cart': cart,
+                'items': [
+                    {'barcode': barcode, 'quantity': quantity}
+                    for barcode, quantity in items
+                ],
+                'payments': [
+                    {'payment_method': payment_method, 'value': value}
+                    for payment_method, value in payments
+                ],
+            },
+            format='json'
+        )
+
+    def test_checkout(self):
+        """ Test that the order, its items and payments are created """
+
+        response = self.checkout(
+            [('1', '2'), ('2', '1.5')],
+            [(self.cash.id, '5'), (self.card.id, '3.75')]
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        purchase_order = PurchaseOrder.objects.get(id=response.data['id'])
+        self.assertEqual(
+            list(purchase_order.purchaseitem_set.order_by('barcode')
+                 .values_list('barcode', 'quantity', 'total_price')),
+            [('1', Decimal('2'), Decimal('5')),
+             ('2', Decimal('1.5'), Decimal('3.75'))]
+        )
+        self.assertEqual(
+            purchase_order.purchasepaymentmethod_set.count(), 2
+        )
+        self.assertEqual(response.data['items'][1]['total_price'], '3.750')
+        self.assertEqual(
+            response.data['payments'][0],
+            {'payment_method': self.cash.id, 'value': '5.000'}
+        )
+
+    def test_queries_per_model(self):
+        """ Test that the number of queries doesn't depend on the number of
+        items and payments
+        """
+
+        get_payment_methods()
+        with CaptureQueriesContext(connection) as one_item:
+            self.checkout([('1', '1')], [(self.cash.id, '1')])
+        with CaptureQueriesContext(connection) as many_items:
+            self.checkout(
+                [(str(number), '1') for number in range(10)],
+                [(self.cash.id, '1'), (self.card.id, '1')]
+            )
+
+        self.assertEqual(len(many_items), len(one_item))
+
+    def test_errors(self):
+        """ Test that errors are reported by entry and nothing is written """
+
+        response = self.checkout(
+            [('1', '1'), ('404', '1'), ('1', '2')], [(999, '1')]
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['items'][0], {})
+        self.assertIn('barcode', response.data['items'][1])
+        self.assertIn('barcode', response.data['items'][2])
+        self.assertIn('payment_method', response.data['payments'][0])
+        self.assertFalse(PurchaseOrder.objects.exists())
+
+        response = self.checkout([])
+        self.assertIn('items', response.data)
+
+    def test_total_price_overflow(self):
+        """ Test that items whose total price wouldn't fit are rejected """
+
+        response = self.checkout([('1', '1'), ('2', '40000')])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['items'][0], {})
+        self.assertIn('quantity', response.data['items'][1])
+        self.assertFalse(PurchaseOrder.objects.exists())
+
+    def test_atomic(self):
+        """ Test that a failing insert rolls the whole checkout back """
+
+        with mock.patch(
+                'restapi.serializers.PurchasePaymentMethod.objects'
+                '.bulk_create', side_effect=IntegrityError):
+            response = self.checkout([('1', '1')], [(self.cash.id, '1')])
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(PurchaseOrder.objects.exists())
+        self.assertFalse(PurchaseItem.objects.exists())
+
+
+@override_settings(THROTTLE_RATES={'restapi': '2/min'})
+class ThrottleTest(ThrottleTestMixin, test.APITestCase):
+    """ Test case for the token-bucket throttling of the API """
+
+    def test_per_endpoint(self):
+        """ Test that each endpoint has its own bucket per client """
+
+        for _ in range(2):
+            response = self.client.get(reverse('restapi:categories'))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(reverse('restapi:categories'))
+
+        self.assertEqual(
+            response.status_code, status.HTTP_429_TOO_MANY_REQUESTS
+        )
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertEqual(
+            self.client.get(reverse('restapi:products')).status_code,
+            status.HTTP_200_OK
+        )
+
+    def test_forwarded_for_ignored(self):
+        """ Test that clients can't get new buckets by forging the
+        X-Forwarded-For header
+        """
+
+        for address in ('10.0.0.1', '10.0.0.2'):
+            response = self.client.get(
+                reverse('restapi:categories'), HTTP_X_FORWARDED_FOR=address
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(
+            reverse('restapi:categories'), HTTP_X_FORWARDED_FOR='10.0.0.3'
+        )
+
+        self.assertEqual(
+            response.status_code, status.HTTP_429_TOO_MANY_REQUESTS
+        )
+
+    @override_settings(THROTTLE_RATES={})
+    def test_unlimited(self):
+        """ Test that scopes without a rate aren't throttled """
+
+        for _ in range(5):
+            response = self.client.get(reverse('restapi:categories'))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
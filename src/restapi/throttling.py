@@ -0,0 +1,33 @@
+""" restapi throttling module """
+
+from rest_framework.throttling import BaseThrottle
+
+from website.throttling import BUCKET_KEY, TokenBucket, \
+    get_client_ident, get_rate
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """ Token-bucket throttle of the API, per client and per endpoint. The
+    rate is the one of the throttle_scope of the view in THROTTLE_RATES
+    ('restapi' when the view doesn't set one). DRF adds the Retry-After
+    header to the 429 responses.
+    """
+
+    default_scope = 'restapi'
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', self.default_scope)
+        rate = get_rate(scope)
+        if rate is None:
+            return True
+
+        # the client is identified like on the site (REMOTE_ADDR, not the
+        # X-Forwarded-For header clients can forge)
+        self.bucket = TokenBucket(BUCKET_KEY.format(
+            scope='{}:{}'.format(scope, view.__class__.__name__),
+            ident=get_client_ident(request)
+        ), rate)
+        return self.bucket.consume()
+
+    def wait(self):
+        return self.bucket.wait
@@ -1,10 +1,17 @@
 from django.urls import path
 
 from .views import (
-    CategoryCreateView,
-    ProductCreateView,
-    PaymentMethodCreateView,
-    PurchaseOrderCreateView,
+    CatalogChangesView,
+    CategoryDetailView,
+    CategoryListCreateView,
+    CheckoutView,
+    ProductDetailView,
+    ProductListCreateView,
+    ProductImportView,
+    PaymentMethodDetailView,
+    PaymentMethodListCreateView,
+    PurchaseOrderListCreateView,
+    PurchaseOrderDetailView,
     PurchaseItemCreateView
 )
 
@@ -12,26 +19,61 @@ from .views import (
 app_name = 'restapi'
 
 urlpatterns = [
+    path(
+        'v1/catalog/changes/',
+        CatalogChangesView.as_view(),
+        name='catalog-changes'
+    ),
     path(
         'v1/categories/',
-        CategoryCreateView.as_view(),
+        CategoryListCreateView.as_view(),
         name='categories'
     ),
+    path(
+        'v1/categories/<int:id>/',
+        CategoryDetailView.as_view(),
+        name='category'
+    ),
+    path(
+        'v1/checkout/',
+        CheckoutView.as_view(),
+        name='checkout'
+    ),
     path(
         'v1/products/',
-        ProductCreateView.as_view(),
+        ProductListCreateView.as_view(),
         name='products'
     ),
+    path(
+        'v1/products/import/',
+        ProductImportView.as_view(),
+        name='products-import'
+    ),
+    path(
+        'v1/products/<str:barcode>/',
+        ProductDetailView.as_view(),
+        name='product'
+    ),
     path(
         'v1/payment-methods/',
-        PaymentMethodCreateView.as_view(),
+        PaymentMethodListCreateView.as_view(),
         name='payment-methods'
     ),
+    path(
+        'v1/payment-methods/<int:id>/',
+        PaymentMethodDetailView.as_view(),
+        name='payment-method'
+    ),
     path(
         'v1/purchase-orders/',
-        PurchaseOrderCreateView.as_view(),
+        PurchaseOrderListCreateView.as_view(),
         name='purchase-orders'
     ),
+    path(
+        'v1/purchase-orders/<int:id>/',
+        PurchaseOrderDetailView.as_view(),
+        name='purchase-order'
+    ),
     path(
         'v1/purchase-items/',
         PurchaseItemCreateView.as_view(),
@@ -1,55 +1,555 @@
+import json
+from datetime import timedelta
 
-from rest_framework.generics import CreateAPIView
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.translation import gettext
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import (
+    CreateAPIView,
+    GenericAPIView,
+    ListAPIView,
+    ListCreateAPIView,
+    RetrieveAPIView
+)
+from rest_framework.permissions import IsAuthenticated, SAFE_METHODS
+from rest_framework.response import Response
 
 from website.models import (
+    CatalogChange,
     Category,
     Product,
     PaymentMethod,
     PurchaseOrder,
     PurchaseItem
 )
+from .models import IdempotencyKey
+from .parsers import NDJSONParser
 from .serializers import (
+    CatalogChangeSerializer,
     CategorySerializer,
+    CheckoutSerializer,
     ProductSerializer,
     PaymentMethodSerializer,
     PurchaseOrderSerializer,
-    PurchaseItemSerializer
+    PurchaseOrderTotalsSerializer,
+    PurchaseItemSerializer,
+    ValuesSerializer
 )
 
 
-class CategoryCreateView(CreateAPIView):
-    """ Создать представление для объектов категории """
+class BulkCreateMixin:
+    """ Lets a create view also accept a JSON array of objects, validated
+    together and inserted with one bulk_create inside a single transaction.
+    Validation errors are returned by the index of the offending item.
+    """
+
+    def create(self, request, *args, **kwargs):
+        if not isinstance(request.data, list):
+            return super(BulkCreateMixin, self).create(
+                request, *args, **kwargs
+            )
+
+        if len(request.data) > settings.RESTAPI_MAX_BULK_SIZE:
+            return Response(
+                {'detail': gettext('TooManyObjects')},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        serializer = self.get_serializer(data=request.data, many=True)
+        if not serializer.is_valid():
+            errors = serializer.errors
+            if isinstance(errors, list):
+                errors = {
+                    index: item_errors
+                    for index, item_errors in enumerate(errors)
+                    if item_errors
+                }
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            with transaction.atomic():
+                self.perform_create(serializer)
+        except IntegrityError:
+            # a concurrent request inserted a conflicting row
+            return Response(
+                {'detail': gettext('ConflictingObjects')},
+                status=status.HTTP_409_CONFLICT
+            )
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class IdempotentCreateMixin:
+    """ Honors the Idempotency-Key header of create requests: the response
+    to the first request is stored for RESTAPI_IDEMPOTENCY_TTL seconds and
+    replayed to the retries with the same key (per user and path), found
+    with one indexed lookup instead of validating and inserting again.
+
+    A retry arriving while the first request still runs gets 409, a key
+    reused with another payload gets 422. Server errors aren't stored.
+    """
+
+    idempotency_header = 'HTTP_IDEMPOTENCY_KEY'
+
+    def create(self, request, *args, **kwargs):
+        key = request.META.get(self.idempotency_header)
+        if not key:
+            return super(IdempotentCreateMixin, self).create(
+                request, *args, **kwargs
+            )
+        if len(key) > 255:
+            return Response(
+                {'detail': gettext('InvalidIdempotencyKey')},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        digest = IdempotencyKey.digest(request.user.pk, request.path, key)
+        request_hash = IdempotencyKey.digest(json.dumps(
+            request.data, sort_keys=True, cls=DjangoJSONEncoder, default=str
+        ))
+        now = timezone.now()
+        record = IdempotencyKey.objects.filter(
+            key=digest, expires_at__gt=now
+        ).first()
+        if record is None:
+            record = self.claim_key(digest, request_hash, now)
+            if record is None:
+                return self.key_conflict()
+        elif record.status_code is None:
+            return self.key_conflict()
+        elif record.request_hash != request_hash:
+            return Response(
+                {'detail': gettext('IdempotencyKeyReused')},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+        else:
+            response = HttpResponse(
+                bytes(record.body), status=record.status_code,
+                content_type=record.content_type
+            )
+            response['Idempotent-Replayed'] = 'true'
+            return response
+
+        try:
+            response = super(IdempotentCreateMixin, self).create(
+                request, *args, **kwargs
+            )
+        except Exception:
+            record.delete()
+            raise
+        if response.status_code >= 500:
+            record.delete()
+        else:
+            self.idempotency_record = record
+        return response
+
+    @staticmethod
+    def claim_key(digest, request_hash, now):
+        """ Stores the in-progress record of digest, replacing an expired
+        one. Returns None when another request holds the key
+        """
+
+        values = {
+            'request_hash': request_hash,
+            'status_code': None,
+            'content_type': '',
+            'body': b'',
+            'expires_at': now + timedelta(
+                seconds=settings.RESTAPI_IDEMPOTENCY_LOCK_TIMEOUT
+            ),
+        }
+        try:
+            with transaction.atomic():
+                if IdempotencyKey.objects.filter(
+                        key=digest, expires_at__lte=now).update(**values):
+                    return IdempotencyKey.objects.get(key=digest)
+                return IdempotencyKey.objects.create(key=digest, **values)
+        except IntegrityError:
+            return None
+
+    @staticmethod
+    def key_conflict():
+        return Response(
+            {'detail': gettext('RequestInProgress')},
+            status=status.HTTP_409_CONFLICT
+        )
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super(IdempotentCreateMixin, self).finalize_response(
+            request, response, *args, **kwargs
+        )
+        record = getattr(self, 'idempotency_record', None)
+        if record is not None:
+            response.render()
+            IdempotencyKey.objects.filter(pk=record.pk).update(
+                status_code=response.status_code,
+                content_type=response['Content-Type'],
+                body=response.content,
+                expires_at=timezone.now() + timedelta(
+                    seconds=settings.RESTAPI_IDEMPOTENCY_TTL
+                )
+            )
+        return response
+
+
+class SparseFieldsMixin:
+    """ Lets read requests pick the returned fields with the ``fields``
+    query parameter (e.g. ``?fields=barcode,price``). The other fields are
+    dropped from the serializer and only the matching columns, plus the
+    primary key and the sort column, are loaded with ``only()``.
+    """
+
+    fields_query_param = 'fields'
+
+    def get_requested_fields(self):
+        """ Returns the field names asked for, or None for all of them """
+
+        if not hasattr(self, '_requested_fields'):
+            self._requested_fields = None
+            value = self.request.query_params.get(self.fields_query_param)
+            if value and self.request.method in SAFE_METHODS:
+                names = [name.strip() for name in value.split(',')]
+                names = [name for name in names if name]
+                available = self.get_serializer_class()(
+                    context=self.get_serializer_context()
+                ).fields
+                unknown = [name for name in names if name not in available]
+                if unknown:
+                    raise ValidationError({
+                        self.fields_query_param: [
+                            gettext('UnknownFields') + ': ' + ', '.join(
+                                unknown
+                            )
+                        ]
+                    })
+                self._requested_fields = names
+        return self._requested_fields
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super(SparseFieldsMixin, self).get_serializer(
+            *args, **kwargs
+        )
+        names = self.get_requested_fields()
+        if names is not None:
+            target = getattr(serializer, 'child', serializer)
+            for name in set(target.fields) - set(names):
+                target.fields.pop(name)
+        return serializer
+
+    def filter_queryset(self, queryset):
+        queryset = super(SparseFieldsMixin, self).filter_queryset(queryset)
+        names = self.get_requested_fields()
+        if names is None:
+            return queryset
+
+        opts = queryset.model._meta
+        fields = self.get_serializer_class()(
+            context=self.get_serializer_context()
+        ).fields
+        columns = {'pk'}
+        if self.paginator is not None:
+            columns.update(
+                name.lstrip('-') for name in
+                self.paginator.get_ordering(self.request, queryset, self)
+            )
+        for name in names:
+            try:
+                field = opts.get_field(fields[name].source)
+            except FieldDoesNotExist:
+                # annotations and properties
+                continue
+            if field.concrete and not field.many_to_many:
+                columns.add(field.name)
+        return queryset.only(*(
+            opts.pk.name if column == 'pk' else column for column in columns
+        ))
+
+
+class ValuesListMixin:
+    """ Lists through ValuesSerializer: the page is fetched with values()
+    and converted by precomputed per-field functions, which is several times
+    cheaper than serializing model instances and renders the same JSON.
+    Falls back to the regular list when the serializer can't be mapped.
+    """
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer = self.get_serializer(many=True)
+        fast_serializer = ValuesSerializer.build(serializer.child, queryset)
+        if fast_serializer is None:
+            return super(ValuesListMixin, self).list(request, *args, **kwargs)
+
+        columns = set(fast_serializer.sources)
+        if self.paginator is not None:
+            columns.update(
+                name.lstrip('-') for name in
+                self.paginator.get_ordering(request, queryset, self)
+            )
+        rows = queryset.values(*columns)
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return Response(fast_serializer.to_representation(rows))
+        return self.get_paginated_response(
+            fast_serializer.to_representation(page)
+        )
+
+
+class CategoryListCreateView(ValuesListMixin, SparseFieldsMixin,
+                             IdempotentCreateMixin, BulkCreateMixin,
+                             ListCreateAPIView):
+    """ Представление списка и создания объектов категории """
 
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
-    lookup_field = 'description'
+    ordering = 'id'
 
 
-class ProductCreateView(CreateAPIView):
-    """ Создать представление для объектов продукта """
+class CategoryDetailView(SparseFieldsMixin, RetrieveAPIView):
+    """ Представление объекта категории """
+
+    queryset = Category.objects.all()
+    serializer_class = CategorySerializer
+    lookup_field = 'id'
+
+
+class ProductListCreateView(ValuesListMixin, SparseFieldsMixin,
+                            IdempotentCreateMixin, BulkCreateMixin,
+                            ListCreateAPIView):
+    """ Представление списка и создания объектов продукта """
+
+    queryset = Product.objects.all()
+    serializer_class = ProductSerializer
+    ordering = 'barcode'
+
+
+class ProductDetailView(SparseFieldsMixin, RetrieveAPIView):
+    """ Представление объекта продукта """
 
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     lookup_field = 'barcode'
 
 
-class PaymentMethodCreateView(CreateAPIView):
-    """ Создать представление для объектов PaymentMethod """
+class ProductImportView(GenericAPIView):
+    """ Импорт продуктов в формате NDJSON (один продукт в строке)
+
+    The body is read line by line and every chunk of
+    RESTAPI_IMPORT_CHUNK_SIZE lines is validated and inserted with one
+    bulk_create in its own transaction, so memory stays flat whatever the
+    size of the catalog. The response streams one JSON line per chunk with
+    its counts and the errors by line number, then a final summary line.
+    Invalid lines are skipped; the valid lines of their chunk are kept.
+    """
+
+    queryset = Product.objects.all()
+    serializer_class = ProductSerializer
+    parser_classes = (NDJSONParser, )
+    throttle_scope = 'restapi-import'
+
+    def post(self, request, *args, **kwargs):
+        return StreamingHttpResponse(
+            self.import_lines(request.data),
+            content_type=NDJSONParser.media_type
+        )
+
+    def import_lines(self, lines):
+        """ Yields the NDJSON progress lines of the import of lines """
+
+        chunk_size = settings.RESTAPI_IMPORT_CHUNK_SIZE
+        totals = {'created': 0, 'failed': 0}
+        chunk = []
+        for line in lines:
+            chunk.append(line)
+            if len(chunk) == chunk_size:
+                yield self.import_chunk(chunk, totals)
+                chunk = []
+        if chunk:
+            yield self.import_chunk(chunk, totals)
+        yield self.dumps(dict(totals, done=True))
+
+    def import_chunk(self, chunk, totals):
+        """ Validates and inserts the lines of chunk, updating totals, and
+        returns the progress line of the chunk
+        """
+
+        errors = {
+            line.number: {'non_field_errors': [gettext('InvalidJSON')]}
+            for line in chunk if line.error is not None
+        }
+        lines = [line for line in chunk if line.error is None]
+
+        serializer = self.get_serializer(many=True)
+        validated_data, item_errors = serializer.validate_items(
+            [line.data for line in lines]
+        )
+        serializer.check_unique(validated_data, item_errors)
+        for line, line_errors in zip(lines, item_errors):
+            if line_errors:
+                errors[line.number] = line_errors
+        validated_data = [attrs for attrs in validated_data if attrs]
+
+        try:
+            with transaction.atomic():
+                created = len(serializer.create(validated_data))
+        except IntegrityError:
+            # a concurrent request inserted a conflicting row
+            created = 0
+            for line, attrs in zip(lines, item_errors):
+                if not attrs:
+                    errors[line.number] = {
+                        'non_field_errors': [gettext('ConflictingObjects')]
+                    }
+
+        totals['created'] += created
+        totals['failed'] += len(errors)
+        return self.dumps({
+            'first_line': chunk[0].number,
+            'last_line': chunk[-1].number,
+            'created': created,
+            'errors': errors,
+        })
+
+    @staticmethod
+    def dumps(data):
+        return json.dumps(data, sort_keys=True).encode('utf-8') + b'\n'
+
+
+class CatalogChangesView(ListAPIView):
+    """ Журнал изменений каталога после номера since, по порядку seq
+
+    Terminals keep the seq of the last change they applied and ask for the
+    following ones, so a sync costs O(changes). Saves come with the current
+    state of the object, loaded with one query per model and page; deletes
+    are tombstones without data.
+    """
+
+    serializer_class = CatalogChangeSerializer
+    ordering = 'seq'
+    models = {'category': Category, 'product': Product}
+
+    def get_queryset(self):
+        try:
+            since = int(self.request.query_params.get('since', 0))
+        except ValueError:
+            raise ValidationError({'since': [gettext('InvalidSequence')]})
+        return CatalogChange.objects.filter(seq__gt=since)
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset())
+        self.page_objects = self.load_objects(page)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    def get_serializer_context(self):
+        context = super(CatalogChangesView, self).get_serializer_context()
+        context['objects'] = getattr(self, 'page_objects', {})
+        return context
+
+    def load_objects(self, changes):
+        """ Returns the saved objects of changes by (model, object_pk) """
+
+        objects = {}
+        for name, model in self.models.items():
+            pks = {
+                change.object_pk for change in changes
+                if change.model == name and
+                change.action == CatalogChange.SAVE
+            }
+            if pks:
+                objects.update(
+                    ((name, str(obj.pk)), obj)
+                    for obj in model.objects.filter(pk__in=pks)
+                )
+        return objects
+
+
+class PaymentMethodListCreateView(ValuesListMixin, SparseFieldsMixin,
+                                  IdempotentCreateMixin, BulkCreateMixin,
+                                  ListCreateAPIView):
+    """ Представление списка и создания объектов PaymentMethod """
 
     queryset = PaymentMethod.objects.all()
     serializer_class = PaymentMethodSerializer
-    lookup_field = 'description'
+    ordering = 'id'
 
 
-class PurchaseOrderCreateView(CreateAPIView):
-    """ Создать представление для объектов PurchaseOrder """
+class PaymentMethodDetailView(SparseFieldsMixin, RetrieveAPIView):
+    """ Представление объекта PaymentMethod """
 
-    queryset = PurchaseOrder.objects.all()
-    serializer_class = PurchaseOrderSerializer
+    queryset = PaymentMethod.objects.all()
+    serializer_class = PaymentMethodSerializer
     lookup_field = 'id'
 
 
-class PurchaseItemCreateView(CreateAPIView):
+class PurchaseOrderListCreateView(SparseFieldsMixin, IdempotentCreateMixin,
+                                  BulkCreateMixin, ListCreateAPIView):
+    """ Представление создания объектов PurchaseOrder и списка заказов
+    пользователя (новые первыми) с их итогами
+    """
+
+    ordering = '-id'
+
+    def get_permissions(self):
+        if self.request.method in SAFE_METHODS:
+            return [IsAuthenticated()]
+        return super(PurchaseOrderListCreateView, self).get_permissions()
+
+    def get_serializer_class(self):
+        if self.request.method in SAFE_METHODS:
+            return PurchaseOrderTotalsSerializer
+        return PurchaseOrderSerializer
+
+    def get_queryset(self):
+        if self.request.method not in SAFE_METHODS:
+            return PurchaseOrder.objects.all()
+        return PurchaseOrder.objects.filter(user=self.request.user) \
+            .with_totals()
+
+
+class PurchaseOrderDetailView(SparseFieldsMixin, RetrieveAPIView):
+    """ Представление заказа на покупку пользователя с его итогами """
+
+    serializer_class = PurchaseOrderTotalsSerializer
+    permission_classes = (IsAuthenticated, )
+    lookup_field = 'id'
+
+    def get_queryset(self):
+        return PurchaseOrder.objects.filter(user=self.request.user) \
+            .with_totals()
+
+
+class CheckoutView(IdempotentCreateMixin, CreateAPIView):
+    """ Оформление заказа вместе с позициями и оплатами одним запросом
+
+    Everything is validated together and written in a single transaction,
+    instead of one request per order, item and payment.
+    """
+
+    serializer_class = CheckoutSerializer
+    throttle_scope = 'restapi-checkout'
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            serializer.save()
+
+    def create(self, request, *args, **kwargs):
+        try:
+            return super(CheckoutView, self).create(request, *args, **kwargs)
+        except IntegrityError:
+            # e.g. a concurrent request opened a cart for the same user
+            return Response(
+                {'detail': gettext('ConflictingObjects')},
+                status=status.HTTP_409_CONFLICT
+            )
+
+
+class PurchaseItemCreateView(IdempotentCreateMixin, BulkCreateMixin,
+                             CreateAPIView):
     """ Создать представление для объектов PurchaseItem """
 
     queryset = PurchaseItem.objects.all()
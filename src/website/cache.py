@@ -0,0 +1,194 @@
+""" website cache module
+
+Versioned caching of catalog data. Every cached value is stored under a key
+that embeds a version token kept in the shared cache; changing the data only
+needs a new token (see bump_version), never a search for stale keys.
+"""
+
+import hashlib
+import re
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils import timezone
+from django.utils.translation import get_language
+
+
+# changes on any product or category (lists, search results)
+CATALOG_VERSION_KEY = 'website:catalog:version'
+# changes on categories only (navigation bar)
+CATEGORIES_VERSION_KEY = 'website:categories:version'
+CATEGORIES_KEY = 'website:categories:{version}'
+# changes on payment methods
+PAYMENT_METHODS_VERSION_KEY = 'website:payment-methods:version'
+PAYMENT_METHODS_KEY = 'website:payment-methods:{version}'
+# changes on a single product (its detail page)
+PRODUCT_VERSION_KEY = 'website:product:{slug}:version'
+
+PAGE_KEY = 'website:page:{digest}'
+
+CSRF_INPUT_RE = re.compile(
+    r'(name=["\']csrfmiddlewaretoken["\'] value=["\'])[^"\']*'
+)
+CSRF_PLACEHOLDER = '__csrf_token_placeholder__'
+
+# process-local copies of shared values, as (version, value) pairs
+_local = {}
+
+
+def get_version(key):
+    """ Returns the current version token stored under key """
+
+    version = cache.get(key)
+    if version is None:
+        # a fresh random token, so nothing cached before the shared entry
+        # was evicted can be mistaken for current data
+        version = uuid.uuid4().hex
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def get_last_modified(key):
+    """ Returns when the version stored in key was last bumped. Unknown
+    dates (evicted entries) are reported as now
+    """
+
+    last_modified = cache.get(key + ':modified')
+    if last_modified is None:
+        last_modified = timezone.now()
+        if not cache.add(key + ':modified', last_modified, None):
+            last_modified = cache.get(key + ':modified', last_modified)
+    return last_modified
+
+
+def bump_version(key):
+    """ Invalidates everything cached under the version stored in key. The
+    token is changed again once the transaction commits, so a reader that
+    cached rows before the commit can't keep them alive
+    """
+
+    bump_versions([key])
+
+
+def bump_versions(keys):
+    """ bump_version for many keys at once """
+
+    keys = list(keys)
+
+    def bump():
+        now = timezone.now()
+        values = {}
+        for key in keys:
+            values[key] = uuid.uuid4().hex
+            values[key + ':modified'] = now
+        cache.set_many(values, None)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def get_categories():
+    """ Returns the list of categories for the navigation bar. Served from
+    the process memory while the shared version token is unchanged, then
+    from the shared cache and only then from the database
+    """
+
+    from .models import Category
+
+    return _get_list(
+        CATEGORIES_VERSION_KEY, CATEGORIES_KEY,
+        lambda: list(Category.objects.order_by('id'))
+    )
+
+
+def get_payment_methods():
+    """ Returns the list of payment methods, cached like get_categories """
+
+    from .models import PaymentMethod
+
+    return _get_list(
+        PAYMENT_METHODS_VERSION_KEY, PAYMENT_METHODS_KEY,
+        lambda: list(PaymentMethod.objects.order_by('id'))
+    )
+
+
+def _get_list(version_key, key_format, load):
+    version = get_version(version_key)
+    local = _local.get(key_format)
+    if local is not None and local[0] == version:
+        return local[1]
+
+    key = key_format.format(version=version)
+    values = cache.get(key)
+    if values is None:
+        values = load()
+        cache.set(key, values, None)
+    _local[key_format] = (version, values)
+    return values
+
+
+def cache_anonymous_page(dependencies, timeout=None):
+    """ Decorator caching the full HTML of a view for anonymous visitors, per
+    path, query string and language. dependencies(request, *args, **kwargs)
+    returns the version keys the page is built from; bumping any of them
+    purges the page. Logged users, pages with flash messages and anything
+    but a successful GET are never cached.
+
+    The CSRF token of the forms is swapped for the visitor's own one every
+    time a cached page is served.
+    """
+
+    def decorator(view_func):
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or \
+                    request.user.is_authenticated or \
+                    len(get_messages(request)):
+                return view_func(request, *args, **kwargs)
+
+            version_keys = dependencies(request, *args, **kwargs)
+            key = PAGE_KEY.format(digest=hashlib.md5('|'.join(
+                [request.get_full_path(), get_language() or ''] +
+                [get_version(version_key) for version_key in version_keys]
+            ).encode('utf-8')).hexdigest())
+
+            cached = cache.get(key)
+            if cached is not None:
+                content, content_type = cached
+                return HttpResponse(
+                    content.replace(CSRF_PLACEHOLDER, get_token(request)),
+                    content_type=content_type
+                )
+
+            response = view_func(request, *args, **kwargs)
+
+            def store(response):
+                if response.status_code != 200 or len(get_messages(request)):
+                    return
+                content = CSRF_INPUT_RE.sub(
+                    r'\g<1>' + CSRF_PLACEHOLDER,
+                    response.content.decode(response.charset)
+                )
+                cache.set(
+                    key, (content, response['Content-Type']),
+                    timeout if timeout is not None
+                    else settings.PAGE_CACHE_TIMEOUT
+                )
+
+            if hasattr(response, 'add_post_render_callback'):
+                response.add_post_render_callback(store)
+            else:
+                store(response)
+            return response
+
+        return wrapper
+
+    return decorator
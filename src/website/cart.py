@@ -0,0 +1,118 @@
+""" website cart module
+
+Helpers that change the contents of a user's cart (the PurchaseOrder with
+cart=True) with a fixed number of queries, whatever the number of items.
+"""
+
+from decimal import Decimal
+
+from django.db import DataError, IntegrityError, transaction
+from django.db.models import Case, DecimalField, F, Q, Value, When
+from django.utils import timezone
+
+from .models import PurchaseItem, PurchaseOrder
+from .utils import decimal_field_max
+
+
+class LineOverflow(ValueError):
+    """ Raised when the quantity or the total price of a cart line would
+    not fit in its column
+    """
+
+
+def get_open_cart(user):
+    """ Returns the open cart (cart=True) of user, creating it when needed.
+    A single indexed query when the cart exists; concurrent creations are
+    resolved by the unique_open_cart constraint, so every request ends up
+    with the same order.
+    """
+
+    purchase_order, _ = PurchaseOrder.objects.get_or_create(
+        user=user, cart=True, defaults={'timestamp': timezone.now()}
+    )
+    return purchase_order
+
+
+def add_to_cart(purchase_order, items):
+    """ Adds the (product, quantity) pairs of items to purchase_order.
+
+    Products already in the order get their quantity and total_price bumped
+    by a single UPDATE evaluated by the database, so concurrent clicks can't
+    lose increments. Only the products not in the order yet are looked up
+    and inserted with one bulk_create. A (purchase_order, barcode) pair
+    inserted concurrently by another request is merged by retrying once.
+
+    Raises LineOverflow, adding nothing, when a line would get a quantity or
+    a total price too large for the PurchaseItem columns.
+    """
+
+    quantities = {}
+    products = {}
+    for product, quantity in items:
+        quantities[product.barcode] = \
+            quantities.get(product.barcode, Decimal(0)) + Decimal(quantity)
+        products[product.barcode] = product
+    if not quantities:
+        return
+
+    try:
+        try:
+            with transaction.atomic():
+                _add_items(purchase_order, products, quantities)
+        except IntegrityError:
+            with transaction.atomic():
+                _add_items(purchase_order, products, quantities)
+    except DataError:
+        # numeric overflow of the UPDATE, on the databases checking it
+        raise LineOverflow(purchase_order)
+
+
+def _add_items(purchase_order, products, quantities):
+    cart_items = PurchaseItem.objects.filter(purchase_order=purchase_order)
+
+    increment = Case(
+        *[
+            When(barcode=barcode, then=Value(quantity))
+            for barcode, quantity in quantities.items()
+        ],
+        output_field=DecimalField(max_digits=8, decimal_places=3)
+    )
+    updated = cart_items.filter(barcode__in=list(quantities)).update(
+        quantity=F('quantity') + increment,
+        # right-hand sides see the quantity from before the UPDATE
+        total_price=(F('quantity') + increment) * F('price')
+    )
+    # SQLite stores the overflowing values as they are: the whole UPDATE
+    # is rolled back instead
+    if updated and cart_items.filter(barcode__in=list(quantities)).filter(
+            Q(quantity__gt=_max_value('quantity')) |
+            Q(total_price__gt=_max_value('total_price'))).exists():
+        raise LineOverflow(purchase_order)
+    if updated == len(quantities):
+        return
+
+    carted = set(
+        cart_items.filter(barcode__in=list(quantities))
+        .values_list('barcode', flat=True)
+    ) if updated else set()
+    for barcode, product in products.items():
+        if barcode not in carted and (
+                quantities[barcode] > _max_value('quantity') or
+                product.price * quantities[barcode] >
+                _max_value('total_price')):
+            raise LineOverflow(purchase_order)
+    PurchaseItem.objects.bulk_create([
+        PurchaseItem(
+            barcode=product.barcode, title=product.title,
+            description=product.description, image=product.image,
+            price=product.price, category_id=product.category_id,
+            purchase_order=purchase_order,
+            quantity=quantities[barcode],
+            total_price=product.price * quantities[barcode]
+        )
+        for barcode, product in products.items() if barcode not in carted
+    ])
+
+
+def _max_value(field_name):
+    return decimal_field_max(PurchaseItem._meta.get_field(field_name))
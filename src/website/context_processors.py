@@ -0,0 +1,13 @@
+""" website context processors module """
+
+from django.utils.functional import SimpleLazyObject
+
+from .cache import get_categories
+
+
+def categories(request):
+    """ Adds the cached categories of the navigation bar to the context.
+    Lazy, so templates without the navigation bar don't touch the cache
+    """
+
+    return {'categories': SimpleLazyObject(get_categories)}
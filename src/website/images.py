@@ -0,0 +1,259 @@
+""" website images module
+
+Renditions of the product images: every uploaded image gets scaled down
+copies for each of the ``IMAGE_RENDITION_WIDTHS`` in each of the
+``IMAGE_RENDITION_FORMATS``, stored beside the original as
+``<name>.<width>w.<ext>`` (``kettle.jpg`` -> ``kettle.320w.webp``). They are
+generated by a pool of worker threads once the transaction saving the
+product commits, and offered to browsers through ``srcset`` by the
+``website.templatetags.images`` tags.
+
+The size of the original and a tiny placeholder are computed once per
+upload (see ``image_info``) and stored on the product, so that pages
+reserve the room of every image and show a blurred preview until it loads.
+"""
+
+import base64
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps, features
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RENDITION_WIDTHS = (160, 320, 640)
+DEFAULT_RENDITION_FORMATS = ('webp', 'jpeg')
+
+# extension and MIME type of the renditions of each Pillow format
+FORMATS = {
+    'webp': ('webp', 'image/webp'),
+    'jpeg': ('jpg', 'image/jpeg'),
+}
+
+EXIF_ORIENTATION = 0x0112
+
+# width of the placeholders inlined in the pages as data URIs (a few
+# hundred bytes), which browsers scale up smoothly
+PLACEHOLDER_WIDTH = 16
+
+_executor = None
+
+# names queued in (or being processed by) the pool, so that saving a product
+# many times in a row doesn't generate its renditions concurrently
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def get_widths():
+    """ Returns the configured rendition widths, in increasing order """
+
+    return sorted(getattr(
+        settings, 'IMAGE_RENDITION_WIDTHS', DEFAULT_RENDITION_WIDTHS
+    ))
+
+
+def get_formats():
+    """ Returns the configured rendition formats, preferred first """
+
+    return list(getattr(
+        settings, 'IMAGE_RENDITION_FORMATS', DEFAULT_RENDITION_FORMATS
+    ))
+
+
+def rendition_name(name, width, image_format):
+    """ Returns the storage name of the width wide rendition of name """
+
+    root, _ = os.path.splitext(name)
+    return '{}.{}w.{}'.format(root, width, FORMATS[image_format][0])
+
+
+def get_renditions(name, storage=default_storage):
+    """ Returns {format: [(width, rendition name), ...]} with the renditions
+    of name found in storage, by increasing width
+    """
+
+    renditions = {}
+    for image_format in get_formats():
+        found = [
+            (width, rendition_name(name, width, image_format))
+            for width in get_widths()
+        ]
+        found = [
+            (width, rendition) for width, rendition in found
+            if storage.exists(rendition)
+        ]
+        if found:
+            renditions[image_format] = found
+    return renditions
+
+
+def generate_renditions(name, storage=default_storage):
+    """ Writes the missing renditions of the image stored under name and
+    returns their names. Images are never scaled up: widths above the one
+    of the original are skipped.
+    """
+
+    missing = [
+        (width, image_format, rendition_name(name, width, image_format))
+        for width in get_widths() for image_format in get_formats()
+    ]
+    missing = [item for item in missing if not storage.exists(item[2])]
+    if not missing or not storage.exists(name):
+        return []
+
+    with storage.open(name, 'rb') as original:
+        # only the header is read until load(), so an image having all the
+        # renditions its width allows isn't decoded again
+        image = Image.open(original)
+        original_width = image.width
+        # photos are often stored sideways with an EXIF orientation tag
+        if image.getexif().get(EXIF_ORIENTATION) in (5, 6, 7, 8):
+            original_width = image.height
+        missing = [item for item in missing if item[0] <= original_width]
+        if not missing:
+            return []
+        image.load()
+    image = ImageOps.exif_transpose(image)
+    quality = getattr(settings, 'IMAGE_RENDITION_QUALITY', 80)
+
+    # content-addressed storages keep the names of derived files as is
+    save = getattr(storage, 'save_derived', storage.save)
+    created = []
+    scaled = {}
+    for width, image_format, rendition in missing:
+        if width not in scaled:
+            height = max(1, round(image.height * width / image.width))
+            scaled[width] = image.resize((width, height), Image.LANCZOS)
+        output = scaled[width]
+        if image_format == 'jpeg' and output.mode != 'RGB':
+            output = output.convert('RGB')
+        elif output.mode not in ('RGB', 'RGBA'):
+            output = output.convert('RGBA')
+        buffer = io.BytesIO()
+        output.save(buffer, image_format, quality=quality, optimize=True)
+        saved = save(rendition, ContentFile(buffer.getvalue()))
+        if saved != rendition:
+            # written meanwhile by another process, whose copy is kept
+            storage.delete(saved)
+            continue
+        created.append(saved)
+    return created
+
+
+def image_info(file):
+    """ Returns (width, height, placeholder) of the image read from file,
+    the placeholder being a data URI of a PLACEHOLDER_WIDTH wide copy
+    """
+
+    image = Image.open(file)
+    width, height = image.size
+    if image.getexif().get(EXIF_ORIENTATION) in (5, 6, 7, 8):
+        width, height = height, width
+    # JPEGs are decoded straight at 1/8 of their size or less
+    image.draft('RGB', (PLACEHOLDER_WIDTH, PLACEHOLDER_WIDTH))
+    image = ImageOps.exif_transpose(image)
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    image = image.resize((
+        PLACEHOLDER_WIDTH,
+        max(1, round(PLACEHOLDER_WIDTH * height / width))
+    ), Image.BILINEAR)
+
+    image_format = 'webp' if features.check('webp') else 'jpeg'
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, quality=40)
+    placeholder = 'data:{};base64,{}'.format(
+        FORMATS[image_format][1],
+        base64.b64encode(buffer.getvalue()).decode('ascii')
+    )
+    return width, height, placeholder
+
+
+def field_image_info(field_file):
+    """ Returns image_info of an ImageField value, whether it is already
+    stored or still an upload, or (None, None, '') when it isn't a
+    readable image
+    """
+
+    if not field_file:
+        return None, None, ''
+    try:
+        if field_file._committed:
+            with field_file.storage.open(field_file.name, 'rb') as file:
+                return image_info(file)
+        file = field_file.file
+        file.seek(0)
+        try:
+            return image_info(file)
+        finally:
+            file.seek(0)
+    except (OSError, ValueError):
+        return None, None, ''
+
+
+def delete_renditions(name, storage=default_storage):
+    """ Deletes the renditions of the image stored under name """
+
+    for width in get_widths():
+        for image_format in get_formats():
+            storage.delete(rendition_name(name, width, image_format))
+
+
+def _generate(name):
+    try:
+        return generate_renditions(name)
+    except Exception:  # pylint: disable=W0703
+        # a broken upload keeps being served as is
+        logger.exception('Could not generate the renditions of %s', name)
+        return []
+    finally:
+        with _pending_lock:
+            _pending.discard(name)
+
+
+def get_executor():
+    """ Returns the pool of threads generating renditions (Pillow releases
+    the GIL while it decodes, resizes and encodes)
+    """
+
+    global _executor  # pylint: disable=W0603
+
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'IMAGE_RENDITION_WORKERS', 4),
+            thread_name_prefix='renditions'
+        )
+    return _executor
+
+
+def schedule_renditions(names):
+    """ Generates the renditions of the images stored under names in the
+    worker pool once the current transaction commits. Without workers
+    (``IMAGE_RENDITION_WORKERS = 0``) they are generated right away.
+    """
+
+    names = sorted({name for name in names if name})
+    if not names:
+        return
+
+    def submit():
+        if not getattr(settings, 'IMAGE_RENDITION_WORKERS', 4):
+            for name in names:
+                _generate(name)
+            return
+        with _pending_lock:
+            queued = [name for name in names if name not in _pending]
+            _pending.update(queued)
+        executor = get_executor()
+        for name in queued:
+            executor.submit(_generate, name)
+
+    transaction.on_commit(submit)
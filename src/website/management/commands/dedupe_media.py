@@ -0,0 +1,54 @@
+""" Moves the media files uploaded before content addressing to their
+hashed names
+"""
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from website.images import delete_renditions
+from website.storage import file_fields, is_hashed
+
+
+class Command(BaseCommand):
+    """ Stores every file referenced under a legacy name (``kettle.jpg``,
+    ``kettle_tEWnuoM.jpg``...) under its content hash, points the rows to
+    it and deletes the legacy file: identical files end up shared.
+    """
+
+    help = 'Rename the legacy media files to their content hash'
+
+    def handle(self, *args, **options):
+        if not hasattr(default_storage, 'hashed_name'):
+            raise CommandError(
+                'DEFAULT_FILE_STORAGE is not content addressed'
+            )
+
+        fields = list(file_fields())
+        names = set()
+        for model, field_name in fields:
+            names.update(
+                model._default_manager.exclude(**{field_name: ''})
+                .values_list(field_name, flat=True).distinct()
+            )
+
+        moved = missing = 0
+        for name in sorted(names):
+            if is_hashed(name):
+                continue
+            if not default_storage.exists(name):
+                missing += 1
+                self.stderr.write('{}: missing'.format(name))
+                continue
+            with default_storage.open(name, 'rb') as content:
+                hashed = default_storage.save(name, content)
+            with transaction.atomic():
+                for model, field_name in fields:
+                    model._default_manager.filter(**{field_name: name}) \
+                        .update(**{field_name: hashed})
+            delete_renditions(name)
+            default_storage.delete(name)
+            moved += 1
+        self.stdout.write(
+            'Moved {} files ({} missing)'.format(moved, missing)
+        )
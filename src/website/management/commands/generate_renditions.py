@@ -0,0 +1,71 @@
+""" Generates the missing renditions and placeholders of the product
+images
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from website.images import field_image_info, generate_renditions
+from website.models import Product
+
+
+class Command(BaseCommand):
+    """ Backfills the renditions of the images uploaded before they were
+    configured, or after IMAGE_RENDITION_WIDTHS/FORMATS changed. Images
+    having all their renditions are skipped. Products saved before their
+    image size and placeholder were stored get them too.
+    """
+
+    help = 'Generate the missing renditions and placeholders of the ' \
+        'product images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int,
+            default=getattr(settings, 'IMAGE_RENDITION_WORKERS', 4) or 1,
+            help='Number of images processed in parallel'
+        )
+
+    def handle(self, *args, **options):
+        names = sorted(set(
+            Product.objects.exclude(image='')
+            .values_list('image', flat=True)
+        ))
+        created = failed = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            futures = [
+                (name, executor.submit(generate_renditions, name))
+                for name in names
+            ]
+            for name, future in futures:
+                try:
+                    created += len(future.result())
+                except Exception as error:  # pylint: disable=W0703
+                    failed += 1
+                    self.stderr.write('{}: {}'.format(name, error))
+        self.stdout.write(
+            'Created {} renditions of {} images ({} failed)'.format(
+                created, len(names), failed
+            )
+        )
+
+        unmeasured = set(
+            Product.objects.filter(image_width__isnull=True)
+            .exclude(image='').values_list('image', flat=True)
+        )
+        measured = 0
+        for name in sorted(unmeasured):
+            width, height, placeholder = field_image_info(
+                Product(image=name).image
+            )
+            if width is None:
+                continue
+            measured += Product.objects.filter(
+                image=name, image_width__isnull=True
+            ).update(
+                image_width=width, image_height=height,
+                image_placeholder=placeholder
+            )
+        self.stdout.write('Measured {} products'.format(measured))
@@ -0,0 +1,26 @@
+""" Deletes the media files that no row references anymore """
+
+from django.core.management.base import BaseCommand
+
+from website.storage import PURGE_GRACE_PERIOD, purge_unreferenced
+
+
+class Command(BaseCommand):
+    """ Deletes the content-addressed files (and their renditions) that no
+    file field references, once they are older than the grace period. A
+    file shared by several rows is kept until the last of them goes away.
+    """
+
+    help = 'Delete the unreferenced content-addressed media files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace', type=int, default=PURGE_GRACE_PERIOD,
+            help='Seconds a file is kept after it was saved'
+        )
+
+    def handle(self, *args, **options):
+        deleted = purge_unreferenced(grace=options['grace'])
+        self.stdout.write(
+            'Deleted {} unreferenced files'.format(len(deleted))
+        )
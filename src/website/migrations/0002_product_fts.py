@@ -0,0 +1,35 @@
+from django.db import migrations
+
+
+def create_product_fts(apps, schema_editor):
+    """ Creates the FTS5 table used by SQLiteFTSSearchBackend and indexes
+    the products that already exist
+    """
+
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE IF NOT EXISTS website_product_fts '
+        'USING fts5(barcode, title, description)'
+    )
+    schema_editor.execute(
+        'INSERT INTO website_product_fts (barcode, title, description) '
+        'SELECT barcode, title, description FROM website_product'
+    )
+
+
+def drop_product_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE IF EXISTS website_product_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_product_fts, drop_product_fts),
+    ]
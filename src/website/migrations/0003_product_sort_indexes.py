@@ -0,0 +1,21 @@
+# Generated by Django 2.2.28 on 2026-10-18 15:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0002_product_fts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['price', 'barcode'], name='website_pro_price_d524b5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['title', 'barcode'], name='website_pro_title_3b5e1f_idx'),
+        ),
+    ]
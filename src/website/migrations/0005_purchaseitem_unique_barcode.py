@@ -0,0 +1,40 @@
+from django.db import migrations
+from django.db.models import Count, Sum
+
+
+def merge_duplicate_items(apps, schema_editor):
+    """ Folds the lines repeating a barcode inside an order into the first
+    one, so the unique constraint can be created
+    """
+
+    PurchaseItem = apps.get_model('website', 'PurchaseItem')
+    duplicates = PurchaseItem.objects.values('purchase_order', 'barcode') \
+        .annotate(lines=Count('id')).filter(lines__gt=1)
+    for duplicate in duplicates:
+        items = PurchaseItem.objects.filter(
+            purchase_order=duplicate['purchase_order'],
+            barcode=duplicate['barcode']
+        ).order_by('id')
+        totals = items.aggregate(
+            quantity=Sum('quantity'), total_price=Sum('total_price')
+        )
+        first = items[0]
+        items.exclude(id=first.id).delete()
+        first.quantity = totals['quantity']
+        first.total_price = totals['total_price']
+        first.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0004_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_items, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='purchaseitem',
+            unique_together={('purchase_order', 'barcode')},
+        ),
+    ]
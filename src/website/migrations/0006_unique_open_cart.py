@@ -0,0 +1,56 @@
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def merge_open_carts(apps, schema_editor):
+    """ Moves the lines and payments of every extra open cart of a user into
+    the oldest one and deletes the extra carts, so the constraint can be
+    created
+    """
+
+    PurchaseOrder = apps.get_model('website', 'PurchaseOrder')
+    PurchaseItem = apps.get_model('website', 'PurchaseItem')
+    PurchasePaymentMethod = apps.get_model('website', 'PurchasePaymentMethod')
+
+    users = PurchaseOrder.objects.filter(cart=True).values('user') \
+        .annotate(carts=Count('id')).filter(carts__gt=1) \
+        .values_list('user', flat=True)
+    for user in users:
+        carts = list(
+            PurchaseOrder.objects.filter(user=user, cart=True).order_by('id')
+        )
+        kept, extras = carts[0], carts[1:]
+        kept_items = {
+            item.barcode: item
+            for item in PurchaseItem.objects.filter(purchase_order=kept)
+        }
+        for item in PurchaseItem.objects.filter(purchase_order__in=extras):
+            if item.barcode in kept_items:
+                kept_item = kept_items[item.barcode]
+                kept_item.quantity += item.quantity
+                kept_item.total_price += item.total_price
+                kept_item.save()
+                item.delete()
+            else:
+                item.purchase_order = kept
+                item.save()
+                kept_items[item.barcode] = item
+        PurchasePaymentMethod.objects.filter(purchase_order__in=extras) \
+            .update(purchase_order=kept)
+        PurchaseOrder.objects.filter(id__in=[cart.id for cart in extras]) \
+            .delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0005_purchaseitem_unique_barcode'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_open_carts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='purchaseorder',
+            constraint=models.UniqueConstraint(condition=models.Q(cart=True), fields=('user',), name='unique_open_cart'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.28 on 2026-10-18 15:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0006_unique_open_cart'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=models.Index(fields=['user', 'cart', 'timestamp'], name='website_pur_user_id_c5d16c_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 2.2.28 on 2026-10-18 15:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0007_purchaseorder_user_cart_timestamp_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogChange',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False)),
+                ('model', models.CharField(max_length=20, verbose_name='Model')),
+                ('object_pk', models.CharField(max_length=20, verbose_name='ObjectPk')),
+                ('action', models.CharField(choices=[('save', 'Save'), ('delete', 'Delete')], max_length=6, verbose_name='Action')),
+                ('timestamp', models.DateTimeField(auto_now_add=True, verbose_name='Timestamp')),
+            ],
+            options={
+                'verbose_name': 'CatalogChange',
+                'verbose_name_plural': 'CatalogChanges',
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.28 on 2026-10-18 16:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0008_catalogchange'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='image_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='ImageHeight'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='image_placeholder',
+            field=models.TextField(blank=True, editable=False, verbose_name='ImagePlaceholder'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='image_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='ImageWidth'),
+        ),
+    ]
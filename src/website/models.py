@@ -1,11 +1,87 @@
 
+import threading
+from contextlib import contextmanager
+
 from django.conf import settings
-from django.db.models.signals import pre_save
-from django.db import models
+from django.db.models.functions import Coalesce
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.db import IntegrityError, models, transaction
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.translation import gettext_lazy
 
-from .utils import unique_slug_generator
+from .cache import CATALOG_VERSION_KEY, CATEGORIES_VERSION_KEY, \
+    PAYMENT_METHODS_VERSION_KEY, PRODUCT_VERSION_KEY, bump_versions
+from .images import field_image_info, schedule_renditions
+from .search import get_search_backend
+from .utils import allocate_slugs, unique_slug_generator
+
+
+class CategoryQuerySet(models.QuerySet):
+    """ QuerySet of Category """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """ bulk_create doesn't send post_save, so the caches are
+        invalidated here
+        """
+
+        objs = super(CategoryQuerySet, self).bulk_create(objs, *args, **kwargs)
+        categories_changed(objs)
+        return objs
+
+    def update(self, **kwargs):
+        """ update doesn't send post_save either: the change log and the
+        caches are updated here
+        """
+
+        kwargs.setdefault('updated_at', timezone.now())
+        with transaction.atomic():
+            pks = list(self.values_list('pk', flat=True))
+            rows = super(CategoryQuerySet, self).update(**kwargs)
+            categories_changed(self.model(pk=pk) for pk in pks)
+        return rows
+
+
+class ProductQuerySet(models.QuerySet):
+    """ QuerySet of Product """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """ Generates the missing slugs in one batch and, as bulk_create
+        doesn't send pre_save/post_save, updates the search index and the
+        caches itself
+        """
+
+        objs = list(objs)
+        unslugged = [obj for obj in objs if not obj.slug]
+        slugs = allocate_slugs(self.model, [obj.title for obj in unslugged])
+        for obj, slug in zip(unslugged, slugs):
+            obj.slug = slug
+        # every image is read once, whatever the number of products using it
+        infos = {}
+        for obj in objs:
+            if obj.image and obj.image_width is None:
+                if obj.image.name not in infos:
+                    infos[obj.image.name] = field_image_info(obj.image)
+                obj.set_image_info(*infos[obj.image.name])
+        objs = super(ProductQuerySet, self).bulk_create(objs, *args, **kwargs)
+        products_changed(objs)
+        return objs
+
+    def update(self, **kwargs):
+        """ update doesn't send post_save either: the updated products are
+        reloaded to refresh the search index, the caches and the change log
+        """
+
+        kwargs.setdefault('updated_at', timezone.now())
+        if 'image' in kwargs and 'image_width' not in kwargs:
+            image = self.model(image=kwargs['image']).image
+            kwargs['image_width'], kwargs['image_height'], \
+                kwargs['image_placeholder'] = field_image_info(image)
+        with transaction.atomic():
+            pks = list(self.values_list('pk', flat=True))
+            rows = super(ProductQuerySet, self).update(**kwargs)
+            products_changed(self.model.objects.filter(pk__in=pks))
+        return rows
 
 
 class Category(models.Model):
@@ -14,6 +90,11 @@ class Category(models.Model):
     description = models.CharField(
         max_length=50, verbose_name=gettext_lazy('Description')
     )
+    updated_at = models.DateTimeField(
+        auto_now=True, verbose_name=gettext_lazy('UpdatedAt')
+    )
+
+    objects = CategoryQuerySet.as_manager()
 
     class Meta:
         """ Метакласс категории """
@@ -60,11 +141,81 @@ class Product(ProductBase):
 
         verbose_name = gettext_lazy('Product')
         verbose_name_plural = gettext_lazy('Products')
+        indexes = [
+            models.Index(fields=['price', 'barcode']),
+            models.Index(fields=['title', 'barcode']),
+        ]
 
     barcode = models.CharField(
         primary_key=True, max_length=20, verbose_name=gettext_lazy('Barcode')
     )
     slug = models.SlugField(unique=True)
+    updated_at = models.DateTimeField(
+        auto_now=True, verbose_name=gettext_lazy('UpdatedAt')
+    )
+    # computed from image when it is saved (see website.images.image_info)
+    image_width = models.PositiveIntegerField(
+        null=True, blank=True, editable=False,
+        verbose_name=gettext_lazy('ImageWidth')
+    )
+    image_height = models.PositiveIntegerField(
+        null=True, blank=True, editable=False,
+        verbose_name=gettext_lazy('ImageHeight')
+    )
+    image_placeholder = models.TextField(
+        blank=True, editable=False,
+        verbose_name=gettext_lazy('ImagePlaceholder')
+    )
+
+    objects = ProductQuerySet.as_manager()
+
+    # attempts to find a free generated slug when concurrent inserts race
+    SLUG_ATTEMPTS = 5
+
+    def save(self, *args, **kwargs):
+        """ Сохраняет продукт. Если slug генерируется автоматически и
+        параллельная вставка заняла его первой, slug генерируется заново
+        """
+
+        if self.slug:
+            return super(Product, self).save(*args, **kwargs)
+
+        for attempt in range(self.SLUG_ATTEMPTS):
+            try:
+                with transaction.atomic():
+                    return super(Product, self).save(*args, **kwargs)
+            except IntegrityError:
+                slug_taken = Product.objects.filter(slug=self.slug) \
+                    .exclude(barcode=self.barcode).exists()
+                if not slug_taken or attempt == self.SLUG_ATTEMPTS - 1:
+                    raise
+                self.slug = ''
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(Product, cls).from_db(db, field_names, values)
+        # remembered to tell whether the image changed when saving
+        instance._loaded_image = instance.__dict__.get('image')
+        return instance
+
+    def image_changed(self):
+        """ Возвращает True, если изображение нужно (пере)обработать: оно
+        новое, изменилось после загрузки из базы или ещё не обработано
+        """
+        if 'image' not in self.__dict__:
+            # deferred and never accessed
+            return False
+        name = self.image.name
+        if not name:
+            return False
+        return name != getattr(self, '_loaded_image', None) or \
+            not self.image._committed or self.image_width is None
+
+    def set_image_info(self, width, height, placeholder):
+        """ Сохраняет размеры и заглушку изображения """
+        self.image_width = width
+        self.image_height = height
+        self.image_placeholder = placeholder
 
     def get_absolute_url(self):
         """ Возвращает всю конечную точку продукта (конечная точка сведений
@@ -89,13 +240,189 @@ class Product(ProductBase):
         )
 
 
+class CatalogChange(models.Model):
+    """ Журнал изменений каталога (Product и Category) для синхронизации
+    терминалов: каждое сохранение или удаление добавляет запись с
+    возрастающим номером seq. Записи удаления служат надгробиями.
+    """
+
+    SAVE = 'save'
+    DELETE = 'delete'
+    ACTION_CHOICES = (
+        (SAVE, gettext_lazy('Save')),
+        (DELETE, gettext_lazy('Delete')),
+    )
+
+    seq = models.BigAutoField(primary_key=True)
+    model = models.CharField(max_length=20, verbose_name=gettext_lazy('Model'))
+    object_pk = models.CharField(
+        max_length=20, verbose_name=gettext_lazy('ObjectPk')
+    )
+    action = models.CharField(
+        max_length=6, choices=ACTION_CHOICES,
+        verbose_name=gettext_lazy('Action')
+    )
+    timestamp = models.DateTimeField(
+        auto_now_add=True, verbose_name=gettext_lazy('Timestamp')
+    )
+
+    class Meta:
+        """ Метакласс CatalogChange """
+
+        verbose_name = gettext_lazy('CatalogChange')
+        verbose_name_plural = gettext_lazy('CatalogChanges')
+
+    def __str__(self):
+        return 'CatalogChange {} - {} {} {}'.format(
+            self.seq, self.action, self.model, self.object_pk
+        )
+
+    def __repr__(self):
+        return (
+            'CatalogChange(seq={},model={},object_pk={},action={})'.format(
+                self.seq, self.model, self.object_pk, self.action
+            )
+        )
+
+    @classmethod
+    def record(cls, objs, action):
+        """ Appends one change per object of objs with a single INSERT """
+
+        cls.objects.bulk_create([
+            cls(model=obj._meta.model_name, object_pk=str(obj.pk),
+                action=action)
+            for obj in objs
+        ])
+
+
+# flag of catalog_changes_muted, per thread
+_catalog_changes = threading.local()
+
+
+@contextmanager
+def catalog_changes_muted():
+    """ Контекстный менеджер, отключающий в текущем потоке побочные эффекты
+    изменений каталога (поисковый индекс, журнал изменений, версии кэша,
+    уменьшенные копии изображений). Только для временных строк, например
+    записанных в транзакции, которая затем откатывается
+    """
+    muted = getattr(_catalog_changes, 'muted', False)
+    _catalog_changes.muted = True
+    try:
+        yield
+    finally:
+        _catalog_changes.muted = muted
+
+
+def _muted():
+    return getattr(_catalog_changes, 'muted', False)
+
+
+def categories_changed(categories):
+    """ Записывает изменение категорий, инвалидирует кэшированный список
+    категорий и версию каталога
+    """
+    if _muted():
+        return
+    CatalogChange.record(categories, CatalogChange.SAVE)
+    bump_versions([CATEGORIES_VERSION_KEY, CATALOG_VERSION_KEY])
+
+
+def categories_deleted(categories):
+    """ Записывает удаление категорий и инвалидирует их кэш """
+    if _muted():
+        return
+    CatalogChange.record(categories, CatalogChange.DELETE)
+    bump_versions([CATEGORIES_VERSION_KEY, CATALOG_VERSION_KEY])
+
+
+def products_changed(products):
+    """ Обновляет продукты в поисковом индексе, записывает их изменение,
+    инвалидирует их кэш и ставит в очередь создание уменьшенных копий
+    изображений
+    """
+    if _muted():
+        return
+    products = list(products)
+    get_search_backend().index(products)
+    schedule_renditions(product.image.name for product in products)
+    CatalogChange.record(products, CatalogChange.SAVE)
+    bump_versions([CATALOG_VERSION_KEY] + [
+        PRODUCT_VERSION_KEY.format(slug=product.slug) for product in products
+    ])
+
+
+def products_deleted(products):
+    """ Удаляет продукты из поискового индекса, записывает их удаление и
+    инвалидирует их кэш
+    """
+    if _muted():
+        return
+    get_search_backend().remove([product.barcode for product in products])
+    CatalogChange.record(products, CatalogChange.DELETE)
+    bump_versions([CATALOG_VERSION_KEY] + [
+        PRODUCT_VERSION_KEY.format(slug=product.slug) for product in products
+    ])
+
+
+def category_changed_receiver(sender, instance, *args, **kwargs):
+    """ Вызывается при сохранении категории """
+    categories_changed([instance])
+
+
+def category_deleted_receiver(sender, instance, *args, **kwargs):
+    """ Вызывается при удалении категории """
+    categories_deleted([instance])
+
+
+post_save.connect(category_changed_receiver, sender=Category)
+post_delete.connect(category_deleted_receiver, sender=Category)
+
+
 def pre_save_product_receiver(sender, instance, *args, **kwargs):
-    """ Генерирует поле slug перед сохранением экземпляра продукта """
+    """ Генерирует поле slug и данные изображения перед сохранением
+    экземпляра продукта
+    """
     if not instance.slug:
         instance.slug = unique_slug_generator(instance)
+    if instance.image_changed():
+        instance.set_image_info(*field_image_info(instance.image))
+
+
+def post_save_product_receiver(sender, instance, *args, **kwargs):
+    """ Обновляет продукт в поисковом индексе и версию каталога """
+    products_changed([instance])
+
+
+def post_delete_product_receiver(sender, instance, *args, **kwargs):
+    """ Удаляет продукт из поискового индекса и обновляет версию каталога
+    """
+    products_deleted([instance])
 
 
 pre_save.connect(pre_save_product_receiver, sender=Product)
+post_save.connect(post_save_product_receiver, sender=Product)
+post_delete.connect(post_delete_product_receiver, sender=Product)
+
+
+class PaymentMethodQuerySet(models.QuerySet):
+    """ QuerySet of PaymentMethod """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """ bulk_create doesn't send post_save, so the cache is invalidated
+        here
+        """
+
+        objs = super(PaymentMethodQuerySet, self).bulk_create(
+            objs, *args, **kwargs
+        )
+        payment_methods_changed()
+        return objs
+
+    def update(self, **kwargs):
+        rows = super(PaymentMethodQuerySet, self).update(**kwargs)
+        payment_methods_changed()
+        return rows
 
 
 class PaymentMethod(models.Model):
@@ -105,6 +432,8 @@ class PaymentMethod(models.Model):
         unique=True, max_length=50, verbose_name=gettext_lazy('Description')
     )
 
+    objects = PaymentMethodQuerySet.as_manager()
+
     class Meta:
 
 
@@ -118,6 +447,64 @@ class PaymentMethod(models.Model):
         return ('PaymentMethod(description={})').format(self.description)
 
 
+def payment_methods_changed():
+    """ Инвалидирует кэшированный список способов оплаты """
+    bump_versions([PAYMENT_METHODS_VERSION_KEY])
+
+
+def payment_method_changed_receiver(sender, instance, *args, **kwargs):
+    """ Вызывается при сохранении и удалении способа оплаты """
+    payment_methods_changed()
+
+
+post_save.connect(payment_method_changed_receiver, sender=PaymentMethod)
+post_delete.connect(payment_method_changed_receiver, sender=PaymentMethod)
+
+
+class PurchaseOrderQuerySet(models.QuerySet):
+    """ QuerySet of PurchaseOrder """
+
+    def with_totals(self):
+        """ Annotates each order with item_count, items_total (sum of the
+        items' total_price) and payments_total (sum of the payment values),
+        computed by the database in the same query
+        """
+
+        items = PurchaseItem.objects.filter(
+            purchase_order=models.OuterRef('pk')
+        ).order_by().values('purchase_order')
+        payments = PurchasePaymentMethod.objects.filter(
+            purchase_order=models.OuterRef('pk')
+        ).order_by().values('purchase_order')
+        amount = models.DecimalField(max_digits=14, decimal_places=3)
+
+        return self.annotate(
+            item_count=Coalesce(
+                models.Subquery(
+                    items.annotate(count=models.Count('id')).values('count'),
+                    output_field=models.IntegerField()
+                ),
+                models.Value(0)
+            ),
+            items_total=Coalesce(
+                models.Subquery(
+                    items.annotate(
+                        total=models.Sum('total_price')
+                    ).values('total'),
+                    output_field=amount
+                ),
+                models.Value(0), output_field=amount
+            ),
+            payments_total=Coalesce(
+                models.Subquery(
+                    payments.annotate(total=models.Sum('value')).values('total'),
+                    output_field=amount
+                ),
+                models.Value(0), output_field=amount
+            ),
+        )
+
+
 class PurchaseOrder(models.Model):
 
 
@@ -129,11 +516,24 @@ class PurchaseOrder(models.Model):
     )
     cart = models.BooleanField(verbose_name=gettext_lazy('Cart'))
 
+    objects = PurchaseOrderQuerySet.as_manager()
+
     class Meta:
         """ PurchaseOrder's Meta class """
 
         verbose_name = gettext_lazy('PurchaseOrder')
         verbose_name_plural = gettext_lazy('PurchaseOrders')
+        constraints = [
+            # a user has at most one open cart; the partial index also
+            # serves the lookup of that cart
+            models.UniqueConstraint(
+                fields=['user'], condition=models.Q(cart=True),
+                name='unique_open_cart'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'cart', 'timestamp']),
+        ]
 
     def __str__(self):
         return 'PurchaseOrder - {}'.format(self.id)
@@ -172,6 +572,8 @@ class PurchaseItem(ProductBase):
 
         verbose_name = gettext_lazy('PurchaseItem')
         verbose_name_plural = gettext_lazy('PurchaseItems')
+        # a product appears once per order, extra units go to quantity
+        unique_together = (('purchase_order', 'barcode'),)
 
     def __str__(self):
         return 'PurchaseItem {} - order {}'.format(
@@ -0,0 +1,178 @@
+""" website pagination module
+
+Keyset (cursor) pagination: instead of an OFFSET, every page is fetched with
+a ``WHERE (sort columns) > (values of the last row seen)`` condition, so its
+cost doesn't grow with the depth of the page and the links keep pointing to
+the right place while rows are inserted or removed.
+"""
+
+import base64
+import binascii
+import datetime
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """ DjangoJSONEncoder keeping the microseconds of datetimes and times,
+    which it cuts to milliseconds: rows closer than a millisecond would
+    otherwise be skipped or repeated across pages
+    """
+
+    def default(self, o):  # pylint: disable=E0202
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super(CursorEncoder, self).default(o)
+
+
+class InvalidCursor(Exception):
+    """ Raised when a cursor can't be decoded for the paginated queryset """
+
+
+class KeysetPage:
+    """ A page of results produced by KeysetPaginator """
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """ Paginates a queryset by the given ordering. The primary key is added
+    as the last sort column when missing, so every row has a distinct
+    position. Sort columns must not be nullable.
+    """
+
+    def __init__(self, queryset, ordering, per_page):
+        ordering = list(ordering)
+        pk_name = queryset.model._meta.pk.name
+        if not {pk_name, '-' + pk_name, 'pk', '-pk'} & set(ordering):
+            ordering.append(pk_name)
+        self.queryset = queryset
+        self.ordering = ordering
+        self.per_page = int(per_page)
+
+    def page(self, cursor=None):
+        """ Returns the page that starts right after (or, for a previous
+        cursor, ends right before) the position stored in cursor
+        """
+
+        if cursor:
+            values, backwards = self.decode_cursor(cursor)
+            queryset = self.queryset.filter(
+                self._after(values, reverse=backwards)
+            )
+        else:
+            backwards = False
+            queryset = self.queryset
+
+        ordering = self._reverse(self.ordering) if backwards else self.ordering
+        rows = list(queryset.order_by(*ordering)[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if backwards:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, bool(cursor)
+
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = self.encode_cursor(rows[-1])
+        if rows and has_previous:
+            previous_cursor = self.encode_cursor(rows[0], backwards=True)
+        return KeysetPage(rows, next_cursor, previous_cursor)
+
+    def encode_cursor(self, obj, backwards=False):
+        """ Returns an opaque cursor pointing at the position of obj """
+
+        payload = {
+            'v': [getattr(obj, name.lstrip('-')) for name in self.ordering],
+        }
+        if backwards:
+            payload['b'] = 1
+        data = json.dumps(payload, cls=CursorEncoder).encode('utf-8')
+        return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """ Returns the sort values and direction stored in cursor """
+
+        try:
+            data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            payload = json.loads(data.decode('utf-8'))
+            values = payload['v']
+            backwards = bool(payload.get('b'))
+            if len(values) != len(self.ordering):
+                raise InvalidCursor(cursor)
+            values = [
+                self._to_python(name.lstrip('-'), value)
+                for name, value in zip(self.ordering, values)
+            ]
+        except (binascii.Error, ValueError, TypeError, KeyError,
+                AttributeError, ValidationError):
+            raise InvalidCursor(cursor)
+        return values, backwards
+
+    def _to_python(self, name, value):
+        opts = self.queryset.model._meta
+        try:
+            field = opts.pk if name == 'pk' else opts.get_field(name)
+        except FieldDoesNotExist:
+            # annotations (e.g. a search rank) are kept as JSON decoded them
+            return value
+        return field.to_python(value)
+
+    def _after(self, values, reverse=False):
+        """ Builds the lexicographic "comes after values" condition """
+
+        conditions = []
+        for index, name in enumerate(self.ordering):
+            descending = name.startswith('-')
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition = {
+                prior.lstrip('-'): value
+                for prior, value in zip(self.ordering[:index], values)
+            }
+            condition['{}__{}'.format(name.lstrip('-'), lookup)] = \
+                values[index]
+            conditions.append(Q(**condition))
+        return reduce(or_, conditions)
+
+    @staticmethod
+    def _reverse(ordering):
+        return [
+            name[1:] if name.startswith('-') else '-' + name
+            for name in ordering
+        ]
+
+
+def cursor_querystring(query_dict, cursor):
+    """ Returns the urlencoded query_dict with its cursor parameter replaced,
+    keeping the filters of the current page
+    """
+
+    query_dict = query_dict.copy()
+    query_dict['cursor'] = cursor
+    return query_dict.urlencode()
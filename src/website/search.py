@@ -0,0 +1,164 @@
+""" website search module
+
+Full-text search backends for the product catalog. The backend in use is
+chosen by the ``PRODUCT_SEARCH_BACKEND`` setting and is kept in sync with the
+``Product`` table by the receivers registered in ``website.models``.
+"""
+
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+
+DEFAULT_SEARCH_BACKEND = 'website.search.SQLiteFTSSearchBackend'
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class BaseSearchBackend:
+    """ Interface every product search backend has to implement """
+
+    # name of the annotation holding the relevance of each result (lower is
+    # better), or None when the backend can't rank its results
+    rank_field = None
+
+    def index(self, products):
+        """ Adds (or refreshes) the given products in the search index """
+
+        raise NotImplementedError
+
+    def remove(self, barcodes):
+        """ Removes the products with the given barcodes from the index """
+
+        raise NotImplementedError
+
+    def search(self, queryset, query):
+        """ Returns the queryset narrowed to the products matching query """
+
+        raise NotImplementedError
+
+
+class SimpleSearchBackend(BaseSearchBackend):
+    """ Index-less backend that scans title and description. Only meant for
+    databases without a full-text engine
+    """
+
+    def index(self, products):
+        pass
+
+    def remove(self, barcodes):
+        pass
+
+    def search(self, queryset, query):
+        return queryset.filter(
+            Q(title__icontains=query) |
+            Q(description__icontains=query)
+        )
+
+
+class SQLiteFTSSearchBackend(BaseSearchBackend):
+    """ Backend based on the SQLite FTS5 ``website_product_fts`` virtual
+    table (created by the website migrations). Results are ranked by bm25.
+    """
+
+    table = 'website_product_fts'
+    rank_field = 'search_rank'
+
+    def index(self, products):
+        rows = [
+            (product.barcode, product.title, product.description)
+            for product in products
+        ]
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            self._delete(cursor, [row[0] for row in rows])
+            cursor.executemany(
+                'INSERT INTO {} (barcode, title, description) '
+                'VALUES (%s, %s, %s)'.format(self.table),
+                rows
+            )
+
+    def remove(self, barcodes):
+        barcodes = list(barcodes)
+        if not barcodes:
+            return
+        with connection.cursor() as cursor:
+            self._delete(cursor, barcodes)
+
+    def search(self, queryset, query):
+        match = self.match_expression(query)
+        if not match:
+            return queryset.annotate(**{
+                self.rank_field: Value(0, output_field=FloatField())
+            }).none()
+        product_table = queryset.model._meta.db_table
+        return queryset.extra(
+            tables=[self.table],
+            where=[
+                '{fts}.barcode = {product}.barcode'.format(
+                    fts=self.table, product=product_table
+                ),
+                '{} MATCH %s'.format(self.table),
+            ],
+            params=[match],
+        ).annotate(**{
+            self.rank_field: RawSQL(
+                '{}.rank'.format(self.table), (), output_field=FloatField()
+            )
+        })
+
+    @staticmethod
+    def match_expression(query):
+        """ Converts free text typed by a user into a safe FTS5 query: every
+        word becomes a quoted prefix term and all of them must match
+        """
+
+        terms = ' '.join(
+            '"{}"*'.format(token) for token in TOKEN_RE.findall(query)
+        )
+        return '{title description}: (' + terms + ')' if terms else ''
+
+    def _delete(self, cursor, barcodes):
+        # barcode is an indexed column so a row is found through the
+        # full-text index instead of scanning the whole virtual table. Only
+        # barcodes without any word character need the slow path.
+        indexed = {barcode for barcode in barcodes if TOKEN_RE.search(barcode)}
+        cursor.executemany(
+            'DELETE FROM {table} WHERE {table} MATCH %s '
+            'AND barcode = %s'.format(table=self.table),
+            [
+                ('barcode: "{}"'.format(barcode.replace('"', '""')), barcode)
+                for barcode in indexed
+            ]
+        )
+        cursor.executemany(
+            'DELETE FROM {} WHERE barcode = %s'.format(self.table),
+            [(barcode,) for barcode in barcodes if barcode not in indexed]
+        )
+
+
+_backend = None
+
+
+def get_search_backend():
+    """ Returns the configured search backend instance. The FTS backend is
+    swapped for the simple one on databases other than SQLite
+    """
+
+    global _backend  # pylint: disable=W0603
+
+    if _backend is None:
+        path = getattr(
+            settings, 'PRODUCT_SEARCH_BACKEND', DEFAULT_SEARCH_BACKEND
+        )
+        backend_class = import_string(path)
+        if issubclass(backend_class, SQLiteFTSSearchBackend) and \
+                connection.vendor != 'sqlite':
+            backend_class = SimpleSearchBackend
+        _backend = backend_class()
+    return _backend
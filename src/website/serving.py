@@ -0,0 +1,244 @@
+""" website serving module
+
+Serving of the media and static files without keeping a Python worker busy
+with the transfer. When a front proxy is configured (``SENDFILE_BACKEND``)
+the view only resolves the file and hands it over with an ``X-Sendfile`` or
+``X-Accel-Redirect`` header. Otherwise the file is sent with FileResponse,
+which WSGI servers turn into sendfile(2) through ``wsgi.file_wrapper``.
+ETag/Last-Modified revalidation, single byte ranges and cache headers are
+handled either way, and the static files are sent precompressed (see
+CompressedManifestStaticFilesStorage) to the browsers accepting it.
+"""
+
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, \
+    patch_vary_headers
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+
+from .storage import COMPRESSIBLE_EXTENSIONS, is_hashed, \
+    is_manifest_hashed, precompressed_encodings
+
+
+# a content-addressed file never changes: browsers keep it for a year
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+SENDFILE_HEADERS = {
+    'x-sendfile': 'X-Sendfile',
+    'x-accel-redirect': 'X-Accel-Redirect',
+}
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+CODING_RE = re.compile(r'^\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([\d.]+))?\s*$')
+
+
+class UnsatisfiableRange(Exception):
+    """ Raised when a Range header starts past the end of the file """
+
+
+class RangeFile:
+    """ File-like object reading length bytes of file from offset. It has
+    no fileno() on purpose: wsgi.file_wrapper would send the whole file.
+    """
+
+    def __init__(self, file, offset, length):
+        file.seek(offset)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """ Returns the (first, last) bytes requested by a single range Range
+    header, or None when the whole file should be sent (no header, several
+    ranges, syntax errors)
+    """
+
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        # suffix range: the last bytes of the file
+        if int(last) == 0:
+            raise UnsatisfiableRange(header)
+        return max(0, size - int(last)), size - 1
+    first = int(first)
+    if first >= size:
+        raise UnsatisfiableRange(header)
+    last = int(last) if last else size - 1
+    if last < first:
+        return None
+    return first, min(last, size - 1)
+
+
+def accepted_encodings(header):
+    """ Returns the content codings an Accept-Encoding header allows """
+
+    accepted = set()
+    for coding in header.split(','):
+        match = CODING_RE.match(coding)
+        if not match:
+            continue
+        try:
+            if float(match.group(2) or 1) > 0:
+                accepted.add(match.group(1).lower())
+        except ValueError:
+            continue
+    return accepted
+
+
+def serve(request, path, document_root, url_prefix, max_age,
+          immutable=is_hashed, precompressed=False):
+    """ Returns the response sending the file stored under path in
+    document_root, url_prefix being the URL of document_root. Files whose
+    name passes immutable are cached forever. With precompressed, the .br
+    or .gz copy of the file is sent instead when the client accepts it.
+    """
+
+    if any(part.startswith('.') for part in path.split('/')):
+        # hidden files, e.g. uploads still being written by the storage
+        raise Http404(path)
+    try:
+        full_path = safe_join(document_root, path)
+        file_stat = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404(path)
+    if not stat.S_ISREG(file_stat.st_mode):
+        raise Http404(path)
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+    cache_control = IMMUTABLE_CACHE_CONTROL if immutable(path) \
+        else 'public, max-age={}'.format(max_age)
+    vary = precompressed and path.endswith(COMPRESSIBLE_EXTENSIONS)
+    if vary:
+        accepted = accepted_encodings(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        for coding, extension in precompressed_encodings():
+            if coding not in accepted:
+                continue
+            try:
+                file_stat = os.stat(full_path + extension)
+            except OSError:
+                continue
+            path += extension
+            full_path += extension
+            encoding = coding
+            break
+
+    etag = '"{:x}-{:x}"'.format(file_stat.st_mtime_ns, file_stat.st_size)
+    last_modified = int(file_stat.st_mtime)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        response = _file_response(
+            request, path, full_path, url_prefix, content_type, encoding,
+            file_stat.st_size, etag, last_modified
+        )
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = cache_control
+    if vary:
+        patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def _file_response(request, path, full_path, url_prefix, content_type,
+                   encoding, size, etag, last_modified):
+    backend = getattr(settings, 'SENDFILE_BACKEND', None)
+    if backend:
+        # the proxy sends the file and answers the Range requests itself
+        response = HttpResponse(content_type=content_type)
+        if backend == 'x-accel-redirect':
+            location = quote(
+                getattr(settings, 'SENDFILE_ACCEL_PREFIX', '').rstrip('/') +
+                url_prefix + path
+            )
+        else:
+            # header values are latin-1: mod_xsendfile unescapes the path
+            location = quote(full_path)
+        response[SENDFILE_HEADERS[backend]] = location
+    else:
+        response = _stream(request, full_path, content_type, size, etag,
+                           last_modified)
+        if response.status_code == 416:
+            return response
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def _stream(request, full_path, content_type, size, etag, last_modified):
+    byte_range = None
+    header = request.META.get('HTTP_RANGE')
+    if header and _if_range(request, etag, last_modified):
+        try:
+            byte_range = parse_range(header, size)
+        except UnsatisfiableRange:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = 'bytes */{}'.format(size)
+            return response
+
+    file = open(full_path, 'rb')
+    if byte_range is None:
+        return FileResponse(file, content_type=content_type)
+    first, last = byte_range
+    response = FileResponse(
+        RangeFile(file, first, last - first + 1),
+        status=206, content_type=content_type
+    )
+    response['Content-Length'] = last - first + 1
+    response['Content-Range'] = 'bytes {}-{}/{}'.format(first, last, size)
+    return response
+
+
+def _if_range(request, etag, last_modified):
+    """ Returns whether the Range header applies to the current file """
+
+    header = request.META.get('HTTP_IF_RANGE')
+    if not header:
+        return True
+    if header.startswith(('"', 'W/')):
+        return parse_etags(header) == [etag]
+    return parse_http_date_safe(header) == last_modified
+
+
+def serve_media(request, path):
+    """ Serves the uploaded files from MEDIA_ROOT """
+
+    return serve(
+        request, path, settings.MEDIA_ROOT, settings.MEDIA_URL,
+        getattr(settings, 'MEDIA_CACHE_MAX_AGE', 24 * 60 * 60)
+    )
+
+
+def serve_static(request, path):
+    """ Serves the collected static files from STATIC_ROOT """
+
+    return serve(
+        request, path, settings.STATIC_ROOT, settings.STATIC_URL,
+        getattr(settings, 'STATIC_CACHE_MAX_AGE', 60 * 60),
+        immutable=is_manifest_hashed, precompressed=True
+    )
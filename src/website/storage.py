@@ -0,0 +1,261 @@
+""" website storage module
+
+Content-addressed media storage: an uploaded file is stored under the
+SHA-256 of its bytes (``kettle.jpg`` -> ``3f/3fa4...e1.jpg``), so identical
+uploads share a single file, and a single set of renditions (see
+``website.images``), whatever their original names. As the content of a
+name never changes, hashed files can be cached by browsers forever.
+
+A shared file can't be deleted together with one of the rows using it;
+``purge_media`` deletes the files that no row references anymore.
+
+The static files get the same treatment at ``collectstatic`` time from
+CompressedManifestStaticFilesStorage: content-hashed names, plus gzip and
+brotli copies that ``website.serving`` sends instead of compressing on the
+fly.
+"""
+
+import gzip
+import hashlib
+import os
+import posixpath
+import re
+import time
+import uuid
+from collections import Counter
+
+from django.apps import apps
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile, File
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import models
+from django.db.models import Count
+
+from .images import delete_renditions
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+
+# the stored file (or a file derived from it, like its renditions) of a
+# hashed name always has the same content. The <digest[:2]>/ directory is
+# required, so that a file merely called <64 hex digits>.jpg isn't taken for
+# one (ContentAddressedStorage.save always hashes what it stores)
+HASHED_NAME_RE = re.compile(
+    r'(?:^|/)([0-9a-f]{2})/\1[0-9a-f]{62}(?:\.[^/]*)?$'
+)
+# hashed uploads only, without the files derived from them
+HASHED_UPLOAD_RE = re.compile(
+    r'(?:^|/)([0-9a-f]{2})/\1[0-9a-f]{62}(?:\.[^./]*)?$'
+)
+
+# names given by ManifestStaticFilesStorage: css/main.css -> css/main.<12
+# hex digits of the md5 of the content>.css
+MANIFEST_HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.[^/.]+$')
+
+# static files worth compressing (images and woff fonts are compressed
+# already), and the size below which compressing doesn't pay off
+COMPRESSIBLE_EXTENSIONS = (
+    '.css', '.js', '.map', '.json', '.svg', '.txt', '.xml', '.html', '.ico',
+    '.ttf', '.otf', '.eot',
+)
+COMPRESS_MIN_SIZE = 256
+
+# seconds an unreferenced file is kept, so that an upload isn't deleted
+# before the transaction saving the row that references it commits
+PURGE_GRACE_PERIOD = 60 * 60
+
+
+def is_hashed(name):
+    """ Returns whether name is a content-addressed name """
+
+    return bool(HASHED_NAME_RE.search(name))
+
+
+def is_manifest_hashed(name):
+    """ Returns whether name is a content-hashed static file name """
+
+    return bool(MANIFEST_HASHED_NAME_RE.search(name))
+
+
+def precompressed_encodings():
+    """ Returns the (Content-Encoding, extension) pairs of the compressed
+    copies written next to the static files, best compression first
+    """
+
+    encodings = [('gzip', '.gz')]
+    if brotli is not None:
+        encodings.insert(0, ('br', '.br'))
+    return encodings
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """ FileSystemStorage naming the saved files by their content """
+
+    def hashed_name(self, name, content):
+        """ Returns the content-addressed name of content, keeping the
+        directory and the (lowercased) extension of name
+        """
+
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(
+                chunk if isinstance(chunk, bytes) else chunk.encode('utf-8')
+            )
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        digest = digest.hexdigest()
+        directory, basename = posixpath.split(name.replace('\\', '/'))
+        _, extension = os.path.splitext(basename)
+        return posixpath.join(
+            directory, digest[:2], digest + extension.lower()
+        )
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        # always hashed: a name that merely looks hashed (e.g. an upload
+        # called <64 hex digits>.jpg) says nothing about its content
+        name = self.hashed_name(name, content)
+        return super(ContentAddressedStorage, self).save(
+            name, content, max_length=max_length
+        )
+
+    def save_derived(self, name, content):
+        """ Saves content under name as is, for files generated from a
+        stored one (renditions are named after their original)
+        """
+
+        return super(ContentAddressedStorage, self).save(name, content)
+
+    def get_available_name(self, name, max_length=None):
+        if is_hashed(name):
+            # an existing file already has the right content
+            return name
+        return super(ContentAddressedStorage, self).get_available_name(
+            name, max_length=max_length
+        )
+
+    def _save(self, name, content):
+        if not is_hashed(name):
+            return super(ContentAddressedStorage, self)._save(name, content)
+
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            # a new reference: restart the grace period of the file
+            os.utime(full_path)
+            return name
+        # written aside then renamed, so concurrent uploads of the same
+        # content never expose a partial file
+        directory, basename = posixpath.split(name)
+        temporary = super(ContentAddressedStorage, self)._save(
+            posixpath.join(
+                directory, '.{}.{}.tmp'.format(basename, uuid.uuid4().hex)
+            ),
+            content
+        )
+        os.replace(self.path(temporary), full_path)
+        return name
+
+
+class CompressedManifestStaticFilesStorage(
+        ManifestStaticFilesStorage):
+    """ ManifestStaticFilesStorage also writing a .gz copy (and a .br one
+    when brotli is installed) of every compressible collected file
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        collected = set()
+        for name, hashed_name, processed in super(
+                CompressedManifestStaticFilesStorage, self
+        ).post_process(paths, dry_run=dry_run, **options):
+            yield name, hashed_name, processed
+            if not isinstance(processed, Exception):
+                collected.update(path for path in (name, hashed_name) if path)
+        if dry_run:
+            return
+        # the files are final only once every pass rewrote their references
+        for name in sorted(collected):
+            self.compress(name)
+
+    def compress(self, name):
+        """ Writes the compressed copies of name, when they are smaller """
+
+        if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+            return
+        with self.open(name) as original:
+            data = original.read()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return
+        for encoding, extension in precompressed_encodings():
+            if encoding == 'br':
+                compressed = brotli.compress(data)
+            else:
+                compressed = gzip.compress(data, compresslevel=9, mtime=0)
+            if len(compressed) >= len(data):
+                continue
+            if self.exists(name + extension):
+                self.delete(name + extension)
+            self.save(name + extension, ContentFile(compressed))
+
+
+def file_fields(storage=default_storage):
+    """ Yields (model, field name) for every file field saving to storage """
+
+    for model in apps.get_models():
+        if model._meta.abstract or model._meta.proxy:
+            continue
+        for field in model._meta.concrete_fields:
+            if isinstance(field, models.FileField) and \
+                    field.storage is storage:
+                yield model, field.name
+
+
+def count_references(names=None, storage=default_storage):
+    """ Returns a Counter of the rows referencing each stored name (all of
+    them, or only the given names), with one GROUP BY query per file field
+    """
+
+    references = Counter()
+    for model, field_name in file_fields(storage):
+        queryset = model._default_manager.exclude(**{field_name: ''})
+        if names is not None:
+            queryset = queryset.filter(**{field_name + '__in': list(names)})
+        references.update(dict(
+            queryset.order_by().values_list(field_name)
+            .annotate(count=Count('pk'))
+        ))
+    return references
+
+
+def purge_unreferenced(storage=default_storage, grace=PURGE_GRACE_PERIOD):
+    """ Deletes the hashed files (and their renditions) referenced by no
+    row that weren't saved in the last grace seconds. Returns their names.
+    """
+
+    stored = [
+        name for name in _walk(storage, '') if HASHED_UPLOAD_RE.search(name)
+    ]
+    references = count_references(storage=storage)
+    deadline = time.time() - grace
+    deleted = []
+    for name in stored:
+        if references[name] or \
+                storage.get_modified_time(name).timestamp() > deadline:
+            continue
+        delete_renditions(name, storage)
+        storage.delete(name)
+        deleted.append(name)
+    return deleted
+
+
+def _walk(storage, directory):
+    directories, files = storage.listdir(directory)
+    for name in files:
+        yield posixpath.join(directory, name)
+    for name in directories:
+        yield from _walk(storage, posixpath.join(directory, name))
@@ -0,0 +1,98 @@
+""" Template tags rendering the product images with their renditions
+
+    {% load images %}
+    {% responsive_image product.image product.title width=320 %}
+"""
+
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from ..images import FORMATS, get_renditions
+
+
+register = template.Library()
+
+
+def _srcset(storage, renditions):
+    return ', '.join(
+        '{} {}w'.format(storage.url(name), width)
+        for width, name in renditions
+    )
+
+
+@register.simple_tag
+def image_srcset(image, image_format='jpeg'):
+    """ Returns the srcset listing the renditions of image in image_format,
+    empty when it has none
+    """
+
+    if not image:
+        return ''
+    renditions = get_renditions(image.name, image.storage)
+    return _srcset(image.storage, renditions.get(image_format, []))
+
+
+@register.simple_tag
+def responsive_image(image, alt='', sizes=None, lazy=True, width=None,
+                     original_width=None, original_height=None,
+                     placeholder='', **attrs):
+    """ Renders image as a <picture> offering its renditions to the browser,
+    which downloads the smallest one covering sizes. Without renditions
+    (not generated yet) the original is used. Images below the fold are
+    lazy loaded; pass lazy=False for the ones visible on page load.
+
+    width is the width the image is displayed at (never above the original
+    one). Given the size of the original as well, the page reserves the room
+    of the image before it loads, showing the placeholder data URI stretched
+    over it in the meantime.
+    """
+
+    if not image:
+        return ''
+    storage = image.storage
+    renditions = get_renditions(image.name, storage)
+
+    style = []
+    if width and original_width and original_height:
+        width = min(int(width), original_width)
+        attrs['width'] = width
+        attrs['height'] = max(1, round(width * original_height /
+                                       original_width))
+        # scales down on narrow screens, keeping the aspect ratio
+        style.append('max-width: 100%; height: auto;')
+    elif width:
+        attrs['width'] = width
+    if sizes is None:
+        sizes = '(max-width: {0}px) 100vw, {0}px'.format(width) \
+            if width else '100vw'
+    if placeholder:
+        style.append(
+            'background-size: cover; '
+            'background-image: url({});'.format(placeholder)
+        )
+    if style:
+        attrs['style'] = ' '.join(style)
+
+    attrs['alt'] = alt
+    attrs['decoding'] = 'async'
+    if lazy:
+        attrs['loading'] = 'lazy'
+    # browsers ignoring srcset get the largest JPEG rendition
+    fallback = renditions.get('jpeg')
+    attrs['src'] = storage.url(fallback[-1][1]) if fallback else image.url
+    if fallback:
+        attrs['srcset'] = _srcset(storage, fallback)
+        attrs['sizes'] = sizes
+    img = format_html(
+        '<img {}>',
+        format_html_join(' ', '{}="{}"', sorted(attrs.items()))
+    )
+
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">', [
+            (FORMATS[image_format][1], _srcset(storage, found), sizes)
+            for image_format, found in renditions.items()
+            if image_format != 'jpeg'
+        ]
+    )
+    return format_html('<picture>{}{}</picture>', sources, img)
@@ -0,0 +1,38 @@
+""" Mixins shared by the website and restapi test cases """
+
+import shutil
+import tempfile
+
+from django.core.cache import caches
+from django.test import override_settings
+
+from website.throttling import THROTTLE_CACHE
+
+
+class ThrottleTestMixin:
+    """ Starts every test with empty token buckets. The throttle cache is
+    local to the test run (see pyshop.test_runner)
+    """
+
+    def setUp(self):
+        super(ThrottleTestMixin, self).setUp()
+        caches[THROTTLE_CACHE].clear()
+
+
+class TemporaryMediaRootMixin:
+    """ Runs every test with MEDIA_ROOT and STATIC_ROOT pointed to new
+    temporary directories (self.media_root and self.static_root), deleted
+    afterwards
+    """
+
+    def setUp(self):
+        super(TemporaryMediaRootMixin, self).setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.static_root)
+        settings_override = override_settings(
+            MEDIA_ROOT=self.media_root, STATIC_ROOT=self.static_root
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
@@ -0,0 +1,155 @@
+""" This module tests website app cache helpers """
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from website.cache import CSRF_PLACEHOLDER, get_categories, \
+    get_payment_methods
+from website.models import Category, PaymentMethod, Product
+
+
+class CategoriesCacheTest(TestCase):
+    """ Test case for the cached categories list """
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(description='Furniture')
+
+    def test_cached(self):
+        """ Test that the categories are queried only once """
+
+        self.assertEqual(get_categories(), [self.category])
+        with self.assertNumQueries(0):
+            self.assertEqual(get_categories(), [self.category])
+            self.client.get(reverse('website:signin'))
+
+    def test_invalidation(self):
+        """ Test that saving or deleting a category refreshes the list """
+
+        get_categories()
+        self.category.description = 'Kitchen'
+        self.category.save()
+        self.assertEqual(get_categories()[0].description, 'Kitchen')
+
+        self.category.delete()
+        self.assertEqual(get_categories(), [])
+
+    def test_manager_edit(self):
+        """ Test that a category edited in the manager shows up at once """
+
+        self.client.get(reverse('website:index'))
+        self.client.post(
+            reverse('manager:category-edit', args=(self.category.id,)),
+            {'description': 'Kitchen'}
+        )
+        response = self.client.get(reverse('website:index'))
+        self.assertContains(response, '?category=Kitchen')
+        self.assertNotContains(response, '?category=Furniture')
+
+
+class PaymentMethodsCacheTest(TestCase):
+    """ Test case for the cached payment methods list """
+
+    def setUp(self):
+        cache.clear()
+        self.cash = PaymentMethod.objects.create(description='Cash')
+
+    def test_cached_and_invalidated(self):
+        """ Test that the list is queried once and refreshed on changes,
+        bulk ones included
+        """
+
+        self.assertEqual(get_payment_methods(), [self.cash])
+        with self.assertNumQueries(0):
+            get_payment_methods()
+
+        card, = PaymentMethod.objects.bulk_create(
+            [PaymentMethod(description='Card')]
+        )
+        self.assertEqual(len(get_payment_methods()), 2)
+
+        PaymentMethod.objects.filter(description='Cash').update(
+            description='Money'
+        )
+        self.assertEqual(get_payment_methods()[0].description, 'Money')
+
+
+class AnonymousPageCacheTest(TestCase):
+    """ Test case for the full-page cache of anonymous storefront pages """
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(description='Category')
+        self.wardrobe = Product.objects.create(
+            barcode='2012345012349', title='Wardrobe',
+            description='Lorem ipsum', image='wardrobe.jpeg', price=55.990,
+            category=self.category
+        )
+        self.mattress = Product.objects.create(
+            barcode='5901234123457', title='Mattress',
+            description='Mattress', image='mattress.jpg', price=800.724,
+            category=self.category
+        )
+
+    def get_detail(self, product, **extra):
+        return self.client.get(product.get_absolute_url(), **extra)
+
+    def test_cached_page(self):
+        """ Test that a second anonymous hit doesn't touch the database and
+        gets a CSRF token of its own
+        """
+
+        first = self.client.get(reverse('website:index'))
+        with self.assertNumQueries(0):
+            second = self.client.get(reverse('website:index'))
+        self.assertEqual(second.status_code, 200)
+        self.assertContains(second, 'Wardrobe')
+        self.assertNotContains(second, CSRF_PLACEHOLDER)
+        self.assertIn('csrfmiddlewaretoken', second.content.decode())
+        self.assertIn('csrftoken', second.cookies)
+        self.assertNotEqual(first.content, second.content)
+
+    def test_language_variants(self):
+        """ Test that each language gets its own copy """
+
+        # the only query left on a cached product page is the updated_at
+        # lookup of the ETag
+        self.get_detail(self.wardrobe)
+        with self.assertNumQueries(1):
+            self.get_detail(self.wardrobe)
+        with self.assertNumQueries(2):
+            self.get_detail(self.wardrobe, HTTP_ACCEPT_LANGUAGE='pt-br')
+
+    def test_logged_user_bypass(self):
+        """ Test that logged users always get a rendered page """
+
+        self.get_detail(self.wardrobe)
+        self.client.force_login(
+            User.objects.get_or_create(username='testuser')[0]
+        )
+        response = self.get_detail(self.wardrobe)
+        self.assertEqual(response.context['authenticated_user'].username,
+                         'testuser')
+
+    def test_selective_purge(self):
+        """ Test that a product change purges its own page and the lists,
+        but not the pages of other products
+        """
+
+        self.get_detail(self.wardrobe)
+        self.get_detail(self.mattress)
+
+        self.wardrobe.title = 'Big Wardrobe'
+        self.wardrobe.save()
+
+        self.assertContains(self.get_detail(self.wardrobe), 'Big Wardrobe')
+        with self.assertNumQueries(1):
+            self.get_detail(self.mattress)
+        self.assertContains(self.client.get(reverse('website:index')),
+                            'Big Wardrobe')
+
+        self.category.description = 'Furniture'
+        self.category.save()
+        self.assertContains(self.get_detail(self.mattress), 'Furniture')
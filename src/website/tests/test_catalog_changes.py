@@ -0,0 +1,101 @@
+""" This module tests the catalog change log of website app """
+
+from django.test import TestCase
+
+from website.cache import CATALOG_VERSION_KEY, get_version
+from website.models import CatalogChange, Category, Product, \
+    catalog_changes_muted
+
+
+class CatalogChangeTest(TestCase):
+    """ Test case for the CatalogChange records """
+
+    def setUp(self):
+        self.category = Category.objects.create(description='Kitchen')
+        self.kettle = Product.objects.create(
+            barcode='1111', title='Kettle', description='Electric kettle',
+            image='kettle.jpg', price=10, category=self.category
+        )
+
+    def changes(self, since=0):
+        return list(
+            CatalogChange.objects.filter(seq__gt=since).order_by('seq')
+            .values_list('model', 'object_pk', 'action')
+        )
+
+    def last_seq(self):
+        return CatalogChange.objects.order_by('-seq').first().seq
+
+    def test_save_and_delete(self):
+        """ Test that saves and deletes are logged in order """
+
+        self.assertEqual(self.changes(), [
+            ('category', str(self.category.id), 'save'),
+            ('product', '1111', 'save'),
+        ])
+
+        since = self.last_seq()
+        category_id = self.category.id
+        self.category.delete()
+
+        self.assertEqual(self.changes(since), [
+            ('product', '1111', 'delete'),
+            ('category', str(category_id), 'delete'),
+        ])
+
+    def test_bulk_create(self):
+        """ Test that bulk_create logs every object """
+
+        since = self.last_seq()
+        Product.objects.bulk_create([
+            Product(barcode=barcode, title='Toaster', description='Toaster',
+                    image='toaster.jpg', price=20, category=self.category)
+            for barcode in ('2222', '3333')
+        ])
+
+        self.assertEqual(self.changes(since), [
+            ('product', '2222', 'save'),
+            ('product', '3333', 'save'),
+        ])
+
+    def test_update(self):
+        """ Test that queryset updates log the updated objects and refresh
+        updated_at
+        """
+
+        since = self.last_seq()
+        updated_at = self.kettle.updated_at
+        Product.objects.filter(barcode='1111').update(price=12)
+        Category.objects.update(description='Appliances')
+
+        self.assertEqual(self.changes(since), [
+            ('product', '1111', 'save'),
+            ('category', str(self.category.id), 'save'),
+        ])
+        self.assertGreater(
+            Product.objects.get(barcode='1111').updated_at, updated_at
+        )
+
+    def test_muted(self):
+        """ Test that muted changes are neither logged nor bumping the
+        catalog version, and that the changes after the block are
+        """
+
+        since = self.last_seq()
+        version = get_version(CATALOG_VERSION_KEY)
+        with catalog_changes_muted():
+            category = Category.objects.create(description='Garden')
+            Product.objects.bulk_create([
+                Product(barcode='2222', title='Hose', description='Hose',
+                        image='hose.jpg', price=5, category=category)
+            ])
+            Product.objects.filter(barcode='1111').update(price=12)
+            self.kettle.delete()
+
+        self.assertEqual(self.changes(since), [])
+        self.assertEqual(get_version(CATALOG_VERSION_KEY), version)
+
+        category.save()
+        self.assertEqual(self.changes(since), [
+            ('category', str(category.id), 'save'),
+        ])
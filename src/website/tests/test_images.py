@@ -0,0 +1,198 @@
+""" This module tests website app image renditions """
+
+import io
+import os
+import shutil
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from website.images import generate_renditions, get_renditions, \
+    rendition_name
+from website.models import Category, Product
+from .mixins import TemporaryMediaRootMixin
+
+
+FIXTURE = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'fixtures', 'sample_image.jpg'
+)
+
+
+@override_settings(
+    IMAGE_RENDITION_WIDTHS=(16, 32, 100000),
+    IMAGE_RENDITION_FORMATS=('webp', 'jpeg'),
+    IMAGE_RENDITION_WORKERS=0,
+)
+class RenditionsTest(TemporaryMediaRootMixin, TestCase):
+    """ Test case for the renditions of the product images """
+
+    def setUp(self):
+        super(RenditionsTest, self).setUp()
+        shutil.copy(FIXTURE, os.path.join(self.media_root, 'kettle.jpg'))
+        cache.clear()
+
+    def test_rendition_name(self):
+        """ Test that renditions are stored beside the original """
+
+        self.assertEqual(
+            rendition_name('kettle.jpg', 320, 'webp'), 'kettle.320w.webp'
+        )
+        self.assertEqual(
+            rendition_name('a/kettle.png', 320, 'jpeg'), 'a/kettle.320w.jpg'
+        )
+
+    def test_generate(self):
+        """ Test that every width below the original one is generated once
+        in every format
+        """
+
+        created = generate_renditions('kettle.jpg')
+        self.assertEqual(sorted(created), [
+            'kettle.16w.jpg', 'kettle.16w.webp',
+            'kettle.32w.jpg', 'kettle.32w.webp',
+        ])
+        with Image.open(os.path.join(self.media_root, created[0])) as image:
+            self.assertIn(image.width, (16, 32))
+        self.assertEqual(generate_renditions('kettle.jpg'), [])
+        self.assertEqual(
+            [width for width, _ in get_renditions('kettle.jpg')['webp']],
+            [16, 32]
+        )
+
+    @mock.patch('website.images.transaction.on_commit', lambda func: func())
+    def test_generated_on_save(self):
+        """ Test that saving a product schedules the renditions """
+
+        Product.objects.create(
+            barcode='5901234123457', title='Kettle', description='Kettle',
+            image='kettle.jpg', price=10,
+            category=Category.objects.create(description='Kitchen')
+        )
+        self.assertTrue(default_storage.exists('kettle.32w.webp'))
+
+    def test_template_tag(self):
+        """ Test that the tag offers the renditions through srcset """
+
+        template = Template(
+            '{% load images %}'
+            '{% responsive_image image "Kettle" sizes="320px" %}'
+        )
+        product = Product(image='kettle.jpg')
+
+        html = template.render(Context({'image': product.image}))
+        self.assertIn('src="/media/kettle.jpg"', html)
+        self.assertIn('loading="lazy"', html)
+        self.assertNotIn('srcset', html)
+
+        generate_renditions('kettle.jpg')
+        html = template.render(Context({'image': product.image}))
+        self.assertIn(
+            '<source type="image/webp" '
+            'srcset="/media/kettle.16w.webp 16w, /media/kettle.32w.webp 32w" '
+            'sizes="320px">', html
+        )
+        self.assertIn('src="/media/kettle.32w.jpg"', html)
+        self.assertIn(
+            'srcset="/media/kettle.16w.jpg 16w, /media/kettle.32w.jpg 32w"',
+            html
+        )
+
+    def test_products_page(self):
+        """ Test that the product list serves the renditions """
+
+        Product.objects.create(
+            barcode='5901234123457', title='Kettle', description='Kettle',
+            image='kettle.jpg', price=10,
+            category=Category.objects.create(description='Kitchen')
+        )
+        call_command('generate_renditions', stdout=io.StringIO())
+
+        response = self.client.get(reverse('website:index'))
+        self.assertContains(response, '/media/kettle.16w.webp 16w')
+        self.assertContains(response, 'loading="lazy"')
+
+
+@override_settings(IMAGE_RENDITION_WORKERS=0)
+class ImageInfoTest(TemporaryMediaRootMixin, TestCase):
+    """ Test case for the size and placeholder stored on products """
+
+    def setUp(self):
+        super(ImageInfoTest, self).setUp()
+        with open(FIXTURE, 'rb') as image:
+            self.image = default_storage.save('kettle.jpg', image)
+        self.category = Category.objects.create(description='Kitchen')
+
+    def create(self, barcode='1111', **kwargs):
+        kwargs.setdefault('image', self.image)
+        return Product.objects.create(
+            barcode=barcode, title='Kettle', description='Kettle', price=10,
+            category=self.category, **kwargs
+        )
+
+    def test_upload(self):
+        """ Test that an uploaded image is measured before it is stored """
+
+        with open(FIXTURE, 'rb') as image:
+            product = self.create(image=File(image, 'upload.jpg'))
+        product.refresh_from_db()
+        self.assertEqual(product.image.name, self.image)
+        self.assertEqual(
+            (product.image_width, product.image_height), (1440, 800)
+        )
+        self.assertTrue(
+            product.image_placeholder.startswith('data:image/')
+        )
+        self.assertLess(len(product.image_placeholder), 1000)
+
+    def test_computed_once(self):
+        """ Test that saves keeping the image don't read it again """
+
+        product = Product.objects.get(pk=self.create().pk)
+        with mock.patch('website.models.field_image_info') as info:
+            product.title = 'Steel kettle'
+            product.save()
+            Product.objects.only('barcode', 'slug').get().save()
+        info.assert_not_called()
+
+        with mock.patch('website.models.field_image_info') as info:
+            info.return_value = (1, 2, '')
+            Product.objects.bulk_create([
+                Product(barcode=barcode, title='Kettle', description='Kettle',
+                        image=self.image, price=10, category=self.category)
+                for barcode in ('2222', '3333')
+            ])
+        info.assert_called_once()
+        self.assertEqual(Product.objects.get(pk='3333').image_height, 2)
+
+    def test_missing_image(self):
+        """ Test that unreadable images are left unmeasured """
+
+        product = self.create(image='missing.jpg')
+        self.assertIsNone(product.image_width)
+        self.assertEqual(product.image_placeholder, '')
+
+    def test_reserved_room(self):
+        """ Test that pages reserve the room of the images """
+
+        product = self.create()
+        cache.clear()
+        response = self.client.get(reverse('website:index'))
+        self.assertContains(response, 'width="320"')
+        self.assertContains(response, 'height="178"')
+        self.assertContains(response, 'loading="lazy"')
+        self.assertContains(
+            response, 'background-image: url({})'.format(
+                product.image_placeholder
+            )
+        )
+
+        response = self.client.get(product.get_absolute_url())
+        self.assertContains(response, 'width="640"')
+        self.assertNotContains(response, 'loading="lazy"')
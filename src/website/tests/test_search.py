@@ -0,0 +1,64 @@
+""" This module tests website app search backends """
+
+from django.test import TestCase
+
+from website.models import Category, Product
+from website.search import SimpleSearchBackend, SQLiteFTSSearchBackend
+
+
+class SQLiteFTSSearchBackendTest(TestCase):
+    """ Test case for the SQLiteFTSSearchBackend """
+
+    def setUp(self):
+        self.backend = SQLiteFTSSearchBackend()
+        self.category = Category.objects.create(description='Category')
+        self.kettle = Product.objects.create(
+            barcode='1111', title='Kettle Bosch',
+            description='Electric kettle, kettle of the year',
+            image='kettle.jpg', price=10, category=self.category
+        )
+        self.toaster = Product.objects.create(
+            barcode='2222', title='Toaster',
+            description='Goes well with a kettle', image='toaster.jpg',
+            price=20, category=self.category
+        )
+
+    def search(self, query):
+        return list(
+            self.backend.search(Product.objects.all(), query)
+            .order_by(self.backend.rank_field)
+        )
+
+    def test_ranked_results(self):
+        """ Test that the most relevant product comes first """
+
+        self.assertEqual(self.search('kettle'), [self.kettle, self.toaster])
+
+    def test_prefix_and_all_terms(self):
+        """ Test prefix matching and that every term has to match """
+
+        self.assertEqual(self.search('toast'), [self.toaster])
+        self.assertEqual(self.search('kettle bosch'), [self.kettle])
+
+    def test_index_follows_changes(self):
+        """ Test that saves and deletes keep the index in sync """
+
+        self.toaster.title = 'Grill'
+        self.toaster.save()
+        self.assertEqual(self.search('toaster'), [])
+        self.assertEqual(self.search('grill'), [self.toaster])
+
+        self.kettle.delete()
+        self.assertEqual(self.search('bosch'), [])
+
+    def test_operators_are_escaped(self):
+        """ Test that FTS syntax typed by users is not interpreted """
+
+        self.assertEqual(self.search('kettle OR "toaster'), [])
+        self.assertEqual(self.search('*'), [])
+
+    def test_same_results_as_simple_backend(self):
+        """ Test that both backends find the same products """
+
+        simple = SimpleSearchBackend().search(Product.objects.all(), 'Toaster')
+        self.assertEqual(list(simple), self.search('Toaster'))
@@ -0,0 +1,160 @@
+""" This module tests website app media and static serving """
+
+import os
+import shutil
+
+from django.test import TestCase
+
+from .mixins import TemporaryMediaRootMixin
+
+
+class ServeMediaTest(TemporaryMediaRootMixin, TestCase):
+    """ Test case for the media serving view """
+
+    content = bytes(range(256)) * 4
+
+    def setUp(self):
+        super(ServeMediaTest, self).setUp()
+        with open(os.path.join(self.media_root, 'kettle.jpg'), 'wb') as file:
+            file.write(self.content)
+
+    def get(self, path='/media/kettle.jpg', **headers):
+        response = self.client.get(path, **headers)
+        if response.streaming:
+            response.body = b''.join(response.streaming_content)
+        return response
+
+    def test_whole_file(self):
+        """ Test that the file is sent with its validators """
+
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.body, self.content)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Content-Length'], '1024')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=86400')
+
+        response = self.get(HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('ETag', response)
+
+    def test_ranges(self):
+        """ Test that single byte ranges get a partial response """
+
+        response = self.get(HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.body, self.content[10:20])
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/1024')
+
+        response = self.get(HTTP_RANGE='bytes=1000-')
+        self.assertEqual(response.body, self.content[1000:])
+        response = self.get(HTTP_RANGE='bytes=-4')
+        self.assertEqual(response.body, self.content[-4:])
+
+        response = self.get(HTTP_RANGE='bytes=2000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+        # several ranges, or a range on a file that changed meanwhile
+        response = self.get(HTTP_RANGE='bytes=0-1,5-6')
+        self.assertEqual(response.status_code, 200)
+        response = self.get(HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE='"old"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.body, self.content)
+
+    def test_sendfile(self):
+        """ Test that files are handed over to the front proxy """
+
+        with self.settings(SENDFILE_BACKEND='x-accel-redirect'):
+            response = self.get(HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(
+            response['X-Accel-Redirect'], '/internal/media/kettle.jpg'
+        )
+
+        with self.settings(SENDFILE_BACKEND='x-sendfile'):
+            response = self.get()
+        self.assertEqual(
+            response['X-Sendfile'],
+            os.path.join(self.media_root, 'kettle.jpg')
+        )
+
+    def test_sendfile_non_ascii(self):
+        """ Test that non-ASCII names are percent-encoded for the proxy """
+
+        shutil.copy(
+            os.path.join(self.media_root, 'kettle.jpg'),
+            os.path.join(self.media_root, 'барашка.jpg')
+        )
+        with self.settings(SENDFILE_BACKEND='x-accel-redirect'):
+            response = self.get('/media/барашка.jpg')
+        self.assertEqual(
+            response['X-Accel-Redirect'],
+            '/internal/media/%D0%B1%D0%B0%D1%80%D0%B0%D1%88%D0%BA%D0%B0.jpg'
+        )
+
+        with self.settings(SENDFILE_BACKEND='x-sendfile'):
+            response = self.get('/media/барашка.jpg')
+        self.assertEqual(
+            response['X-Sendfile'],
+            self.media_root +
+            '/%D0%B1%D0%B0%D1%80%D0%B0%D1%88%D0%BA%D0%B0.jpg'
+        )
+
+    def test_not_found(self):
+        """ Test that missing, hidden and outside files aren't served """
+
+        os.mkdir(os.path.join(self.media_root, 'ab'))
+        for path in ('missing.jpg', '.kettle.jpg.tmp', 'ab', '../etc/passwd'):
+            response = self.get('/media/' + path)
+            self.assertIn(response.status_code, (400, 404), path)
+
+
+class ServeStaticTest(TemporaryMediaRootMixin, TestCase):
+    """ Test case for the static serving view """
+
+    def setUp(self):
+        super(ServeStaticTest, self).setUp()
+        os.mkdir(os.path.join(self.static_root, 'css'))
+        for name, content in (('main.0123456789ab.css', b'plain'),
+                              ('main.0123456789ab.css.gz', b'gzip'),
+                              ('main.css', b'plain')):
+            with open(os.path.join(self.static_root, 'css', name), 'wb') \
+                    as file:
+                file.write(content)
+
+    def get(self, path, **headers):
+        response = self.client.get('/static/css/' + path, **headers)
+        response.body = b''.join(response.streaming_content)
+        return response
+
+    def test_precompressed(self):
+        """ Test that the gzip copy goes to the clients accepting it """
+
+        response = self.get(
+            'main.0123456789ab.css', HTTP_ACCEPT_ENCODING='gzip, deflate'
+        )
+        self.assertEqual(response.body, b'gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertIn('immutable', response['Cache-Control'])
+        compressed_etag = response['ETag']
+
+        for accept_encoding in ('', 'identity', 'gzip;q=0, br;q=0'):
+            response = self.get(
+                'main.0123456789ab.css', HTTP_ACCEPT_ENCODING=accept_encoding
+            )
+            self.assertEqual(response.body, b'plain')
+            self.assertNotIn('Content-Encoding', response)
+            self.assertNotEqual(response['ETag'], compressed_etag)
+
+    def test_unhashed(self):
+        """ Test that files without a hash in their name are revalidated """
+
+        response = self.get('main.css', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.body, b'plain')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=3600')
@@ -0,0 +1,184 @@
+""" This module tests website app content-addressed storage """
+
+import gzip
+import io
+import os
+import shutil
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from website.images import generate_renditions
+from website.models import Category, Product, PurchaseItem, PurchaseOrder
+from website.storage import CompressedManifestStaticFilesStorage, \
+    count_references, is_hashed, is_manifest_hashed, \
+    precompressed_encodings, purge_unreferenced
+from website.serving import IMMUTABLE_CACHE_CONTROL, serve
+from .mixins import TemporaryMediaRootMixin
+
+
+FIXTURE = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'fixtures', 'sample_image.jpg'
+)
+
+
+@override_settings(IMAGE_RENDITION_WIDTHS=(16,), IMAGE_RENDITION_WORKERS=0)
+class ContentAddressedStorageTest(TemporaryMediaRootMixin, TestCase):
+    """ Test case for ContentAddressedStorage """
+
+    def setUp(self):
+        super(ContentAddressedStorageTest, self).setUp()
+        self.category = Category.objects.create(description='Kitchen')
+
+    def save_fixture(self, name):
+        with open(FIXTURE, 'rb') as image:
+            return default_storage.save(name, image)
+
+    def test_deduplication(self):
+        """ Test that identical uploads share one file """
+
+        name = self.save_fixture('kettle.JPG')
+        self.assertTrue(is_hashed(name))
+        self.assertRegex(name, r'^([0-9a-f]{2})/\1[0-9a-f]{62}\.jpg$')
+        self.assertEqual(self.save_fixture('kettle_tEWnuoM.jpg'), name)
+        self.assertEqual(
+            default_storage.listdir(name.split('/')[0])[1],
+            [name.split('/')[1]]
+        )
+
+        other = default_storage.save('kettle.jpg', ContentFile(b'other'))
+        self.assertNotEqual(other, name)
+
+    def test_lookalike_name(self):
+        """ Test that a name looking hashed is hashed all the same """
+
+        fake = '0' * 64 + '.jpg'
+        name = default_storage.save(fake, ContentFile(b'other'))
+        self.assertEqual(
+            name, default_storage.save('other.jpg', ContentFile(b'other'))
+        )
+        self.assertNotIn(fake, name)
+        self.assertFalse(default_storage.exists(fake))
+        self.assertFalse(is_hashed(fake))
+        self.assertFalse(is_hashed('ab/' + fake))
+
+    def test_renditions(self):
+        """ Test that renditions are named after their hashed original """
+
+        name = self.save_fixture('kettle.jpg')
+        self.assertEqual(
+            generate_renditions(name), [name[:-len('.jpg')] + '.16w.webp',
+                                        name[:-len('.jpg')] + '.16w.jpg']
+        )
+        self.assertTrue(is_hashed(name[:-len('.jpg')] + '.16w.webp'))
+
+    def test_purge(self):
+        """ Test that a shared file is deleted with its last reference """
+
+        name = self.save_fixture('kettle.jpg')
+        unreferenced = default_storage.save('bag.txt', ContentFile(b'bag'))
+        generate_renditions(name)
+        product = Product.objects.create(
+            barcode='1111', title='Kettle', description='Kettle',
+            image=name, price=10, category=self.category
+        )
+        PurchaseItem.objects.create(
+            barcode='1111', title='Kettle', description='Kettle',
+            image=name, price=10, category=self.category, quantity=1,
+            total_price=10, purchase_order=PurchaseOrder.objects.create(
+                user=User.objects.create(username='buyer'),
+                timestamp=timezone.now(), cart=False
+            )
+        )
+        self.assertEqual(count_references()[name], 2)
+
+        self.assertEqual(purge_unreferenced(), [])
+        self.assertEqual(purge_unreferenced(grace=0), [unreferenced])
+
+        product.delete()
+        self.assertEqual(purge_unreferenced(grace=0), [])
+        PurchaseItem.objects.all().delete()
+        self.assertEqual(purge_unreferenced(grace=0), [name])
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(
+            default_storage.exists(name[:-len('.jpg')] + '.16w.webp')
+        )
+
+    def test_dedupe_media(self):
+        """ Test that legacy duplicates are moved to one hashed file """
+
+        for name in ('kettle.jpg', 'kettle_tEWnuoM.jpg'):
+            shutil.copy(FIXTURE, os.path.join(self.media_root, name))
+        Product.objects.bulk_create([
+            Product(barcode=barcode, title='Kettle', description='Kettle',
+                    image=name, price=10, category=self.category)
+            for barcode, name in (('1111', 'kettle.jpg'),
+                                  ('2222', 'kettle_tEWnuoM.jpg'))
+        ])
+
+        call_command('dedupe_media', stdout=io.StringIO())
+
+        names = set(Product.objects.values_list('image', flat=True))
+        self.assertEqual(len(names), 1)
+        self.assertTrue(default_storage.exists(names.pop()))
+        self.assertFalse(default_storage.exists('kettle.jpg'))
+        self.assertFalse(default_storage.exists('kettle_tEWnuoM.jpg'))
+
+    def test_immutable_cache_headers(self):
+        """ Test that only hashed files are cached forever """
+
+        name = self.save_fixture('kettle.jpg')
+        shutil.copy(FIXTURE, os.path.join(self.media_root, 'kettle.jpg'))
+        request = RequestFactory().get('/')
+
+        response = serve(request, name, self.media_root, '/media/', 60)
+        self.assertEqual(response['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
+        response = serve(
+            request, 'kettle.jpg', self.media_root, '/media/', 60
+        )
+        self.assertEqual(response['Cache-Control'], 'public, max-age=60')
+
+
+class CompressedManifestStaticFilesStorageTest(TemporaryMediaRootMixin, TestCase):
+    """ Test case for CompressedManifestStaticFilesStorage """
+
+    def setUp(self):
+        super(CompressedManifestStaticFilesStorageTest, self).setUp()
+        self.storage = CompressedManifestStaticFilesStorage(
+            location=self.static_root, base_url='/static/'
+        )
+        self.storage.save('css/main.css', ContentFile(
+            b'body { background: url("../img/logo.png"); }\n' * 20
+        ))
+        self.storage.save('css/tiny.css', ContentFile(b'a { color: red }'))
+        self.storage.save('img/logo.png', ContentFile(b'\x89PNG' * 100))
+
+    def test_post_process(self):
+        """ Test that hashed names get smaller compressed copies """
+
+        paths = {
+            name: (self.storage, name)
+            for name in ('css/main.css', 'css/tiny.css', 'img/logo.png')
+        }
+        list(self.storage.post_process(paths))
+
+        hashed = self.storage.stored_name('css/main.css')
+        self.assertTrue(is_manifest_hashed(hashed))
+        with self.storage.open(hashed + '.gz') as compressed:
+            content = gzip.decompress(compressed.read())
+        with self.storage.open(hashed) as original:
+            self.assertEqual(content, original.read())
+        self.assertIn(
+            self.storage.stored_name('img/logo.png').encode(), content
+        )
+
+        for encoding, extension in precompressed_encodings():
+            self.assertTrue(self.storage.exists(hashed + extension), encoding)
+        tiny = self.storage.stored_name('css/tiny.css')
+        self.assertFalse(self.storage.exists(tiny + '.gz'))
+        logo = self.storage.stored_name('img/logo.png')
+        self.assertFalse(self.storage.exists(logo + '.gz'))
@@ -0,0 +1,73 @@
+""" This module tests website app throttling """
+
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from website.throttling import TokenBucket, parse_rate
+from .mixins import ThrottleTestMixin
+
+
+class TokenBucketTest(ThrottleTestMixin, TestCase):
+    """ Test case for TokenBucket """
+
+    def test_parse_rate(self):
+        """ Test the capacity and refill rate of a rate """
+
+        self.assertEqual(parse_rate('120/min'), (120, 2))
+        self.assertEqual(parse_rate('10/s'), (10, 10))
+
+    @mock.patch('website.throttling.time.time')
+    def test_consume_and_refill(self, time):
+        """ Test that the bucket empties, then refills over time """
+
+        time.return_value = 1000.0
+        bucket = TokenBucket('throttle:test', '3/min')
+
+        self.assertTrue(all(bucket.consume() for _ in range(3)))
+        self.assertFalse(bucket.consume())
+        self.assertEqual(bucket.wait, 20)
+
+        time.return_value = 1010.0
+        self.assertFalse(bucket.consume())
+        self.assertEqual(bucket.wait, 10)
+
+        time.return_value = 1020.0
+        self.assertTrue(bucket.consume())
+        self.assertFalse(bucket.consume())
+
+    def test_shared_state(self):
+        """ Test that buckets with the same key share their tokens """
+
+        self.assertTrue(TokenBucket('throttle:test', '1/h').consume())
+        self.assertFalse(TokenBucket('throttle:test', '1/h').consume())
+        self.assertTrue(TokenBucket('throttle:other', '1/h').consume())
+
+
+@override_settings(THROTTLE_RATES={'add-to-cart': '2/min'})
+class AddToCartThrottleTest(ThrottleTestMixin, TestCase):
+    """ Test case for the throttling of AddToCartView """
+
+    def setUp(self):
+        super(AddToCartThrottleTest, self).setUp()
+        self.user = User.objects.create_user(username='buyer', password='1')
+
+    def test_throttled(self):
+        """ Test that a client over its rate gets 429 with Retry-After """
+
+        self.client.force_login(self.user)
+        for _ in range(2):
+            response = self.client.post(reverse('website:add-to-cart'))
+            self.assertNotEqual(response.status_code, 429)
+
+        response = self.client.post(reverse('website:add-to-cart'))
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+
+        other = User.objects.create_user(username='other', password='1')
+        self.client.force_login(other)
+        response = self.client.post(reverse('website:add-to-cart'))
+        self.assertNotEqual(response.status_code, 429)
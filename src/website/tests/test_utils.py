@@ -1,9 +1,12 @@
 """ This module tests website app util methods """
 
+from unittest import mock
+
 from django.test import TestCase
 
 from website.models import Category, Product
-from website.utils import unique_slug_generator
+from website.utils import SLUG_SUFFIX_LENGTH, allocate_slugs, \
+    unique_slug_generator
 
 
 class UniqueSlugGeneratorTest(TestCase):
@@ -25,3 +28,89 @@ class UniqueSlugGeneratorTest(TestCase):
         )
         slug = unique_slug_generator(product)
         self.assertEqual(slug, expected_result)
+
+    def test_clashing_slugs(self):
+        """ Test that clashing titles get numeric suffixes """
+
+        for barcode in ('1', '2', '3'):
+            Product.objects.create(
+                barcode=barcode, title='TV', description='TV',
+                image='tv.jpg', price=1, category=self.category
+            )
+        self.assertEqual(
+            sorted(Product.objects.values_list('slug', flat=True)),
+            ['tv', 'tv-2', 'tv-3']
+        )
+
+    def test_non_latin_title(self):
+        """ Test the fallback base of titles without latin characters """
+
+        product = Product(
+            barcode='5901234123457', title='Чайник', description='Чайник',
+            image='kettle.jpg', price=1, category=self.category
+        )
+        self.assertEqual(unique_slug_generator(product), 'product')
+
+
+class AllocateSlugsTest(TestCase):
+    """ Test case for the allocate_slugs method """
+
+    def setUp(self):
+        self.category = Category.objects.create(
+            description='Category'
+        )
+        for barcode, slug in (('1', 'kettle'), ('2', 'kettle-7'),
+                              ('3', 'kettle-ab12'), ('4', 'kettlebell')):
+            Product.objects.create(
+                barcode=barcode, slug=slug, title=slug, description='',
+                image='kettle.jpg', price=1, category=self.category
+            )
+
+    def test_batch(self):
+        """ Test allocating many slugs with a single query """
+
+        with self.assertNumQueries(1):
+            slugs = allocate_slugs(
+                Product, ['Kettle', 'Toaster', 'kettle', 'Toaster', 'Kettlebell']
+            )
+        self.assertEqual(
+            slugs,
+            ['kettle-8', 'toaster', 'kettle-9', 'toaster-2', 'kettlebell-2']
+        )
+
+    def test_numbered_base(self):
+        """ Test that the suffixes of a base ending with a number are told
+        apart from the ones of the shorter base
+        """
+
+        self.assertEqual(
+            allocate_slugs(Product, ['Kettle 7', 'Kettle 7', 'Kettle']),
+            ['kettle-7-2', 'kettle-7-3', 'kettle-8']
+        )
+
+    def test_long_title(self):
+        """ Test that long titles leave room for the suffix """
+
+        slug = allocate_slugs(Product, ['kettle ' * 20])[0]
+        self.assertLessEqual(len(slug) + SLUG_SUFFIX_LENGTH, 50)
+
+    def test_concurrent_insert(self):
+        """ Test that a slug taken between allocation and insert is
+        allocated again
+        """
+
+        product = Product(
+            barcode='5', title='Kettle', description='', image='kettle.jpg',
+            price=1, category=self.category
+        )
+        stale_answers = [['kettle-7']]
+
+        def stale_allocate_slugs(model, titles, field_name='slug'):
+            # the first call answers as if kettle-7 was still free
+            if stale_answers:
+                return stale_answers.pop()
+            return allocate_slugs(model, titles, field_name)
+
+        with mock.patch('website.utils.allocate_slugs', stale_allocate_slugs):
+            product.save()
+        self.assertEqual(product.slug, 'kettle-8')
@@ -1,10 +1,16 @@
 """ This module tests website app views """
 
+from datetime import timedelta
+from decimal import Decimal
+
 from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
 from django.test import TestCase
 from django.urls import reverse
 from django.utils import timezone
 
+from website.cart import get_open_cart
+from website.pagination import KeysetPaginator
 from website.models import (
     Category,
     Product,
@@ -44,7 +50,7 @@ class ProductsViewTest(TestCase):
             list(self.product_queryset)
         )
         self.assertEqual(
-            list(response.context_data['categories']),
+            list(response.context['categories']),
             list(self.category_queryset)
         )
 
@@ -65,7 +71,7 @@ class ProductsViewTest(TestCase):
             list(self.product_queryset)
         )
         self.assertEqual(
-            list(response.context_data['categories']),
+            list(response.context['categories']),
             list(self.category_queryset)
         )
 
@@ -83,6 +89,104 @@ class ProductsViewTest(TestCase):
         self.assertEqual(response.status_code, 200)
 
 
+class ProductsViewPaginationTest(TestCase):
+    """ Test case for the keyset pagination of the ProductsView """
+
+    def setUp(self):
+        self.category = Category.objects.create(description='Category')
+        self.other_category = Category.objects.create(description='Other')
+        for number in range(25):
+            Product.objects.create(
+                barcode='{:04d}'.format(number),
+                title='Kettle {}'.format(number),
+                description='Kettle', image='kettle.jpg',
+                price=100 - number,
+                category=self.category if number % 5 else self.other_category
+            )
+
+    def get_barcodes(self, response):
+        return [product.barcode for product in response.context['product_list']]
+
+    def test_pages(self):
+        """ Test walking forward and back through the pages """
+
+        response = self.client.get(reverse('website:index'))
+        self.assertEqual(
+            self.get_barcodes(response),
+            ['{:04d}'.format(number) for number in range(20)]
+        )
+        self.assertNotIn('previous_page_query', response.context)
+
+        response = self.client.get(
+            reverse('website:index') + '?' + response.context['next_page_query']
+        )
+        self.assertEqual(
+            self.get_barcodes(response),
+            ['{:04d}'.format(number) for number in range(20, 25)]
+        )
+        self.assertNotIn('next_page_query', response.context)
+
+        response = self.client.get(
+            reverse('website:index') + '?' +
+            response.context['previous_page_query']
+        )
+        self.assertEqual(len(self.get_barcodes(response)), 20)
+        self.assertEqual(self.get_barcodes(response)[0], '0000')
+
+    def test_cursor_survives_edits(self):
+        """ Test that a cursor still points after the last row seen when
+        products are added before it
+        """
+
+        response = self.client.get(reverse('website:index'), {'sort': 'price'})
+        next_query = response.context['next_page_query']
+        self.assertEqual(self.get_barcodes(response)[-1], '0005')
+
+        Product.objects.create(
+            barcode='9999', title='Cheap kettle', description='Kettle',
+            image='kettle.jpg', price=1, category=self.category
+        )
+        response = self.client.get(reverse('website:index') + '?' + next_query)
+        self.assertEqual(
+            self.get_barcodes(response), ['0004', '0003', '0002', '0001', '0000']
+        )
+
+    def test_filters_with_cursor(self):
+        """ Test that category and q filters are kept by the page links """
+
+        for number in range(25, 50):
+            Product.objects.create(
+                barcode='{:04d}'.format(number),
+                title='Kettle {}'.format(number),
+                description='Kettle', image='kettle.jpg', price=number,
+                category=self.category if number % 5 else self.other_category
+            )
+
+        seen = []
+        query = {'category': 'Category', 'q': 'kettle'}
+        response = self.client.get(reverse('website:index'), query)
+        seen += self.get_barcodes(response)
+        self.assertIn('category=Category', response.context['next_page_query'])
+
+        response = self.client.get(
+            reverse('website:index') + '?' + response.context['next_page_query']
+        )
+        seen += self.get_barcodes(response)
+        self.assertNotIn('next_page_query', response.context)
+        self.assertEqual(
+            sorted(seen),
+            [
+                '{:04d}'.format(number) for number in range(50) if number % 5
+            ]
+        )
+
+    def test_invalid_cursor(self):
+        """ Test that a tampered cursor returns 404 """
+
+        response = self.client.get(reverse('website:index'), {'cursor': 'xx'})
+        self.assertEqual(response.status_code, 404)
+
+
 class ProductDetailViewTest(TestCase):
     """ Test case for the ProductDetailView """
 
@@ -119,6 +223,76 @@ class ProductDetailViewTest(TestCase):
         self.assertEqual(response.status_code, 200)
 
 
+class ConditionalGetTest(TestCase):
+    """ Test case for the ETag / Last-Modified handling of catalog pages """
+
+    def setUp(self):
+        self.category = Category.objects.create(description='Category')
+        self.product = Product.objects.create(
+            barcode='2012345012349', slug=None, title='Wardrobe',
+            description='Lorem ipsum', image='wardrobe.jpeg', price=55.990,
+            category=self.category
+        )
+        self.detail_url = reverse(
+            'website:product-detail', args=(self.product.slug,)
+        )
+
+    def test_products_not_modified(self):
+        """ Test that a known ETag of the list is answered without queries
+        """
+
+        etag = self.client.get(reverse('website:index'))['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                reverse('website:index'), HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, 304)
+
+        Product.objects.create(
+            barcode='5901234123457', title='Mattress', description='Mattress',
+            image='mattress.jpg', price=800.724, category=self.category
+        )
+        response = self.client.get(
+            reverse('website:index'), HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_product_detail_not_modified(self):
+        """ Test that a product page is revalidated with one query """
+
+        response = self.client.get(self.detail_url)
+        etag = response['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                self.detail_url, HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, 304)
+
+        self.product.price = 60
+        self.product.save()
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_product_detail_if_modified_since(self):
+        """ Test revalidation by Last-Modified """
+
+        last_modified = self.client.get(self.detail_url)['Last-Modified']
+        response = self.client.get(
+            self.detail_url, HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_per_user(self):
+        """ Test that anonymous and logged users don't share ETags """
+
+        etag = self.client.get(self.detail_url)['ETag']
+        self.client.force_login(
+            User.objects.get_or_create(username='testuser')[0]
+        )
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
 class ProfileViewTest(TestCase):
     """ Test case for the ProfileView """
 
@@ -177,6 +351,80 @@ class PurchaseOrdersViewTest(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, 'purchase_orders.html')
 
+    def test_only_user_orders(self):
+        """ Test that other users' orders are not listed """
+
+        other_user = User.objects.create(username='otheruser')
+        PurchaseOrder.objects.create(
+            timestamp=timezone.now(), user=other_user, cart=True
+        )
+        response = self.client.get(reverse('website:purchase-orders'))
+
+        self.assertEqual(
+            list(response.context['purchase_orders']), [self.purchase_order]
+        )
+
+    def test_pages(self):
+        """ Test the ordering and pagination of a long history """
+
+        cart = PurchaseOrder.objects.create(
+            timestamp=timezone.now() - timedelta(days=100), user=self.user,
+            cart=True
+        )
+        for days in range(1, 25):
+            PurchaseOrder.objects.create(
+                timestamp=timezone.now() - timedelta(days=days),
+                user=self.user, cart=False
+            )
+
+        response = self.client.get(reverse('website:purchase-orders'))
+        first_page = list(response.context['purchase_orders'])
+        self.assertEqual(len(first_page), 20)
+        self.assertEqual(first_page[:2], [cart, self.purchase_order])
+
+        response = self.client.get(
+            reverse('website:purchase-orders') + '?' +
+            response.context['next_page_query']
+        )
+        second_page = list(response.context['purchase_orders'])
+        self.assertEqual(len(second_page), 6)
+        self.assertFalse(set(first_page) & set(second_page))
+        self.assertNotIn('next_page_query', response.context)
+
+    def test_sub_millisecond_timestamps(self):
+        """ Test that cursors keep the microseconds of the timestamps, in
+        both directions
+        """
+
+        PurchaseOrder.objects.all().delete()
+        start = timezone.now()
+        orders = [
+            PurchaseOrder.objects.create(
+                timestamp=start + timedelta(microseconds=100 * index),
+                user=self.user, cart=False
+            )
+            for index in range(6)
+        ]
+        orders.reverse()
+        paginator = KeysetPaginator(
+            PurchaseOrder.objects.filter(user=self.user),
+            ('-cart', '-timestamp', '-id'), 2
+        )
+
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_cursor))
+        self.assertEqual(
+            [list(page) for page in pages],
+            [orders[0:2], orders[2:4], orders[4:6]]
+        )
+
+        previous = paginator.page(pages[2].previous_cursor)
+        self.assertEqual(list(previous), orders[2:4])
+        previous = paginator.page(previous.previous_cursor)
+        self.assertEqual(list(previous), orders[0:2])
+        self.assertFalse(previous.has_previous())
+
     def test_not_logged_user(self):
         """ Test GET request without logging with a user """
 
@@ -227,6 +475,28 @@ class PurchaseOrderDetailViewTest(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, 'purchase_order_detail.html')
 
+    def test_totals(self):
+        """ Test the totals of the order, computed with a fixed number of
+        queries
+        """
+
+        for number in range(10):
+            PurchaseItem.objects.create(
+                barcode=str(number), title='Item', description='Item',
+                image='item.jpg', price=2, category=self.category,
+                purchase_order=self.purchase_order, quantity=1, total_price=2
+            )
+        # session, order with totals and items
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse(
+                'website:purchase-order', args=(self.purchase_order.id,)
+            ))
+        order = response.context['purchase_order']
+        self.assertEqual(order.item_count, 11)
+        self.assertEqual(order.items_total, Decimal('21'))
+        self.assertEqual(order.payments_total, Decimal('0'))
+        self.assertContains(response, 'US$ 21')
+
     def test_invalid_purchase_order_detail(self):
         """ Test invalid purchase order detail (GET request) """
 
@@ -469,3 +739,118 @@ class AddToCartViewTest(TestCase):
             }
         )
         self.assertEqual(response.status_code, 302)
+
+    def test_non_finite_quantity(self):
+        """ Test that non-finite quantities are rejected """
+
+        for quantity in ('NaN', 'sNaN', 'Infinity', '-1', 'x'):
+            response = self.client.post(
+                reverse('website:add-to-cart'),
+                {'product_id': '2012345012349', 'quantity': quantity}
+            )
+            self.assertEqual(response.status_code, 400, quantity)
+        self.assertFalse(PurchaseItem.objects.exists())
+
+    def test_quantity_merge(self):
+        """ Test that adding a carted product bumps its quantity instead of
+        adding a new line
+        """
+
+        for _ in range(3):
+            self.client.post(
+                reverse('website:add-to-cart'), {'product_id': '2012345012349'}
+            )
+        item = PurchaseItem.objects.get(purchase_order__cart=True)
+        self.assertEqual(item.quantity, Decimal('3'))
+        self.assertEqual(item.total_price, Decimal('167.970'))
+
+    def test_total_price_overflow(self):
+        """ Test that lines whose total price wouldn't fit in the order are
+        rejected, when created as well as when merged
+        """
+
+        Product.objects.create(
+            barcode='5901234123457', title='Mattress', description='Mattress',
+            image='mattress.jpg', price=500, category=self.category
+        )
+        response = self.client.post(
+            reverse('website:add-to-cart'),
+            {'product_id': '5901234123457', 'quantity': '300'}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(PurchaseItem.objects.exists())
+
+        for quantity, status_code in (('150', 302), ('150', 400)):
+            response = self.client.post(
+                reverse('website:add-to-cart'),
+                {
+                    'product_id': ['5901234123457', '2012345012349'],
+                    'quantity': [quantity, '1']
+                }
+            )
+            self.assertEqual(response.status_code, status_code)
+        item = PurchaseItem.objects.get(barcode='5901234123457')
+        self.assertEqual(item.quantity, Decimal('150'))
+        self.assertEqual(item.total_price, Decimal('75000'))
+        self.assertEqual(
+            PurchaseItem.objects.get(barcode='2012345012349').quantity,
+            Decimal('1')
+        )
+
+    def test_add_many(self):
+        """ Test adding several products with quantities in one request """
+
+        Product.objects.create(
+            barcode='5901234123457', title='Mattress', description='Mattress',
+            image='mattress.jpg', price=800, category=self.category
+        )
+        self.client.post(
+            reverse('website:add-to-cart'), {'product_id': '2012345012349'}
+        )
+        response = self.client.post(
+            reverse('website:add-to-cart'),
+            {
+                'product_id': ['2012345012349', '5901234123457'],
+                'quantity': ['2', '1.5']
+            }
+        )
+        self.assertEqual(response.status_code, 302)
+        items = dict(
+            PurchaseItem.objects.filter(purchase_order__cart=True)
+            .values_list('barcode', 'quantity')
+        )
+        self.assertEqual(
+            items,
+            {'2012345012349': Decimal('3'), '5901234123457': Decimal('1.5')}
+        )
+
+    def test_single_open_cart(self):
+        """ Test that every add lands in the same open cart, which is looked
+        up with a single query
+        """
+
+        cart = get_open_cart(self.user)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_open_cart(self.user), cart)
+
+        self.client.post(
+            reverse('website:add-to-cart'), {'product_id': '2012345012349'}
+        )
+        self.assertEqual(
+            PurchaseOrder.objects.filter(user=self.user, cart=True).count(), 1
+        )
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            PurchaseOrder.objects.create(
+                timestamp=timezone.now(), user=self.user, cart=True
+            )
+
+    def test_invalid_quantity(self):
+        """ Test that invalid quantities are rejected """
+
+        for quantity in ('abc', '0', '-1', '5000'):
+            response = self.client.post(
+                reverse('website:add-to-cart'),
+                {'product_id': '2012345012349', 'quantity': quantity}
+            )
+            self.assertEqual(response.status_code, 400)
+        self.assertFalse(PurchaseItem.objects.exists())
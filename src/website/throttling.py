@@ -0,0 +1,116 @@
+""" website throttling module
+
+Token-bucket rate limiting. Every client gets a bucket per scope holding up
+to N tokens that refills continuously at N per period (rates are written
+"N/period" like in DRF); a request takes a token or is rejected with the
+time to wait for the next one. Buckets live in the ``throttle`` cache,
+which has to be shared by the worker processes (file based by default).
+"""
+
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.translation import gettext
+
+
+THROTTLE_CACHE = 'throttle'
+
+BUCKET_KEY = 'throttle:{scope}:{ident}'
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+
+def parse_rate(rate):
+    """ Returns the capacity and the refill rate (tokens per second) of a
+    "N/period" rate, the period being second, minute, hour or day
+    """
+
+    count, period = rate.split('/')
+    capacity = int(count)
+    return capacity, capacity / PERIODS[period[0]]
+
+
+def get_rate(scope):
+    """ Returns the rate configured for scope, None when it is unlimited """
+
+    return getattr(settings, 'THROTTLE_RATES', {}).get(scope)
+
+
+class TokenBucket:
+    """ The bucket of tokens stored under key, refilled at rate """
+
+    def __init__(self, key, rate):
+        self.key = key
+        self.capacity, self.refill_rate = parse_rate(rate)
+        self.wait = 0
+
+    def consume(self, tokens=1):
+        """ Takes tokens from the bucket. Returns False, and sets wait to
+        the seconds until they are available, when there aren't enough.
+
+        The state is read and written without a lock: requests of the same
+        client racing in different processes may be granted a few extra
+        tokens, which is fine for protecting the server.
+        """
+
+        cache = caches[THROTTLE_CACHE]
+        now = time.time()
+        state = cache.get(self.key)
+        if state is None:
+            available = self.capacity
+        else:
+            level, updated_at = state
+            available = min(
+                self.capacity,
+                level + (now - updated_at) * self.refill_rate
+            )
+
+        if available < tokens:
+            self.wait = (tokens - available) / self.refill_rate
+            return False
+        # a bucket left alone for capacity / refill_rate seconds is full
+        # again, so it doesn't need to be kept longer
+        cache.set(
+            self.key, (available - tokens, now),
+            math.ceil(self.capacity / self.refill_rate) + 1
+        )
+        self.wait = 0
+        return True
+
+
+def get_client_ident(request):
+    """ Identifies the client of request: its user, or its address """
+
+    if request.user.is_authenticated:
+        return 'user-{}'.format(request.user.pk)
+    return 'ip-{}'.format(request.META.get('REMOTE_ADDR', ''))
+
+
+def throttle(scope):
+    """ Decorator limiting a view to the rate of scope per client. Rejected
+    requests get a 429 response with a Retry-After header
+    """
+
+    def decorator(view_func):
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            rate = get_rate(scope)
+            if rate is not None:
+                bucket = TokenBucket(BUCKET_KEY.format(
+                    scope=scope, ident=get_client_ident(request)
+                ), rate)
+                if not bucket.consume():
+                    response = HttpResponse(
+                        gettext('TooManyRequests'), status=429,
+                        content_type='text/plain; charset=utf-8'
+                    )
+                    response['Retry-After'] = str(math.ceil(bucket.wait))
+                    return response
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
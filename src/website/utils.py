@@ -1,11 +1,26 @@
 """ website utils module """
 
 import random
+import re
 import string
+from decimal import Decimal
+from functools import reduce
+from operator import or_
 
+from django.db.models import Q
 from django.utils.text import slugify
 
 
+# room kept at the end of a slug for the "-<counter>" suffix
+SLUG_SUFFIX_LENGTH = 8
+
+# distinct slug bases looked up per query by allocate_slugs
+SLUG_QUERY_CHUNK = 200
+
+# a slug with a numeric suffix, split into its base and counter
+SLUG_COUNTER_RE = re.compile(r'^(.+)-(\d+)$')
+
+
 def random_string_generator(size=10,
                             chars=string.ascii_lowercase + string.digits):
     """ generate a random string based on the size given (default is 10) """
@@ -13,22 +28,78 @@ def random_string_generator(size=10,
     return ''.join(random.choice(chars) for _ in range(size))
 
 
+def decimal_field_max(field):
+    """ Returns the largest value a DecimalField can store """
+
+    return Decimal(10) ** (field.max_digits - field.decimal_places) - \
+        Decimal(10) ** -field.decimal_places
+
+
+def slug_base(title, max_length=50):
+    """ Returns the slug a title gets when it is not taken yet """
+
+    base = slugify(title)[:max_length - SLUG_SUFFIX_LENGTH].strip('-')
+    return base or 'product'
+
+
+def allocate_slugs(model, titles, field_name='slug'):
+    """ Returns a unique slug for every title, in the same order. Taken slugs
+    are looked up with one index range query per chunk of distinct bases
+    (base itself and everything between "base-" and "base."), whatever the
+    number of titles and collisions. A clashing title gets the first free
+    numeric suffix: kettle, kettle-2, kettle-3...
+
+    Concurrent inserts may still pick the same slug; the unique index on the
+    field rejects the second one (see Product.save for the retry).
+    """
+
+    max_length = model._meta.get_field(field_name).max_length
+    bases = [slug_base(title, max_length) for title in titles]
+
+    taken = set()
+    distinct_bases = list(set(bases))
+    for start in range(0, len(distinct_bases), SLUG_QUERY_CHUNK):
+        condition = reduce(or_, (
+            Q(**{field_name: base}) |
+            Q(**{
+                field_name + '__gte': base + '-',
+                field_name + '__lt': base + '.',
+            })
+            for base in distinct_bases[start:start + SLUG_QUERY_CHUNK]
+        ))
+        taken.update(
+            model._default_manager.filter(condition)
+            .values_list(field_name, flat=True)
+        )
+
+    # next counter of every base, above all the numeric suffixes in use
+    counters = {}
+    for slug in taken:
+        match = SLUG_COUNTER_RE.match(slug)
+        if match:
+            base, counter = match.group(1), int(match.group(2)) + 1
+            counters[base] = max(counters.get(base, 2), counter)
+
+    slugs = []
+    for base in bases:
+        slug = base
+        if slug in taken:
+            counter = counters.get(base, 2)
+            slug = '{}-{}'.format(base, counter)
+            while slug in taken:
+                counter += 1
+                slug = '{}-{}'.format(base, counter)
+            counters[base] = counter + 1
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
 def unique_slug_generator(instance, new_slug=None):
     """
     This is for a Django project and it assumes your instance
     has a model with a slug field and a title character (char) field.
     """
-    if new_slug is not None:
-        slug = new_slug
-    else:
-        slug = slugify(instance.title)
-
-    Klass = instance.__class__
-    qs_exists = Klass.objects.filter(slug=slug).exists()
-    if qs_exists:
-        new_slug = '{slug}-{randstr}'.format(
-            slug=slug,
-            randstr=random_string_generator(size=4)
-        )
-        return unique_slug_generator(instance, new_slug=new_slug)
-    return slug
+
+    title = new_slug if new_slug is not None else instance.title
+    return allocate_slugs(instance.__class__, [title])[0]
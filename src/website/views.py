@@ -3,26 +3,131 @@
 # pylint: disable=W0613, W0221
 
 
+import hashlib
+from decimal import Decimal, InvalidOperation
+
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.urls import reverse_lazy
-from django.db.models import Q
-from django.http import HttpResponseRedirect
+from django.http import Http404, HttpResponseBadRequest, \
+    HttpResponseRedirect
 from django.views.generic import ListView, View, DetailView, TemplateView
 from django.views.generic.edit import CreateView
 from django.shortcuts import get_object_or_404, render
-from django.utils import timezone
-from django.utils.translation import gettext
+from django.utils.decorators import method_decorator
+from django.utils.translation import get_language, gettext
+from django.views.decorators.http import condition
 
+from .cache import CATALOG_VERSION_KEY, CATEGORIES_VERSION_KEY, \
+    PRODUCT_VERSION_KEY, cache_anonymous_page, get_last_modified, get_version
+from .cart import LineOverflow, add_to_cart, get_open_cart
 from .forms import SignUpForm
-from .models import Category, Product, PurchaseOrder, PurchaseItem
+from .models import Product, PurchaseOrder, PurchaseItem
+from .pagination import InvalidCursor, KeysetPaginator, cursor_querystring
+from .search import get_search_backend
+from .throttling import throttle
+
+
+def page_etag(request, *parts):
+    """ Builds the ETag of a catalog page from the versions it depends on,
+    plus everything else that changes its HTML (user and language). Pages
+    carrying flash messages get no ETag so they are always rendered.
+    """
+
+    if len(messages.get_messages(request)):
+        return None
+    parts += (
+        request.user.pk if request.user.is_authenticated else '',
+        get_language(),
+        request.get_full_path(),
+    )
+    return hashlib.md5(
+        '|'.join(str(part) for part in parts).encode('utf-8')
+    ).hexdigest()
+
+
+def products_etag(request, *args, **kwargs):
+    """ ETag of the product list, free of database queries """
+
+    return page_etag(request, get_version(CATALOG_VERSION_KEY))
+
+
+def products_last_modified(request, *args, **kwargs):
+    """ Last-Modified of the product list """
+
+    if len(messages.get_messages(request)):
+        return None
+    return get_last_modified(CATALOG_VERSION_KEY)
+
+
+def get_product_updated_at(request, slug):
+    """ Returns the updated_at of the product with the given slug, with a
+    single query shared by the ETag and Last-Modified functions
+    """
+
+    if not hasattr(request, '_product_updated_at'):
+        request._product_updated_at = Product.objects.filter(
+            slug=slug
+        ).values_list('updated_at', flat=True).first()
+    return request._product_updated_at
+
 
+def product_detail_etag(request, *args, **kwargs):
+    """ ETag of a product page: the product and the navigation bar """
 
+    updated_at = get_product_updated_at(request, kwargs.get('slug'))
+    if updated_at is None:
+        return None
+    return page_etag(
+        request, updated_at.isoformat(), get_version(CATEGORIES_VERSION_KEY)
+    )
+
+
+def product_detail_last_modified(request, *args, **kwargs):
+    """ Last-Modified of a product page """
+
+    updated_at = get_product_updated_at(request, kwargs.get('slug'))
+    if updated_at is None or len(messages.get_messages(request)):
+        return None
+    return max(updated_at, get_last_modified(CATEGORIES_VERSION_KEY))
+
+
+def products_dependencies(request, *args, **kwargs):
+    """ The product list changes with any product or category """
+
+    return [CATALOG_VERSION_KEY]
+
+
+def product_detail_dependencies(request, *args, **kwargs):
+    """ A product page changes with the product and the navigation bar """
+
+    return [
+        PRODUCT_VERSION_KEY.format(slug=kwargs.get('slug')),
+        CATEGORIES_VERSION_KEY,
+    ]
+
+
+@method_decorator(
+    condition(
+        etag_func=products_etag, last_modified_func=products_last_modified
+    ),
+    name='dispatch'
+)
+@method_decorator(cache_anonymous_page(products_dependencies), name='dispatch')
 class ProductsView(ListView):
     """ ListView that shows all of (or query) the products """
 
     template_name = 'products.html'
     context_object_name = 'product_list'
+    paginate_by = 20
+    # the orderings a visitor can pick with the sort parameter, each one is
+    # backed by an index on Product
+    orderings = {
+        'barcode': ('barcode',),
+        'price': ('price', 'barcode'),
+        '-price': ('-price', '-barcode'),
+        'title': ('title', 'barcode'),
+    }
 
     def get_queryset(self):
         """ Returns the queryset of products and categories """
@@ -39,13 +144,34 @@ class ProductsView(ListView):
         q = self.request.GET.get('q', None)
 
         if q:
-            queryset = queryset.filter(
-                Q(title__icontains=q) |
-                Q(description__icontains=q)
-            )
+            queryset = get_search_backend().search(queryset, q)
 
         return queryset
 
+    def get_ordering(self):
+        """ Returns the ordering chosen by the sort parameter. Searches are
+        ordered by relevance unless another ordering is asked for
+        """
+
+        sort = self.request.GET.get('sort', None)
+        if sort in self.orderings:
+            return self.orderings[sort]
+
+        rank_field = get_search_backend().rank_field
+        if self.request.GET.get('q', None) and rank_field:
+            return (rank_field, 'barcode')
+        return self.orderings['barcode']
+
+    def paginate_queryset(self, queryset, page_size):
+        """ Paginates the products by keyset instead of OFFSET """
+
+        paginator = KeysetPaginator(queryset, self.get_ordering(), page_size)
+        try:
+            page = paginator.page(self.request.GET.get('cursor', None))
+        except InvalidCursor:
+            raise Http404(gettext('InvalidCursor'))
+        return paginator, page, page.object_list, page.has_other_pages()
+
     def get_context_data(self, **kwargs):
         """ Mounts the context objects and verifies if user is authenticated
         """
@@ -53,10 +179,29 @@ class ProductsView(ListView):
         context = super(ProductsView, self).get_context_data(**kwargs)
         if self.request.user.is_authenticated:
             context['authenticated_user'] = self.request.user
-        context['categories'] = Category.objects.all()
+
+        page = context['page_obj']
+        if page.has_next():
+            context['next_page_query'] = cursor_querystring(
+                self.request.GET, page.next_cursor
+            )
+        if page.has_previous():
+            context['previous_page_query'] = cursor_querystring(
+                self.request.GET, page.previous_cursor
+            )
         return context
 
 
+@method_decorator(
+    condition(
+        etag_func=product_detail_etag,
+        last_modified_func=product_detail_last_modified
+    ),
+    name='dispatch'
+)
+@method_decorator(
+    cache_anonymous_page(product_detail_dependencies), name='dispatch'
+)
 class ProductDetailView(DetailView):
     """ DetailView for a specific (selected) product """
 
@@ -106,6 +251,9 @@ class PurchaseOrdersView(TemplateView):
     """ TemplateView for the user's purchase orders """
 
     template_name = 'purchase_orders.html'
+    paginate_by = 20
+    # served by the (user, cart, timestamp) index of PurchaseOrder
+    ordering = ('-cart', '-timestamp', '-id')
 
     def get(self, request, *args, **kwargs):
         """ Verify if user is authenticated, otherwise redirect to sigin page
@@ -116,11 +264,28 @@ class PurchaseOrdersView(TemplateView):
         return render(request, self.template_name, self.get_context_data())
 
     def get_context_data(self, **kwargs):
-        """ Makes the purchase_orders list """
+        """ Makes the page of the user's purchase_orders list, open cart
+        first and then the most recent orders
+        """
 
         context = super(PurchaseOrdersView, self).get_context_data(**kwargs)
-        context['purchase_orders'] = PurchaseOrder.objects.all() \
-            .order_by('id').order_by('-cart')
+        paginator = KeysetPaginator(
+            PurchaseOrder.objects.filter(user=self.request.user),
+            self.ordering, self.paginate_by
+        )
+        try:
+            page = paginator.page(self.request.GET.get('cursor', None))
+        except InvalidCursor:
+            raise Http404(gettext('InvalidCursor'))
+        context['purchase_orders'] = page
+        if page.has_next():
+            context['next_page_query'] = cursor_querystring(
+                self.request.GET, page.next_cursor
+            )
+        if page.has_previous():
+            context['previous_page_query'] = cursor_querystring(
+                self.request.GET, page.previous_cursor
+            )
         return context
 
 
@@ -130,19 +295,21 @@ class PurchaseOrderDetailView(TemplateView):
     template_name = 'purchase_order_detail.html'
 
     def get_context_data(self, **kwargs):
-        """ Makes the purchase_order object and the purchase_items list """
+        """ Makes the purchase_order object, with its totals, and the
+        purchase_items list: two queries whatever the size of the order
+        """
 
         context = super(PurchaseOrderDetailView, self).get_context_data(
             **kwargs
         )
         id = self.kwargs.get('id')
-        purchase_order = get_object_or_404(PurchaseOrder, id=id)
+        purchase_order = get_object_or_404(
+            PurchaseOrder.objects.with_totals(), id=id
+        )
         context['purchase_order'] = purchase_order
-        purchase_items = PurchaseItem.objects.filter(
+        context['purchase_items'] = PurchaseItem.objects.filter(
             purchase_order_id=purchase_order.id
-        )
-        if purchase_items.exists():
-            context['purchase_items'] = purchase_items
+        ).order_by('id')
         return context
 
 
@@ -215,15 +382,20 @@ class SignUpView(CreateView):
         return super().form_valid(form)
 
 
+@method_decorator(throttle('add-to-cart'), name='dispatch')
 class AddToCartView(View):
     """ View to add item to user's cart """
 
+    # largest quantity accepted for a single line of the form
+    max_quantity = Decimal('1000')
+
     def post(self, request, *args, **kwargs):
         """ Check if user is authenticated, otherwise redirect to the sigin
         Then it expects the product_id that the user wants to add to the cart.
-        If the user doesn't have any pending purchase order (cart=True), a new
-        order is created, with the new item, and the user is redirected to the
-        previously accessed page.
+        Several product_id values (each with an optional quantity, default 1)
+        can be sent at once. If the user doesn't have any pending purchase
+        order (cart=True), a new order is created, with the new items, and
+        the user is redirected to the previously accessed page.
         """
 
         previous_url = request.META.get('HTTP_REFERER')
@@ -231,27 +403,33 @@ class AddToCartView(View):
         if not request.user.is_authenticated:
             return HttpResponseRedirect(reverse_lazy('website:signin'))
 
-        product_id = request.POST.get('product_id', None)
-        product = get_object_or_404(Product, barcode=product_id)
-
-        user = self.request.user
-
-        order_queryset = PurchaseOrder.objects.filter(
-            Q(user=user) & Q(cart=True)
-        )
-        if order_queryset.exists():
-            purchase_order = order_queryset.first()
-        else:
-            purchase_order = PurchaseOrder.objects.create(
-                timestamp=timezone.now(), user=user, cart=True
-            )
-
-        PurchaseItem.objects.create(
-            barcode=product.barcode, title=product.title,
-            description=product.description, image=product.image,
-            price=product.price, category=product.category,
-            purchase_order=purchase_order, quantity=1.000,
-            total_price=product.price
-        )
+        product_ids = request.POST.getlist('product_id')
+        quantities = request.POST.getlist('quantity') or \
+            ['1'] * len(product_ids)
+        if not product_ids or len(quantities) != len(product_ids):
+            return HttpResponseBadRequest(gettext('InvalidQuantity'))
+        try:
+            quantities = [Decimal(quantity) for quantity in quantities]
+        except InvalidOperation:
+            return HttpResponseBadRequest(gettext('InvalidQuantity'))
+        # NaN compares by raising InvalidOperation, infinities are too big
+        if not all(quantity.is_finite() and 0 < quantity <= self.max_quantity
+                   for quantity in quantities):
+            return HttpResponseBadRequest(gettext('InvalidQuantity'))
+
+        products = Product.objects.in_bulk(product_ids)
+        if len(products) != len(set(product_ids)):
+            raise Http404(gettext('ProductNotFound'))
+
+        purchase_order = get_open_cart(self.request.user)
+        try:
+            add_to_cart(purchase_order, [
+                (products[product_id], quantity)
+                for product_id, quantity in zip(product_ids, quantities)
+            ])
+        except LineOverflow:
+            # the total price of the line wouldn't fit in the order
+            return HttpResponseBadRequest(gettext('InvalidQuantity'))
 
         return HttpResponseRedirect(previous_url)
+